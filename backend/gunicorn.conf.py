@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+# gunicorn อ่านไฟล์นี้เองเมื่อรันจากโฟลเดอร์ backend เช่น
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/repair-metrics gunicorn repair_project.wsgi -w 4
+# เตรียมโฟลเดอร์ metrics ที่ทุก worker ใช้ร่วมกัน (ดู repair_api/metrics.py)
+
+import os
+import shutil
+
+import decouple
+
+# export แบบ streaming ถือ thread ไว้จนส่งครบ จึงใช้ gthread (หลาย thread ต่อ worker)
+workers = decouple.config('WEB_CONCURRENCY', default=4, cast=int)
+threads = decouple.config('GUNICORN_THREADS', default=8, cast=int)
+
+PROMETHEUS_MULTIPROC_DIR = decouple.config('PROMETHEUS_MULTIPROC_DIR', default='')
+if PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', PROMETHEUS_MULTIPROC_DIR)
+
+
+def on_starting(server):
+    # ค่าจากรอบก่อน (pid เดิมอาจถูกใช้ซ้ำ) ต้องไม่ถูกรวมเข้ากับรอบนี้
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    # worker ที่ตายโดยไม่ได้ปิดตามปกติ (ถูก kill/timeout) ไม่ได้ลบ gauge แบบ live ของตัวเอง
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
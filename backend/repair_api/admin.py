@@ -1,12 +1,14 @@
 # repair_api/admin.py
 
 from django.contrib import admin
+from django.utils import timezone
 from .models import (
     EquipmentCategory,
     Equipment,
     RepairRequest,
     RepairHistory,
-    UserProfile
+    UserProfile,
+    Job
 )
 
 @admin.register(EquipmentCategory)
@@ -62,4 +64,20 @@ class RepairHistoryAdmin(admin.ModelAdmin):
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'role', 'department', 'phone']
     search_fields = ['user__username', 'user__email', 'department']
-    list_filter = ['role', 'department']
\ No newline at end of file
+    list_filter = ['role', 'department']
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'run_at', 'finished_at']
+    search_fields = ['name', 'last_error']
+    list_filter = ['status', 'name']
+    readonly_fields = [
+        'locked_by', 'started_at', 'heartbeat_at', 'finished_at', 'last_error', 'created_at'
+    ]
+    actions = ['retry_jobs']
+
+    @admin.action(description='ส่งงานที่เลือกกลับเข้าคิว')
+    def retry_jobs(self, request, queryset):
+        queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_at=timezone.now(), last_error=''
+        )
@@ -0,0 +1,323 @@
+# repair_api/analytics.py
+"""
+สรุปคำร้องรายวันสำหรับรายงานผู้บริหาร (DailyCategoryStats, DailyTechnicianStats)
+
+- เวลาเฉลี่ยจนมอบหมาย/จนเสร็จสิ้น และค่าใช้จ่ายประมาณ/จริง ต่อหมวดหมู่อุปกรณ์
+- จำนวนงานที่ได้รับมอบหมาย/ทำเสร็จ และเวลาเฉลี่ยต่อช่าง
+
+endpoint รายงานอ่านจากตารางสรุปเท่านั้น (แถวละหนึ่งวัน) ช่วงหลายปีจึงรวมเพียงหลักพันแถว
+แทนการ aggregate คำร้องทั้งหมด
+
+การคำนวณแบบ incremental:
+- การแก้ไขคำร้อง (signal, bulk, การย้ายหมวดหมู่อุปกรณ์) บันทึกวันที่ได้รับผลกระทบ
+  ลงใน AnalyticsDirtyDay หลัง commit (ไม่เพิ่มการเขียนในทรานแซกชันของการบันทึกคำร้อง)
+  แล้วส่งงาน analytics.refresh เข้าคิวถ้ายังไม่มีงานที่รออยู่ในตาราง Job
+  (รวมการแก้ไขในช่วง ANALYTICS_REFRESH_DELAY วินาทีเป็นงานเดียว ไม่ว่าจะมาจาก worker ใด)
+- งานคำนวณใหม่เฉพาะวันเหล่านั้น ทีละช่วงวันที่ต่อเนื่องกัน
+- คำสั่ง refresh_analytics ใช้รันทุกคืน (cron) เป็นตาข่ายรองรับ และสร้างใหม่ทั้งหมดด้วย --full
+
+วันที่ใช้ตามเขตเวลาของระบบ (TIME_ZONE)
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncYear
+from django.utils import timezone
+
+from .cache import bump_table_versions
+from .jobs import enqueue, register
+from .models import (
+    AnalyticsDirtyDay, DailyCategoryStats, DailyTechnicianStats, Job, RepairRequest,
+)
+
+REFRESH_JOB = 'analytics.refresh'
+# จำนวนวันที่ต่อคำสั่ง DELETE (ไม่ให้ parameter เกินขีดจำกัดของ SQLite)
+DELETE_BATCH_SIZE = 500
+# คำร้องที่นับเป็นงานเสร็จ (กรองใน aggregate ให้ query ใช้ index ของ completed_date
+# ไม่ใช่ index ของ status ซึ่งครอบคลุมคำร้องเกือบครึ่งตาราง)
+COMPLETED = Q(status='completed')
+
+PERIODS = {
+    'day': F('date'),
+    'month': TruncMonth('date'),
+    'year': TruncYear('date'),
+    'total': None,
+}
+
+
+def local_days(*values):
+    """วันที่ตามเขตเวลาของระบบของ datetime แต่ละค่า (ข้าม None)"""
+    return {timezone.localdate(value) for value in values if value is not None}
+
+
+def mark_dirty(days):
+    """บันทึกวันที่ต้องคำนวณสรุปใหม่และนัดงานคำนวณ หลัง commit
+
+    ถ้า process ตายระหว่าง commit กับ callback วันที่นั้นจะถูกคำนวณโดยคำสั่ง refresh_analytics รอบคืน
+    """
+    if not days:
+        return
+    days = set(days)
+    transaction.on_commit(lambda: _record_dirty(days))
+
+
+def _record_dirty(days):
+    AnalyticsDirtyDay.objects.bulk_create(
+        [AnalyticsDirtyDay(date=day) for day in days], ignore_conflicts=True
+    )
+    schedule_refresh()
+
+
+def mark_equipment_dirty(equipment):
+    """วันที่ของคำร้องทั้งหมดของอุปกรณ์ (queryset) เช่นเมื่ออุปกรณ์ย้ายหมวดหมู่"""
+    requests = RepairRequest.objects.filter(equipment__in=equipment).order_by()
+    days = set()
+    for field in ('request_date', 'assigned_date', 'completed_date'):
+        days.update(
+            requests.exclude(**{field: None}).annotate(day=TruncDate(field))
+            .values_list('day', flat=True).distinct()
+        )
+    mark_dirty(days)
+
+
+def schedule_refresh():
+    # งานที่ยังรออยู่ในคิวจะอ่าน AnalyticsDirtyDay ตอนเริ่มทำ จึงครอบคลุมวันที่เพิ่งบันทึกแล้ว
+    # (งานที่กำลังทำอยู่ไม่นับ เพราะอาจอ่านรายการวันที่ไปก่อนแล้ว)
+    if not Job.objects.filter(name=REFRESH_JOB, status='queued').exists():
+        enqueue(REFRESH_JOB, delay=settings.ANALYTICS_REFRESH_DELAY)
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _day_runs(days):
+    """แบ่งวันที่เป็นช่วงที่ต่อเนื่องกัน [(first, last), ...]"""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+
+def _seconds(duration):
+    return duration.total_seconds() if duration is not None else 0
+
+
+def _elapsed(field, filter=None):
+    return Sum(
+        ExpressionWrapper(F(field) - F('request_date'), output_field=DurationField()),
+        filter=filter
+    )
+
+
+def aggregate_days(first=None, last=None):
+    """รวมคำร้องเป็นรายวันในช่วง [first, last] (None = ทั้งหมด)
+
+    คืน (รายการ DailyCategoryStats, รายการ DailyTechnicianStats) ที่ยังไม่บันทึก
+    ใช้ช่วงเดียวต่อ query (เงื่อนไข OR หลายช่วงทำให้ SQLite เลิกใช้ index แล้วสแกนทั้งตาราง)
+    """
+    def by_day(field):
+        rows = RepairRequest.objects.exclude(**{field: None})
+        if first is not None:
+            rows = rows.filter(**{
+                f'{field}__gte': _day_start(first),
+                f'{field}__lt': _day_start(last + timedelta(days=1)),
+            })
+        # ยกเลิก ordering เริ่มต้นของ RepairRequest ไม่ให้ถูกนำไปรวมใน GROUP BY
+        return rows.order_by().annotate(day=TruncDate(field))
+
+    categories = defaultdict(dict)
+    for row in by_day('request_date').values(
+        'day', category=F('equipment__category_id')
+    ).annotate(count=Count('id')):
+        categories[row['day'], row['category']]['created_count'] = row['count']
+    for row in by_day('assigned_date').values(
+        'day', category=F('equipment__category_id')
+    ).annotate(count=Count('id'), seconds=_elapsed('assigned_date')):
+        categories[row['day'], row['category']].update(
+            assigned_count=row['count'], assign_seconds=_seconds(row['seconds'])
+        )
+    for row in by_day('completed_date').values(
+        'day', category=F('equipment__category_id')
+    ).annotate(
+        count=Count('id', filter=COMPLETED), seconds=_elapsed('completed_date', COMPLETED),
+        estimated=Sum('estimated_cost', filter=COMPLETED),
+        actual=Sum('actual_cost', filter=COMPLETED),
+    ):
+        if not row['count']:
+            continue
+        categories[row['day'], row['category']].update(
+            completed_count=row['count'], complete_seconds=_seconds(row['seconds']),
+            estimated_cost=row['estimated'] or 0, actual_cost=row['actual'] or 0,
+        )
+
+    technicians = defaultdict(dict)
+    # คำร้องที่ไม่มีช่างข้ามใน Python (เงื่อนไข assigned_to ทำให้ query ใช้ index ผิดตัว)
+    for row in by_day('assigned_date').values('day', 'assigned_to_id').annotate(
+        count=Count('id')
+    ):
+        if row['assigned_to_id'] is None:
+            continue
+        technicians[row['day'], row['assigned_to_id']]['assigned_count'] = row['count']
+    for row in by_day('completed_date').values('day', 'assigned_to_id').annotate(
+        count=Count('id', filter=COMPLETED), seconds=_elapsed('completed_date', COMPLETED),
+        actual=Sum('actual_cost', filter=COMPLETED),
+    ):
+        if row['assigned_to_id'] is None or not row['count']:
+            continue
+        technicians[row['day'], row['assigned_to_id']].update(
+            completed_count=row['count'], complete_seconds=_seconds(row['seconds']),
+            actual_cost=row['actual'] or 0,
+        )
+
+    return (
+        [
+            DailyCategoryStats(date=day, category_id=category_id, **values)
+            for (day, category_id), values in categories.items()
+        ],
+        [
+            DailyTechnicianStats(date=day, technician_id=technician_id, **values)
+            for (day, technician_id), values in technicians.items()
+        ],
+    )
+
+
+def _save(category_rows, technician_rows, batch_size=1000):
+    DailyCategoryStats.objects.bulk_create(category_rows, batch_size=batch_size)
+    DailyTechnicianStats.objects.bulk_create(technician_rows, batch_size=batch_size)
+    transaction.on_commit(
+        lambda: bump_table_versions(DailyCategoryStats, DailyTechnicianStats)
+    )
+
+
+def refresh_days(days):
+    """คำนวณสรุปของวันที่ระบุใหม่ (ทีละช่วงวันที่ต่อเนื่องกัน) คืนจำนวนช่วง"""
+    days = sorted(days)
+    runs = _day_runs(days)
+    if not runs:
+        return 0
+    category_rows, technician_rows = [], []
+    with transaction.atomic():
+        for first, last in runs:
+            categories, technicians = aggregate_days(first, last)
+            category_rows += categories
+            technician_rows += technicians
+        for start in range(0, len(days), DELETE_BATCH_SIZE):
+            batch = days[start:start + DELETE_BATCH_SIZE]
+            DailyCategoryStats.objects.filter(date__in=batch).delete()
+            DailyTechnicianStats.objects.filter(date__in=batch).delete()
+        _save(category_rows, technician_rows)
+    return len(runs)
+
+
+@register(REFRESH_JOB)
+def refresh_dirty_days():
+    """งานเบื้องหลัง: คำนวณสรุปของวันที่ถูกบันทึกไว้ใน AnalyticsDirtyDay ใหม่"""
+    with transaction.atomic():
+        days = sorted(AnalyticsDirtyDay.objects.values_list('date', flat=True))
+        # ลบเฉพาะวันที่อ่านได้ วันที่ถูกเพิ่มระหว่างนี้รอคำนวณในงานถัดไป
+        for start in range(0, len(days), DELETE_BATCH_SIZE):
+            AnalyticsDirtyDay.objects.filter(
+                date__in=days[start:start + DELETE_BATCH_SIZE]
+            ).delete()
+        refresh_days(days)
+    return days
+
+
+def rebuild_all():
+    """สร้างตารางสรุปใหม่ทั้งหมดจากคำร้อง"""
+    with transaction.atomic():
+        AnalyticsDirtyDay.objects.all().delete()
+        DailyCategoryStats.objects.all().delete()
+        DailyTechnicianStats.objects.all().delete()
+        _save(*aggregate_days())
+
+
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def _money(value):
+    # SUM บน SQLite ไม่คงจำนวนตำแหน่งทศนิยม
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def _grouped(queryset, period, fields, totals):
+    period_expression = PERIODS[period]
+    if period_expression is not None:
+        queryset = queryset.annotate(period=period_expression)
+        fields = ['period', *fields]
+    return queryset.values(*fields).annotate(**totals).order_by(*fields)
+
+
+def category_report(start, end, period='month'):
+    """ผลรวมต่อหมวดหมู่และช่วงเวลา (day/month/year/total) จาก DailyCategoryStats"""
+    rows = _grouped(
+        DailyCategoryStats.objects.filter(date__range=(start, end)),
+        period,
+        ['category_id', 'category__name'],
+        {
+            'created': Sum('created_count'),
+            'assigned': Sum('assigned_count'),
+            'assign_seconds': Sum('assign_seconds'),
+            'completed': Sum('completed_count'),
+            'complete_seconds': Sum('complete_seconds'),
+            'estimated': Sum('estimated_cost'),
+            'actual': Sum('actual_cost'),
+        },
+    )
+    return [
+        {
+            'period': row['period'].isoformat() if 'period' in row else None,
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'created': row['created'],
+            'assigned': row['assigned'],
+            'mean_hours_to_assign': _hours(row['assign_seconds'], row['assigned']),
+            'completed': row['completed'],
+            'mean_hours_to_complete': _hours(row['complete_seconds'], row['completed']),
+            'estimated_cost': _money(row['estimated']),
+            'actual_cost': _money(row['actual']),
+        }
+        for row in rows
+    ]
+
+
+def technician_report(start, end, period='month'):
+    """ผลงานต่อช่างและช่วงเวลา (day/month/year/total) จาก DailyTechnicianStats"""
+    rows = _grouped(
+        DailyTechnicianStats.objects.filter(date__range=(start, end)),
+        period,
+        ['technician_id', 'technician__username', 'technician__first_name',
+         'technician__last_name'],
+        {
+            'assigned': Sum('assigned_count'),
+            'completed': Sum('completed_count'),
+            'complete_seconds': Sum('complete_seconds'),
+            'actual': Sum('actual_cost'),
+        },
+    )
+    return [
+        {
+            'period': row['period'].isoformat() if 'period' in row else None,
+            'technician': row['technician_id'],
+            'username': row['technician__username'],
+            'full_name': (
+                f"{row['technician__first_name']} {row['technician__last_name']}".strip()
+                or row['technician__username']
+            ),
+            'assigned': row['assigned'],
+            'completed': row['completed'],
+            'mean_hours_to_complete': _hours(row['complete_seconds'], row['completed']),
+            'actual_cost': _money(row['actual']),
+        }
+        for row in rows
+    ]
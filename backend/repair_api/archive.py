@@ -0,0 +1,91 @@
+# repair_api/archive.py
+"""
+ย้ายประวัติของคำร้องที่ปิดแล้ว (completed/cancelled) นานกว่า HISTORY_ARCHIVE_AFTER_DAYS วัน
+จาก RepairHistory ไปยัง RepairHistoryArchive เพื่อให้ตารางหลักมีเฉพาะงานที่ยังเคลื่อนไหว
+
+- ย้ายทีละ HISTORY_ARCHIVE_BATCH_SIZE แถว แต่ละ batch เป็นทรานแซกชันสั้น ๆ ของตัวเอง
+  (INSERT แล้ว DELETE ตาม id) จึงไม่ lock ตารางนานและหยุดกลางคันได้อย่างปลอดภัย
+- ใช้ id เดิม การรันซ้อนกันสองตัวจึงไม่สร้างแถวซ้ำใน archive
+- การอ่านประวัติรวมทั้งสองตารางเสมอ (RepairRequest.history_entries) ผลลัพธ์ของ API
+  จึงไม่เปลี่ยน และไม่ต้องเปลี่ยน version ของตาราง (ETag)
+- รันด้วยคำสั่ง archive_history (cron ทุกคืน)
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import OPEN_STATUSES, RepairHistory, RepairHistoryArchive
+
+ARCHIVE_FIELDS = ['id', 'repair_request_id', 'updated_by_id', 'status', 'comment', 'created_at']
+
+
+def archivable_histories(older_than_days=None):
+    """ประวัติในตารางหลักของคำร้องที่ปิดแล้วและไม่ถูกแก้ไขมานานกว่า older_than_days วัน"""
+    if older_than_days is None:
+        older_than_days = settings.HISTORY_ARCHIVE_AFTER_DAYS
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return RepairHistory.objects.exclude(
+        repair_request__status__in=OPEN_STATUSES
+    ).filter(repair_request__updated_at__lt=cutoff)
+
+
+def _delete_rows(model, ids):
+    """DELETE ... WHERE id IN (...) คำสั่งเดียว ไม่โหลดแถวและไม่ส่ง signal ทีละแถว"""
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            ids,
+        )
+
+
+def archive_batch(queryset, batch_size, after_id=0):
+    """ย้ายประวัติจาก queryset ที่ id มากกว่า after_id ไม่เกิน batch_size แถว
+
+    คืน (id สุดท้ายที่ย้าย, จำนวนแถว) หรือ None ถ้าไม่มีแถวเหลือ
+    """
+    with transaction.atomic():
+        rows = list(
+            queryset.filter(id__gt=after_id).order_by('id').values(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return None
+        RepairHistoryArchive.objects.bulk_create(
+            [RepairHistoryArchive(**row) for row in rows], ignore_conflicts=True
+        )
+        # ลบโดยไม่ส่ง signal ทีละแถว: ข้อมูลแค่ย้ายตาราง ไม่ใช่การแก้ไขที่ต้องล้าง cache/ETag
+        _delete_rows(RepairHistory, [row['id'] for row in rows])
+    return rows[-1]['id'], len(rows)
+
+
+def archive_histories(older_than_days=None, batch_size=None, pause=0, limit=None,
+                      progress=None):
+    """ย้ายประวัติที่เข้าเงื่อนไขทั้งหมดทีละ batch คืนจำนวนแถวที่ย้าย
+
+    pause: หน่วงระหว่าง batch (วินาที) เปิดโอกาสให้ transaction อื่นเขียนได้ (สำคัญบน SQLite)
+    limit: จำนวนแถวสูงสุดในการรันครั้งนี้
+    """
+    batch_size = batch_size or settings.HISTORY_ARCHIVE_BATCH_SIZE
+    queryset = archivable_histories(older_than_days)
+    moved = last_id = 0
+    while limit is None or moved < limit:
+        size = batch_size if limit is None else min(batch_size, limit - moved)
+        # เดินตาม id ต่อจาก batch ก่อน ไม่ต้องสแกนประวัติของคำร้องที่ยังเปิดอยู่ซ้ำทุก batch
+        result = archive_batch(queryset, size, after_id=last_id)
+        if result is None:
+            break
+        last_id, count = result
+        moved += count
+        if progress:
+            progress(moved)
+        if count < size:
+            break
+        if pause:
+            time.sleep(pause)
+    return moved
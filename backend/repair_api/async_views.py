@@ -0,0 +1,202 @@
+# repair_api/async_views.py
+"""
+view แบบ async สำหรับ endpoint อ่านข้อมูลที่ถูกเรียกบ่อย (ใช้เมื่อรันผ่าน ASGI)
+
+view ของ DRF 3.14 เป็น sync ทั้งหมด ภายใต้ ASGI แต่ละ request จึงถือ thread ไว้ตลอดเวลา
+ที่รอฐานข้อมูล view ในไฟล์นี้ใช้ async ORM และ cache แบบ async แทน โดยใช้ queryset,
+serializer, pagination, ETag และ key ของ cache ชุดเดียวกับ view แบบ sync ใน views.py
+
+- GET/HEAD ที่ตอบเป็น JSON ทำงานแบบ async
+- method อื่น (POST/PUT/DELETE) และ request ที่ต้องการ browsable API ส่งต่อให้ view เดิม
+- รายการที่ใช้เลขหน้า (?page= หรือ ?search=) ส่งต่อให้ view เดิมเช่นกัน
+"""
+
+import functools
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponse
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .cache import acached_reference
+from .conditional import aconditional_get
+from .models import get_user_role
+from .stats import aget_dashboard_stats
+from . import views
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _authenticators():
+    return [authentication() for authentication in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+
+
+def _authenticate(request):
+    """ยืนยันตัวตนด้วย Request ของ DRF และ DEFAULT_AUTHENTICATION_CLASSES ชุดเดียวกับ view แบบ sync"""
+    user = Request(request, authenticators=_authenticators()).user
+    if not (user and user.is_authenticated):
+        raise exceptions.NotAuthenticated()
+    return user
+
+
+def json_response(data, status=200):
+    # JSONRenderer ของ DRF: ผลลัพธ์เหมือน view แบบ sync ทุกไบต์ (UTF-8, ไม่มีช่องว่าง)
+    return HttpResponse(
+        JSONRenderer().render(data), content_type='application/json', status=status
+    )
+
+
+def _error_response(exc):
+    detail = exc.detail
+    data = detail if isinstance(detail, (dict, list)) else {'detail': detail}
+    response = json_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = 401
+        response['WWW-Authenticate'] = _authenticators()[0].authenticate_header(None)
+    return response
+
+
+def _wants_sync(request):
+    """request ที่ให้ view เดิมของ DRF ตอบ"""
+    return (
+        request.method not in READ_METHODS
+        or 'format' in request.GET
+        or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+    )
+
+
+def async_read_view(sync_view, etag_models=()):
+    """ครอบ handler แบบ async ด้วยการยืนยันตัวตน ETag และการส่งต่อให้ sync_view
+
+    handler คืน HttpResponse หรือ raise APIException ของ DRF
+    """
+    sync_view = sync_to_async(sync_view)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def view(request, *args, **kwargs):
+            if _wants_sync(request):
+                return await sync_view(request, *args, **kwargs)
+            try:
+                # การตรวจ token อาจ query ฐานข้อมูล (token แบบเก่า หรือ cache ที่ไม่แชร์) จึงทำใน thread
+                request.user = await sync_to_async(_authenticate)(request)
+                patch_headers = None
+                if etag_models:
+                    not_modified, patch_headers = await aconditional_get(request, etag_models)
+                    if not_modified is not None:
+                        return not_modified
+                response = await handler(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _error_response(exc)
+            if patch_headers is not None and response.status_code == 200:
+                patch_headers(response)
+            return response
+
+        # csrf_exempt ของ Django 4.2 คืนฟังก์ชัน sync จึงตั้ง attribute เอง
+        # (เหมือน view ของ DRF ที่ยืนยันตัวตนด้วย token ไม่ใช่ session)
+        view.csrf_exempt = True
+        view.sync_view = sync_view
+        return view
+    return decorator
+
+
+def _viewset(viewset_class, request, action, **kwargs):
+    """ViewSet เดิมสำหรับใช้ get_queryset/paginator/get_serializer (ไม่เรียก dispatch)"""
+    drf_request = Request(request)
+    drf_request.user = request.user
+    view = viewset_class(
+        request=drf_request, action=action, format_kwarg=None, args=(), kwargs=kwargs
+    )
+    view.headers = {}
+    return view
+
+
+async def _list(viewset_class, request):
+    view = _viewset(viewset_class, request, 'list')
+    params = view.request.query_params
+    if 'page' in params or params.get('search'):
+        # เลขหน้าใช้ COUNT + OFFSET ของ PageNumberPagination ซึ่งเป็น sync
+        return None
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(view.get_queryset(), view.request, view)
+    data = view.get_serializer(page, many=True).data
+    return json_response(paginator.get_paginated_response(data).data)
+
+
+async def _retrieve(view, pk):
+    try:
+        instance = await view.get_queryset().aget(pk=pk)
+    except ObjectDoesNotExist:
+        raise exceptions.NotFound()
+    return view.get_serializer(instance).data
+
+
+@async_read_view(views.dashboard_stats, etag_models=views.DASHBOARD_ETAG_MODELS)
+async def dashboard_stats(request):
+    """สถิติแดชบอร์ด: ตัวนับคำร้อง ตัวนับอุปกรณ์ และคำร้องล่าสุด query พร้อมกัน"""
+    role = get_user_role(request.user)
+    if role is None:
+        return json_response({'error': 'ไม่พบโปรไฟล์ผู้ใช้'}, status=404)
+    return json_response(await aget_dashboard_stats(request.user, role))
+
+
+@async_read_view(views.technician_list)
+async def technician_list(request):
+    """รายชื่อช่างซ่อม (cache เดียวกับ view แบบ sync)"""
+    async def compute():
+        return [
+            views.technician_data(profile) async for profile in views.technicians_queryset()
+        ]
+
+    return json_response(await acached_reference(*views.TECHNICIANS_CACHE, compute))
+
+
+@async_read_view(
+    views.RepairRequestViewSet.as_view({'get': 'list', 'post': 'create'}),
+    etag_models=views.RepairRequestViewSet.etag_models
+)
+async def repair_request_list(request):
+    response = await _list(views.RepairRequestViewSet, request)
+    if response is None:
+        return await repair_request_list.sync_view(request)
+    return response
+
+
+@async_read_view(
+    views.RepairRequestViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+    }),
+    etag_models=views.RepairRequestViewSet.etag_models
+)
+async def repair_request_detail(request, pk):
+    # get_queryset กรองตามสิทธิ์ คำร้องที่มองไม่เห็นจึงได้ 404 เหมือน view แบบ sync
+    view = _viewset(views.RepairRequestViewSet, request, 'retrieve', pk=pk)
+    return json_response(await _retrieve(view, pk))
+
+
+@async_read_view(
+    views.EquipmentViewSet.as_view({'get': 'list', 'post': 'create'}),
+    etag_models=views.EquipmentViewSet.etag_models
+)
+async def equipment_list(request):
+    response = await _list(views.EquipmentViewSet, request)
+    if response is None:
+        return await equipment_list.sync_view(request)
+    return response
+
+
+@async_read_view(
+    views.EquipmentViewSet.as_view({
+        'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'
+    }),
+    etag_models=views.EquipmentViewSet.etag_models
+)
+async def equipment_detail(request, pk):
+    view = _viewset(views.EquipmentViewSet, request, 'retrieve', pk=pk)
+    data = await acached_reference(
+        *views.EQUIPMENT_CACHE, lambda: _retrieve(view, pk), variant=str(pk)
+    )
+    return json_response(data)
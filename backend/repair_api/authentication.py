@@ -0,0 +1,196 @@
+# repair_api/authentication.py
+"""
+ยืนยันตัวตนด้วย JWT โดยไม่ query ฐานข้อมูลในทุก request
+
+access token มี claim role และ department ของผู้ใช้ (ใส่ตอน login/refresh)
+RoleJWTAuthentication สร้าง RoleTokenUser จาก claims แทนการโหลด User และ UserProfile
+
+เมื่อบทบาท/แผนกเปลี่ยน หรือบัญชีถูกระงับ จะบันทึก marker ใน cache ไว้ตามอายุ
+access token ทำให้ token ที่ออกก่อนหน้าใช้ไม่ได้ทันที ผู้ใช้ต้อง refresh
+(serializer ของ refresh อ่าน role ล่าสุดจากฐานข้อมูล)
+
+marker มีผลกับทุก worker เฉพาะเมื่อ cache แชร์กันระหว่าง process (แนะนำสำหรับ production)
+ถ้าใช้ cache ของ process (LocMemCache ค่าเริ่มต้น) จะตรวจ is_active/role/department กับฐานข้อมูลแทน
+และจำ token ที่ผ่านการตรวจไว้ใน process AUTH_TOKEN_CHECK_TTL วินาที (query เดียวต่อ token ต่อช่วงเวลา)
+การระงับบัญชี/เปลี่ยนบทบาทจึงมีผลทันทีใน process ที่บันทึก และใน worker อื่นภายในเวลานั้น
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import cache_is_shared
+from .models import UserProfile
+
+CLAIMS_CACHE_PREFIX = 'auth:claims'
+
+# jti ของ token ที่ผ่าน check_token_user แล้ว -> (user_id, เวลาหมดอายุ) เฉพาะ process นี้
+_verified_tokens = {}
+VERIFIED_TOKENS_MAX = 10000
+
+
+def _claims_key(user_id):
+    return f'{CLAIMS_CACHE_PREFIX}:{user_id}'
+
+
+def _marker_timeout():
+    return int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+
+
+def add_role_claims(token, user):
+    """ใส่ username, role และ department ล่าสุดจากฐานข้อมูลลงใน token"""
+    profile = UserProfile.objects.filter(user_id=user.pk).first()
+    token['username'] = user.username
+    token.payload.update(
+        profile.token_claims() if profile else {'role': None, 'department': ''}
+    )
+    return token
+
+
+def invalidate_user_tokens(user_id, claims):
+    """token ที่ออกก่อนหน้านี้และมี claims ไม่ตรงกับ claims ปัจจุบันจะใช้ไม่ได้"""
+    forget_verified_tokens(user_id)
+    cache.set(
+        _claims_key(user_id),
+        {'not_before': int(time.time()), **claims},
+        _marker_timeout()
+    )
+
+
+def revoke_user_tokens(user_id):
+    """ปฏิเสธ access token ทั้งหมดของผู้ใช้ (เช่น บัญชีถูกระงับ)"""
+    forget_verified_tokens(user_id)
+    cache.set(_claims_key(user_id), {'revoked': True}, _marker_timeout())
+
+
+def restore_user_tokens(user_id):
+    """บัญชีที่เปิดใช้งานอีกครั้ง: token ใหม่ใช้ได้ แต่ token ก่อนถูกระงับยังใช้ไม่ได้"""
+    marker = cache.get(_claims_key(user_id))
+    if marker and marker.get('revoked'):
+        invalidate_user_tokens(user_id, {})
+
+
+def check_token_claims(token):
+    marker = cache.get(_claims_key(token[api_settings.USER_ID_CLAIM]))
+    if marker is None:
+        return
+    if marker.get('revoked'):
+        raise AuthenticationFailed('บัญชีผู้ใช้ถูกระงับ', code='user_inactive')
+    issued_at = token.get('iat', 0)
+    # token ที่ออกในวินาทีเดียวกับการเปลี่ยนแปลงยังใช้ได้ถ้า claims ตรงกับค่าปัจจุบัน
+    stale = issued_at < marker['not_before'] or (
+        issued_at == marker['not_before'] and any(
+            token.get(name) != value for name, value in marker.items() if name != 'not_before'
+        )
+    )
+    if stale:
+        raise AuthenticationFailed(
+            'สิทธิ์ของผู้ใช้มีการเปลี่ยนแปลง กรุณา refresh token', code='token_outdated'
+        )
+
+
+def check_token_user(token):
+    """ตรวจ token กับผู้ใช้ในฐานข้อมูลด้วย query เดียว (ใช้แทน marker เมื่อ cache ไม่แชร์)"""
+    row = User.objects.filter(pk=token[api_settings.USER_ID_CLAIM]).values_list(
+        'is_active', 'profile__role', 'profile__department'
+    ).first()
+    if row is None:
+        raise AuthenticationFailed('ไม่พบผู้ใช้', code='user_not_found')
+    is_active, role, department = row
+    if not is_active:
+        raise AuthenticationFailed('บัญชีผู้ใช้ถูกระงับ', code='user_inactive')
+    if token.get('role') != role or token.get('department', '') != (department or ''):
+        raise AuthenticationFailed(
+            'สิทธิ์ของผู้ใช้มีการเปลี่ยนแปลง กรุณา refresh token', code='token_outdated'
+        )
+
+
+def _remember_verified(token):
+    jti = token.get(api_settings.JTI_CLAIM)
+    if settings.AUTH_TOKEN_CHECK_TTL <= 0 or jti is None:
+        return
+    now = time.monotonic()
+    if len(_verified_tokens) >= VERIFIED_TOKENS_MAX:
+        for key, (_, expires) in list(_verified_tokens.items()):
+            if expires <= now:
+                _verified_tokens.pop(key, None)
+        if len(_verified_tokens) >= VERIFIED_TOKENS_MAX:
+            _verified_tokens.clear()
+    # claim user_id อาจเป็นสตริง (ขึ้นกับรุ่นของ simplejwt) เก็บเป็นสตริงเสมอ
+    _verified_tokens[jti] = (
+        str(token[api_settings.USER_ID_CLAIM]), now + settings.AUTH_TOKEN_CHECK_TTL
+    )
+
+
+def forget_verified_tokens(user_id=None):
+    """ให้ token ของ user_id (หรือทุกคนเมื่อเป็น None) ถูกตรวจกับฐานข้อมูลอีกครั้งใน process นี้"""
+    for key, (owner, _) in list(_verified_tokens.items()):
+        if user_id is None or owner == str(user_id):
+            _verified_tokens.pop(key, None)
+
+
+def verify_token_user(token, fresh=False):
+    """token ที่มี claim role ยังใช้ได้หรือไม่ (บัญชีถูกระงับ/ลบ หรือสิทธิ์เปลี่ยน)
+
+    fresh=True: ไม่ใช้ผลที่จำไว้ใน process (สำหรับการตรวจซ้ำเป็นระยะของ stream ที่เปิดค้าง)
+    """
+    if cache_is_shared():
+        check_token_claims(token)
+        return
+    verified = _verified_tokens.get(token.get(api_settings.JTI_CLAIM))
+    if not fresh and verified and verified[1] > time.monotonic():
+        return
+    check_token_user(token)
+    _remember_verified(token)
+
+
+class RoleRefreshToken(RefreshToken):
+    """refresh token ที่ access token ใหม่ได้ role/department ล่าสุดจากฐานข้อมูลเสมอ"""
+
+    @property
+    def access_token(self):
+        access = super().access_token
+        user = User.objects.filter(pk=self[api_settings.USER_ID_CLAIM]).first()
+        if user is not None:
+            add_role_claims(access, user)
+        return access
+
+
+class RoleTokenUser(TokenUser):
+    """ผู้ใช้จาก token ที่มีบทบาทและแผนก (ไม่มีข้อมูลในฐานข้อมูล)"""
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def department(self):
+        return self.token.get('department', '')
+
+
+class RoleJWTAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentication ที่ไม่ query User/UserProfile เมื่อ token มี claim role (และ cache แชร์)"""
+    # True: ตรวจกับฐานข้อมูลทุกครั้งเมื่อ cache ไม่แชร์ (ดู verify_token_user)
+    fresh = False
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token:
+            # token ที่ออกก่อนมี claim role: โหลดผู้ใช้และบทบาทจากฐานข้อมูลแบบเดิม
+            user = JWTAuthentication.get_user(self, validated_token)
+            user.role = UserProfile.objects.filter(user=user).values_list(
+                'role', flat=True
+            ).first()
+            return user
+        verify_token_user(validated_token, fresh=self.fresh)
+        return RoleTokenUser(validated_token)
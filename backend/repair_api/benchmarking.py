@@ -0,0 +1,117 @@
+# repair_api/benchmarking.py
+
+import contextlib
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+from .seeding import generate_dataset
+
+
+@contextlib.contextmanager
+def benchmark_database(keepdb=False, on_disk=False):
+    """สร้างฐานข้อมูลทดสอบแยก เพื่อไม่ให้ข้อมูลจำลองปนกับข้อมูลจริง
+
+    on_disk=True ให้ SQLite ใช้ไฟล์แทน in-memory (จำเป็นเมื่อเขียนพร้อมกันหลาย thread)
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if connection.vendor == 'sqlite':
+        # ไม่ใช้ TEST NAME ของ settings (ไฟล์ของชุดทดสอบ) ค่า None คือ in-memory
+        test_settings['NAME'] = str(settings.BASE_DIR / 'benchmark.sqlite3') if on_disk else None
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False, keepdb=keepdb
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        test_settings['NAME'] = old_test_name
+
+
+def simulate_query_latency(seconds):
+    """หน่วงทุก query ของ connection ที่สร้างหลังจากนี้ (จำลองฐานข้อมูลที่อยู่คนละเครื่อง)"""
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install, weak=False)
+
+
+class QueryCounter:
+    """นับ query ของทุก connection ในทุก thread ตั้งแต่สร้าง
+
+    CaptureQueriesContext เห็นเฉพาะ connection ของ thread ปัจจุบัน แต่ view แบบ async
+    ส่ง query บางส่วนไปยัง connection ของ thread อื่น (repair_api.stats)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        connection_created.connect(self._install, weak=False)
+        self._install(None, connection)
+
+    def _install(self, sender, connection, **kwargs):
+        if self._count not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self._count)
+
+    def _count(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(samples, pct):
+    """percentile แบบ nearest-rank จากรายการตัวเลข"""
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed_dataset(requests, users=200, technicians=20, equipment=1000,
+                 batch_size=5000, seed=0, log=None):
+    """เพิ่มคำร้องจำลอง requests รายการ (ไม่สร้างประวัติ) ด้วย repair_api.seeding
+
+    ผู้ใช้ หมวดหมู่ และอุปกรณ์จะถูกสร้างเพิ่มจนครบจำนวนที่กำหนดเท่านั้น
+    จึงเรียกซ้ำบนฐานข้อมูลเดิมเพื่อขยายขนาดข้อมูลได้
+    """
+    # ใช้ภายใน benchmark_database ซึ่งไม่มีผู้ใช้งานอื่น จึงเลื่อนการสร้าง index ไปตอนจบได้
+    return generate_dataset(
+        requests, users=users, technicians=technicians, equipment=equipment,
+        histories=False, batch_size=batch_size, defer_indexes=True, seed=seed, log=log,
+    )
+
+
+def explain(sql):
+    """คืนแผนการ query (EXPLAIN) เป็นรายการบรรทัดข้อความ"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}')
+        rows = cursor.fetchall()
+    # SQLite: (id, parent, notused, detail), PostgreSQL: (line,)
+    return [row[-1] for row in rows]
+
+
+def full_table_scans(plan_lines):
+    """ชื่อตารางที่ถูก scan ทั้งตาราง (ไม่ใช้ index) ในแผนการ query"""
+    tables = []
+    for line in plan_lines:
+        line = line.strip().lstrip('-> ').strip()
+        if connection.vendor == 'sqlite':
+            match = re.match(r'SCAN (?:TABLE )?(\w+)(.*)', line)
+            if match and 'USING' not in match.group(2):
+                tables.append(match.group(1))
+        else:
+            match = re.match(r'(?:Parallel )?Seq Scan on (\w+)', line)
+            if match:
+                tables.append(match.group(1))
+    return tables
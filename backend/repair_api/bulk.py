@@ -0,0 +1,111 @@
+# repair_api/bulk.py
+"""
+แก้ไขคำร้องหลายรายการในครั้งเดียว (มอบหมายงาน / เปลี่ยนสถานะ / ยกเลิก)
+
+ใช้ queryset.update() และ bulk_create() ซึ่งไม่เรียก save() และ signal
+จึงต้องปรับตัวนับสถานะ ล้าง cache ของแดชบอร์ด เปลี่ยน version ของตาราง (ETag)
+ส่ง event การเปลี่ยนแปลง (repair_api.events) และบันทึกวันที่ที่สรุปรายวัน
+(repair_api.analytics) ต้องคำนวณใหม่เอง
+"""
+
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .analytics import local_days, mark_dirty
+from .cache import bump_table_versions
+from .events import publish_on_commit, repair_request_event
+from .models import OPEN_STATUSES, RepairHistory, RepairRequest
+from .rollups import apply_rollup_deltas
+from .stats import invalidate_dashboard_stats
+
+
+def _item_error(row, action, status, assigned_to):
+    """เหตุผลที่แก้ไขคำร้องแถวนี้ไม่ได้ (None = แก้ไขได้)"""
+    if action == 'cancel' and row['status'] not in OPEN_STATUSES:
+        return 'ยกเลิกได้เฉพาะคำร้องที่ยังไม่ปิดงาน'
+    if action == 'assign':
+        if row['status'] == 'assigned' and row['assigned_to_id'] == assigned_to.id:
+            return 'มอบหมายให้ช่างคนนี้อยู่แล้ว'
+    elif row['status'] == status:
+        return 'คำร้องอยู่ในสถานะนี้อยู่แล้ว'
+    return None
+
+
+def bulk_update_requests(queryset, ids, user, action, status=None, assigned_to=None,
+                         comment=''):
+    """แก้ไขคำร้องตาม ids ที่อยู่ใน queryset (สิทธิ์การมองเห็นของผู้เรียก)
+
+    action: 'assign' (ต้องมี assigned_to), 'set_status' (ต้องมี status) หรือ 'cancel'
+    คืนค่า (รายการ id ที่แก้ไขแล้ว, รายการ {'id', 'error'} ของแถวที่แก้ไขไม่ได้)
+    """
+    if action == 'assign':
+        status = 'assigned'
+        comment = comment or f'มอบหมายงานให้ {assigned_to.get_full_name()}'
+    elif action == 'cancel':
+        status = 'cancelled'
+
+    ids = list(dict.fromkeys(ids))
+    now = timezone.now()
+    errors = []
+
+    with transaction.atomic():
+        # lock แถวที่จะแก้ไขก่อนอ่านสถานะเดิม เพื่อให้ตัวนับสถานะถูกต้อง
+        rows = {
+            row['id']: row
+            for row in RepairRequest.objects.select_for_update().filter(
+                pk__in=queryset.filter(pk__in=ids).values('pk')
+            ).values(
+                'id', 'request_number', 'requester_id', 'assigned_to_id', 'status',
+                'request_date', 'assigned_date', 'completed_date'
+            )
+        }
+
+        updated = []
+        events = []
+        deltas = Counter()
+        dirty_days = local_days(now)
+        for pk in ids:
+            row = rows.get(pk)
+            error = 'ไม่พบคำร้อง' if row is None else _item_error(
+                row, action, status, assigned_to
+            )
+            if error:
+                errors.append({'id': pk, 'error': error})
+                continue
+            new_assignee = assigned_to.id if action == 'assign' else row['assigned_to_id']
+            old_key = (row['requester_id'], row['assigned_to_id'], row['status'])
+            new_key = (row['requester_id'], new_assignee, status)
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+            updated.append(pk)
+            dirty_days |= local_days(
+                row['request_date'], row['assigned_date'], row['completed_date']
+            )
+            events.append(repair_request_event(
+                'updated', pk, row['request_number'], old_key, new_key
+            ))
+
+        if updated:
+            # update() ไม่อัพเดท auto_now จึงต้องกำหนด updated_at เอง
+            changes = {'status': status, 'updated_at': now}
+            if action == 'assign':
+                changes.update(assigned_to=assigned_to, assigned_date=now)
+            elif status == 'completed':
+                changes['completed_date'] = now
+            RepairRequest.objects.filter(pk__in=updated).update(**changes)
+
+            apply_rollup_deltas(deltas)
+            mark_dirty(dirty_days)
+            RepairHistory.objects.bulk_create([
+                RepairHistory(
+                    repair_request_id=pk, updated_by_id=user.id, status=status, comment=comment
+                )
+                for pk in updated
+            ])
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(lambda: bump_table_versions(RepairRequest, RepairHistory))
+            publish_on_commit(events)
+
+    return updated, errors
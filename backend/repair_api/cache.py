@@ -0,0 +1,230 @@
+# repair_api/cache.py
+"""
+cache ของข้อมูลอ้างอิงที่อ่านบ่อยแต่เปลี่ยนน้อย (รายชื่อช่าง หมวดหมู่ อุปกรณ์)
+
+- key มี version ของทุกตารางที่ข้อมูลขึ้นอยู่ (เวลาที่เขียนล่าสุด) เมื่อ signal
+  post_save/post_delete เปลี่ยน version key เดิมทั้งหมดจะไม่ถูกใช้อีก (ไม่ต้องลบทีละ key)
+- กัน stampede: เมื่อ miss พร้อมกันหลาย worker จะมีเพียงตัวเดียวที่คำนวณ (cache.add เป็น lock)
+  ตัวอื่นใช้ค่าก่อนหน้า (stale) ถ้ามี หรือรอค่าจากตัวที่ถือ lock
+- นับ hit/miss ต่อชื่อ cache ไว้ใน process สำหรับ monitoring
+
+ใช้ได้กับ cache backend ใดก็ได้ของ Django (ตั้งค่าใน CACHES)
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import CACHE_LOOKUPS
+
+TABLE_VERSION_PREFIX = 'table_version'
+REFERENCE_CACHE_PREFIX = 'ref'
+# เวลาสูงสุดที่ worker หนึ่งถือ lock ระหว่างคำนวณ และระยะที่ worker อื่นรอ
+LOCK_TIMEOUT = 10
+WAIT_INTERVAL = 0.05
+
+
+# backend ที่เก็บค่าในหน่วยความจำของ process (หรือไม่เก็บเลย) process อื่นมองไม่เห็นค่าที่เขียน
+LOCAL_CACHE_BACKENDS = ('LocMemCache', 'DummyCache')
+
+
+def cache_is_shared():
+    """cache default แชร์ค่าระหว่าง process (worker) หรือไม่"""
+    return not settings.CACHES['default']['BACKEND'].endswith(LOCAL_CACHE_BACKENDS)
+
+
+def _version_key(model):
+    return f'{TABLE_VERSION_PREFIX}:{model._meta.label_lower}'
+
+
+def _database_versions(models):
+    """version จากตาราง TableVersion (query เดียว) ทุก process เห็นค่าเดียวกัน"""
+    from .models import TableVersion
+
+    labels = [model._meta.label_lower for model in models]
+    versions = dict(TableVersion.objects.filter(label__in=labels).values_list('label', 'version'))
+    missing = [label for label in labels if label not in versions]
+    if missing:
+        # ยังไม่เคยมีการเขียนตั้งแต่สร้างตาราง: เริ่มด้วยเวลาปัจจุบันเหมือน key ที่หายจาก cache
+        now = time.time_ns()
+        TableVersion.objects.bulk_create(
+            [TableVersion(label=label, version=now) for label in missing], ignore_conflicts=True
+        )
+        versions.update(
+            TableVersion.objects.filter(label__in=missing).values_list('label', 'version')
+        )
+    return [versions.get(label, 0) for label in labels]
+
+
+def table_versions(models):
+    """version (nanoseconds ของการเขียนล่าสุด) ของแต่ละโมเดล
+
+    cache ที่แชร์ระหว่าง process อ่านด้วย get_many ครั้งเดียว ส่วน cache ของ process (LocMemCache)
+    ไม่เห็นการเขียนของ worker อื่น จึงอ่านจากตาราง TableVersion แทน
+    """
+    if not cache_is_shared():
+        return _database_versions(models)
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # key หายไป (เพิ่งเริ่มหรือถูก cull) เริ่มใหม่ด้วยเวลาปัจจุบัน ไม่ชนกับค่าเก่า
+        for key, value in missing.items():
+            cache.add(key, value, None)
+        versions.update(cache.get_many(list(missing)))
+    return [versions.get(key, 0) for key in keys]
+
+
+async def atable_versions(models):
+    """table_versions สำหรับ async view"""
+    if not cache_is_shared():
+        return await sync_to_async(_database_versions)(models)
+    keys = [_version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        for key, value in missing.items():
+            await cache.aadd(key, value, None)
+        versions.update(await cache.aget_many(list(missing)))
+    return [versions.get(key, 0) for key in keys]
+
+
+def bump_table_versions(*models):
+    """บันทึกว่าตารางมีการเขียน (เรียกหลัง commit) ทำให้ key/ETag ที่อิง version เดิมใช้ไม่ได้"""
+    now = time.time_ns()
+    if not cache_is_shared():
+        from .models import TableVersion
+
+        TableVersion.objects.bulk_create(
+            [TableVersion(label=model._meta.label_lower, version=now) for model in models],
+            update_conflicts=True, unique_fields=['label'], update_fields=['version'],
+        )
+        return
+    cache.set_many({_version_key(model): now for model in models}, None)
+
+
+class CacheStats:
+    """ตัวนับ hit/miss/stale/wait ต่อชื่อ cache ของ process นี้ (ส่งต่อให้ /metrics ด้วย)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, name, outcome):
+        with self._lock:
+            self._counts[(name, outcome)] += 1
+        CACHE_LOOKUPS.labels(name, outcome).inc()
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        result = {}
+        for (name, outcome), value in sorted(counts.items()):
+            result.setdefault(name, {'hit': 0, 'miss': 0, 'stale': 0, 'wait': 0})[outcome] = value
+        for values in result.values():
+            lookups = values['hit'] + values['miss'] + values['stale'] + values['wait']
+            values['hit_ratio'] = round((lookups - values['miss']) / lookups, 4) if lookups else 0
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def _key(name, versions, variant):
+    digest = hashlib.md5(f'{variant}'.encode('utf-8')).hexdigest()
+    version = '.'.join(map(str, versions))
+    return (
+        f'{REFERENCE_CACHE_PREFIX}:{name}:{digest}:{version}',
+        f'{REFERENCE_CACHE_PREFIX}:{name}:{digest}:stale',
+        f'{REFERENCE_CACHE_PREFIX}:{name}:{digest}:lock',
+    )
+
+
+def cached_reference(name, models, compute, variant='', timeout=None):
+    """คืนค่าจาก cache ถ้า version ของ models ยังไม่เปลี่ยน ไม่เช่นนั้นเรียก compute()
+
+    variant แยกค่าที่ขึ้นกับ request (เช่น query string หรือ pk)
+    """
+    timeout = settings.REFERENCE_CACHE_TTL if timeout is None else timeout
+    key, stale_key, lock_key = _key(name, table_versions(models), variant)
+
+    value = cache.get(key)
+    if value is not None:
+        stats.record(name, 'hit')
+        return value
+
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        # มี worker อื่นกำลังคำนวณ: ใช้ค่าก่อนหน้าไปก่อน หรือรอค่าใหม่
+        stale = cache.get(stale_key)
+        if stale is not None:
+            stats.record(name, 'stale')
+            return stale
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(WAIT_INTERVAL)
+            value = cache.get(key)
+            if value is not None:
+                stats.record(name, 'wait')
+                return value
+            if cache.get(lock_key) is None:
+                break
+
+    stats.record(name, 'miss')
+    try:
+        value = compute()
+        cache.set_many({key: value, stale_key: value}, timeout)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+async def acached_reference(name, models, compute, variant='', timeout=None):
+    """cached_reference สำหรับ async view: compute เป็น coroutine function
+
+    ใช้ key, lock และตัวนับชุดเดียวกับ cached_reference จึงแชร์ค่าใน cache กับ view แบบ sync
+    """
+    timeout = settings.REFERENCE_CACHE_TTL if timeout is None else timeout
+    key, stale_key, lock_key = _key(name, await atable_versions(models), variant)
+
+    value = await cache.aget(key)
+    if value is not None:
+        stats.record(name, 'hit')
+        return value
+
+    locked = await cache.aadd(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        stale = await cache.aget(stale_key)
+        if stale is not None:
+            stats.record(name, 'stale')
+            return stale
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            # รอโดยไม่ block event loop
+            await asyncio.sleep(WAIT_INTERVAL)
+            value = await cache.aget(key)
+            if value is not None:
+                stats.record(name, 'wait')
+                return value
+            if await cache.aget(lock_key) is None:
+                break
+
+    stats.record(name, 'miss')
+    try:
+        value = await compute()
+        await cache.aset_many({key: value, stale_key: value}, timeout)
+    finally:
+        if locked:
+            await cache.adelete(lock_key)
+    return value
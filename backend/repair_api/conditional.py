@@ -0,0 +1,104 @@
+# repair_api/conditional.py
+"""
+Conditional GET (ETag / Last-Modified) สำหรับ endpoint ที่อ่านข้อมูล
+
+validator คำนวณจาก version ของแต่ละตาราง (เวลาที่มีการเขียนล่าสุด เก็บใน cache)
+ไม่ต้อง query หรือ serialize ข้อมูล ถ้า client ส่ง If-None-Match / If-Modified-Since
+ที่ยังตรงกัน จะตอบ 304 Not Modified ก่อนเรียก handler
+
+version ถูกเปลี่ยนหลัง commit ทุกครั้งที่มีการเขียน (signals, bulk update, import)
+ถ้า key หายไปจาก cache จะเริ่มใหม่ด้วยเวลาปัจจุบัน (client แค่โหลดข้อมูลใหม่)
+เมื่อ cache ไม่แชร์ระหว่าง process (LocMemCache) version อ่านจากตาราง TableVersion
+ในฐานข้อมูลแทน (query เดียว) worker อื่นจึงไม่ตอบ 304 ด้วยข้อมูลเก่า
+"""
+
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import APIException
+
+from .cache import atable_versions, table_versions
+from .models import get_user_role
+
+
+def request_validators(request, models):
+    """คืน (etag, last_modified) ของ request จาก version ของตารางที่ response ขึ้นอยู่"""
+    return _validators(request, table_versions(models))
+
+
+def _validators(request, versions):
+    user = request.user
+    # response ขึ้นกับผู้ใช้ (สิทธิ์ตามบทบาท) path/query string และรูปแบบที่ตอบกลับ
+    parts = [
+        str(user.pk), str(get_user_role(user)), request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''), *map(str, versions),
+    ]
+    etag = hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+    return etag, max(versions) // 1_000_000_000
+
+
+class NotModified(APIException):
+    """หยุดการทำงานของ view และตอบด้วย response 304 ที่เตรียมไว้"""
+    status_code = 304
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def _patch_headers(response, etag, last_modified):
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(last_modified)
+    # ให้ browser ถามกลับทุกครั้ง (If-None-Match) แทนการใช้ข้อมูลเก่าโดยไม่ถาม
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+def _conditional_response(django_request, etag, last_modified):
+    """คืน (response 304 หรือ None, ฟังก์ชันเติม header ใน response)"""
+    not_modified = get_conditional_response(
+        django_request, etag=quote_etag(etag), last_modified=last_modified
+    )
+    if not_modified is not None:
+        not_modified = _patch_headers(not_modified, etag, last_modified)
+    return not_modified, lambda response: _patch_headers(response, etag, last_modified)
+
+
+def conditional_get(request, models):
+    """สำหรับ function view: คืน (response 304 หรือ None, ฟังก์ชันเติม header ใน response)"""
+    etag, last_modified = request_validators(request, models)
+    return _conditional_response(request._request, etag, last_modified)
+
+
+async def aconditional_get(request, models):
+    """conditional_get สำหรับ async view (request เป็น HttpRequest ของ Django ที่มี user แล้ว)"""
+    etag, last_modified = _validators(request, await atable_versions(models))
+    return _conditional_response(request, etag, last_modified)
+
+
+class ConditionalGetMixin:
+    """เพิ่ม ETag/Last-Modified ให้ทุก GET ของ ViewSet ตาม version ของ etag_models"""
+    etag_models = ()
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validators = None
+        if request.method in ('GET', 'HEAD') and self.etag_models:
+            self._validators = request_validators(request, self.etag_models)
+            not_modified, _ = _conditional_response(request._request, *self._validators)
+            if not_modified is not None:
+                raise NotModified(not_modified)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators and response.status_code == 200:
+            _patch_headers(response, *validators)
+        return response
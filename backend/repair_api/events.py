@@ -0,0 +1,288 @@
+# repair_api/events.py
+"""
+เหตุการณ์การเปลี่ยนสถานะ/การมอบหมายของคำร้องซ่อม สำหรับส่งแบบ real-time (repair_api.sse)
+
+- signal และ bulk update สร้าง event แล้วส่งเข้า broker หลัง commit
+- broker กระจาย event ไปยังทุก connection ที่เปิดอยู่ (fan-out) แต่ละ connection
+  กรองด้วยกฎเดียวกับ RepairRequestQuerySet.visible_to
+- DatabaseBroker (ค่าเริ่มต้น) ส่งผ่านตาราง StreamEvent: API (gunicorn หลาย worker) เขียน event
+  process ของ SSE (uvicorn) อ่าน event ใหม่ทุก EVENT_POLL_SECONDS ด้วย query เดียวต่อ process
+  แล้วกระจายให้ทุก connection
+- InProcessBroker ส่งได้เฉพาะใน process เดียวกัน (ใช้เมื่อ process เดียวทั้งเขียนข้อมูลและเปิด stream)
+- broker อื่น (เช่น Redis pub/sub) ต้องมี publish(event) และ asubscribe(last_event_id, accepts)
+  แบบเดียวกัน แล้วตั้ง EVENT_BROKER
+"""
+
+import asyncio
+import itertools
+import threading
+import uuid
+from collections import defaultdict, deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import StreamEvent
+from .stats import in_own_connection
+
+
+def can_see(key, user_id, role):
+    """ผู้ใช้เห็นคำร้องที่มี (requester_id, assigned_to_id, status) นี้หรือไม่
+
+    ต้องตรงกับ RepairRequestQuerySet.visible_to
+    """
+    requester_id, assigned_to_id, status = key
+    if role == 'admin':
+        return True
+    if role == 'technician':
+        return assigned_to_id == user_id or status == 'pending'
+    return requester_id == user_id
+
+
+def repair_request_event(kind, pk, request_number, old_key, new_key):
+    """event ของคำร้อง old_key/new_key เป็น (requester_id, assigned_to_id, status)"""
+    return {
+        'type': kind,
+        'id': pk,
+        'request_number': request_number,
+        'requester': (new_key or old_key)[0],
+        'assigned_to': new_key[1] if new_key else None,
+        'status': new_key[2] if new_key else None,
+        'previous_assigned_to': old_key[1] if old_key else None,
+        'previous_status': old_key[2] if old_key else None,
+        'timestamp': timezone.now().isoformat(),
+        # ใช้ตรวจสิทธิ์ ไม่ส่งให้ client
+        'keys': [key for key in (old_key, new_key) if key],
+    }
+
+
+def visible_to(event, user_id, role):
+    """เห็น event ถ้าเห็นคำร้องก่อนหรือหลังการเปลี่ยนแปลง (เช่น ช่างเห็นงาน pending ถูกรับไป)"""
+    return any(can_see(key, user_id, role) for key in event['keys'])
+
+
+def publish_on_commit(events):
+    """ส่ง events เข้า broker หลัง commit (ไม่ส่งถ้า rollback)"""
+    def publish():
+        broker = get_broker()
+        for event in events:
+            broker.publish(event)
+
+    if events:
+        transaction.on_commit(publish)
+
+
+class Subscription:
+    """คิวของ connection หนึ่ง ผูกกับ event loop ที่สร้าง
+
+    accepts(event) กรอง event ก่อนเข้าคิว connection ที่ไม่เกี่ยวข้องจึงไม่ถูกปลุก
+    """
+
+    def __init__(self, broker, max_size, accepts=None):
+        self.broker = broker
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(max_size)
+        self.accepts = accepts
+        # client อ่านไม่ทัน: ปิด connection ให้ต่อใหม่ด้วย Last-Event-ID แทนการกินหน่วยความจำ
+        self.overflowed = False
+
+    def put(self, event):
+        """เรียกใน event loop ของ subscription เท่านั้น"""
+        if self.overflowed or (self.accepts and not self.accepts(event)):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def wake(self):
+        """ให้ get() ที่รออยู่คืน None ทันที"""
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout):
+        """event ถัดไป หรือ None เมื่อหมดเวลา คิวล้น หรือถูก wake()"""
+        if self.overflowed:
+            return None
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+def _deliver(subscriptions, event):
+    for subscription in subscriptions:
+        subscription.put(event)
+
+
+class InProcessBroker:
+    """broker ในหน่วยความจำของ process พร้อมเก็บ event ล่าสุดไว้ส่งซ้ำเมื่อ client ต่อใหม่"""
+
+    def __init__(self, history_size=None, queue_size=None):
+        self.history = deque(maxlen=history_size or settings.EVENT_HISTORY_SIZE)
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        # id ของ event ขึ้นต้นด้วยรหัสของ broker นี้ Last-Event-ID จาก process อื่น
+        # (หรือก่อน restart) จึงไม่ถูกใช้เลือก event ผิดชุด
+        self.prefix = uuid.uuid4().hex[:8]
+        self.counter = itertools.count(1)
+
+    def publish(self, event):
+        """ส่ง event ให้ทุก subscription (เรียกจาก thread ใดก็ได้ เช่น view แบบ sync)"""
+        with self.lock:
+            event = {**event, 'event_id': f'{self.prefix}-{next(self.counter)}'}
+            self.history.append(event)
+            by_loop = defaultdict(list)
+            for subscription in self.subscribers:
+                by_loop[subscription.loop].append(subscription)
+        # ปลุกแต่ละ event loop ครั้งเดียว ไม่ใช่ครั้งละ connection
+        for loop, subscriptions in by_loop.items():
+            loop.call_soon_threadsafe(_deliver, subscriptions, event)
+        return event
+
+    async def asubscribe(self, last_event_id=None, accepts=None):
+        return self.subscribe(last_event_id, accepts)
+
+    def subscribe(self, last_event_id=None, accepts=None):
+        """สร้าง Subscription (เรียกใน event loop) คืน (subscription, event ที่พลาดไป)"""
+        subscription = Subscription(self, self.queue_size, accepts)
+        with self.lock:
+            self.subscribers.add(subscription)
+            missed = [
+                event for event in self._since(last_event_id)
+                if accepts is None or accepts(event)
+            ]
+        return subscription, missed
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscribers.discard(subscription)
+
+    def _since(self, last_event_id):
+        prefix, _, number = (last_event_id or '').partition('-')
+        if prefix != self.prefix or not number.isdigit():
+            return []
+        number = int(number)
+        return [
+            event for event in self.history
+            if int(event['event_id'].partition('-')[2]) > number
+        ]
+
+    def subscriber_count(self):
+        with self.lock:
+            return len(self.subscribers)
+
+
+class _LoopFeed:
+    """subscription ของ event loop หนึ่ง และ task ที่อ่าน event ใหม่ให้"""
+
+    def __init__(self):
+        self.subscribers = set()
+        # id ของ event ล่าสุดที่ส่งให้ subscriber ของ loop นี้แล้ว (None = ยังไม่เริ่ม)
+        self.cursor = None
+        self.task = None
+
+
+class DatabaseBroker:
+    """broker ผ่านตาราง StreamEvent ใช้ได้เมื่อ process ที่เขียนข้อมูลกับ process ที่เปิด stream แยกกัน
+
+    publish() เขียนหนึ่งแถวต่อ event (เรียกหลัง commit จาก process ใดก็ได้)
+    แต่ละ event loop ที่มี subscription อ่าน event ใหม่ทุก poll_seconds ด้วย query เดียว
+    ไม่ว่าจะเปิดอยู่กี่ connection และหยุดอ่านเมื่อไม่มี connection เหลือ
+    เก็บ event ล่าสุดไว้ history_size รายการสำหรับ client ที่ต่อใหม่ด้วย Last-Event-ID
+    """
+
+    def __init__(self, history_size=None, queue_size=None, poll_seconds=None):
+        self.history_size = history_size or settings.EVENT_HISTORY_SIZE
+        self.queue_size = queue_size or settings.EVENT_QUEUE_SIZE
+        self.poll_seconds = poll_seconds
+        self.feeds = {}
+
+    def publish(self, event):
+        row = StreamEvent.objects.create(payload=event)
+        if row.pk % self.history_size == 0:
+            # ลบ event เก่าเป็นช่วง ๆ แทนการลบทุกครั้งที่เขียน
+            StreamEvent.objects.filter(pk__lte=row.pk - self.history_size).delete()
+        return {**event, 'event_id': str(row.pk)}
+
+    @staticmethod
+    def _event(row_id, payload):
+        return {**payload, 'event_id': str(row_id)}
+
+    def _last_id(self):
+        return StreamEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def _between(self, after, until):
+        rows = StreamEvent.objects.filter(
+            pk__gt=max(after, until - self.history_size), pk__lte=until
+        ).order_by('pk')
+        return [self._event(pk, payload) for pk, payload in rows.values_list('pk', 'payload')]
+
+    def _after(self, after):
+        rows = StreamEvent.objects.filter(pk__gt=after).order_by('pk')
+        return [
+            self._event(pk, payload)
+            for pk, payload in rows.values_list('pk', 'payload')[:self.history_size]
+        ]
+
+    async def asubscribe(self, last_event_id=None, accepts=None):
+        """สร้าง Subscription คืน (subscription, event ที่พลาดไปหลัง last_event_id)"""
+        loop = asyncio.get_running_loop()
+        feed = self.feeds.setdefault(loop, _LoopFeed())
+        if feed.cursor is None:
+            # query ใน thread ของ executor ไม่ใช้ thread sync หลักที่ view ใช้ร่วมกัน
+            last_id = await in_own_connection(self._last_id)()
+            if feed.cursor is None:
+                feed.cursor = last_id
+        subscription = Subscription(self, self.queue_size, accepts)
+        subscription.feed = feed
+        # ไม่มี await ระหว่างอ่าน cursor กับเพิ่ม subscriber: event หลัง cursor มาจาก task อ่าน
+        # event ถึง cursor มาจาก missed จึงไม่ซ้ำและไม่ขาด
+        until = feed.cursor
+        feed.subscribers.add(subscription)
+        if feed.task is None or feed.task.done():
+            feed.task = loop.create_task(self._poll(loop, feed))
+
+        missed = []
+        if last_event_id and last_event_id.isdigit() and int(last_event_id) < until:
+            missed = [
+                event for event in await in_own_connection(self._between)(
+                    int(last_event_id), until
+                )
+                if accepts is None or accepts(event)
+            ]
+        return subscription, missed
+
+    async def _poll(self, loop, feed):
+        fetch = in_own_connection(self._after)
+        try:
+            while feed.subscribers:
+                await asyncio.sleep(self.poll_seconds or settings.EVENT_POLL_SECONDS)
+                events = await fetch(feed.cursor)
+                for event in events:
+                    _deliver(feed.subscribers, event)
+                if events:
+                    feed.cursor = int(events[-1]['event_id'])
+        finally:
+            if self.feeds.get(loop) is feed and not feed.subscribers:
+                del self.feeds[loop]
+
+    def unsubscribe(self, subscription):
+        subscription.feed.subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return sum(len(feed.subscribers) for feed in list(self.feeds.values()))
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.EVENT_BROKER)()
@@ -0,0 +1,173 @@
+# repair_api/export.py
+"""
+ส่งออกคำร้องพร้อมประวัติเป็น CSV หรือ NDJSON แบบ streaming
+
+อ่านคำร้องด้วย QuerySet.iterator(chunk_size) ทีละก้อน (prefetch ประวัติทีละก้อนเช่นกัน)
+และส่งออกทีละแถว หน่วยความจำจึงคงที่ไม่ว่าตารางจะใหญ่เท่าใด
+ภายใต้ ASGI ต้องห่อด้วย async_chunks() เพราะ Django 4.2 อ่าน iterator แบบ sync เข้า list ทั้งหมดก่อนส่ง
+"""
+
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import RepairHistory, RepairHistoryArchive
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+REQUEST_COLUMNS = [
+    'request_number', 'title', 'equipment_code', 'equipment_name', 'requester',
+    'assigned_to', 'priority', 'status', 'request_date', 'assigned_date',
+    'completed_date', 'estimated_cost', 'actual_cost', 'remarks',
+]
+HISTORY_COLUMNS = ['history_date', 'history_status', 'history_updated_by', 'history_comment']
+
+
+def export_queryset(queryset):
+    """เพิ่ม join/prefetch ที่ต้องใช้ และเรียงตาม id ให้ผลลัพธ์คงที่"""
+    return queryset.select_related(
+        'equipment', 'requester', 'assigned_to'
+    ).prefetch_related(
+        Prefetch(
+            'histories',
+            queryset=RepairHistory.objects.select_related('updated_by'),
+            # เก็บเป็น list ตรง ๆ ไม่ต้องสร้าง queryset ใหม่ทุกแถวแบบ obj.histories.all()
+            to_attr='export_histories'
+        ),
+        # ประวัติที่ถูกย้ายไปตาราง archive (repair_api.archive)
+        Prefetch(
+            'archived_histories',
+            queryset=RepairHistoryArchive.objects.select_related('updated_by'),
+            to_attr='export_archived_histories'
+        ),
+    ).order_by('id')
+
+
+def _histories(obj):
+    """ประวัติจากทั้งสองตาราง เรียงจากเก่าไปใหม่"""
+    histories = obj.export_histories + obj.export_archived_histories
+    histories.sort(key=lambda history: (history.created_at, history.id))
+    return histories
+
+
+def _request_record(obj):
+    return {
+        'request_number': obj.request_number,
+        'title': obj.title,
+        'equipment_code': obj.equipment.equipment_code,
+        'equipment_name': obj.equipment.name,
+        'requester': obj.requester.username,
+        'assigned_to': obj.assigned_to.username if obj.assigned_to else None,
+        'priority': obj.priority,
+        'status': obj.status,
+        'request_date': obj.request_date,
+        'assigned_date': obj.assigned_date,
+        'completed_date': obj.completed_date,
+        'estimated_cost': obj.estimated_cost,
+        'actual_cost': obj.actual_cost,
+        'remarks': obj.remarks,
+    }
+
+
+def _history_record(history):
+    return {
+        'history_date': history.created_at,
+        'history_status': history.status,
+        'history_updated_by': history.updated_by.username,
+        'history_comment': history.comment,
+    }
+
+
+class _Echo:
+    """file-like ที่คืนค่าที่เขียนกลับมา สำหรับใช้ csv.writer แบบ streaming"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(objects):
+    # หนึ่งบรรทัดต่อประวัติหนึ่งรายการ (คำร้องที่ยังไม่มีประวัติได้หนึ่งบรรทัด)
+    writer = csv.writer(_Echo())
+    # BOM ให้ Excel อ่านภาษาไทยใน UTF-8 ได้ถูกต้อง
+    yield '\ufeff' + writer.writerow(REQUEST_COLUMNS + HISTORY_COLUMNS)
+    for obj in objects:
+        request = list(_request_record(obj).values())
+        histories = _histories(obj) or [None]
+        for history in histories:
+            # คอลัมน์ประวัติว่างให้ครบทุกช่อง จำนวนคอลัมน์จึงตรงกับ header
+            values = (
+                list(_history_record(history).values()) if history
+                else [''] * len(HISTORY_COLUMNS)
+            )
+            yield writer.writerow(request + values)
+
+
+def _ndjson_lines(objects):
+    # หนึ่งบรรทัดต่อคำร้อง พร้อมประวัติแบบ nested
+    for obj in objects:
+        record = _request_record(obj)
+        record['histories'] = [_history_record(history) for history in _histories(obj)]
+        yield json.dumps(record, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def _buffered(lines, size=64 * 1024):
+    """รวมบรรทัดเป็นก้อนขนาดประมาณ size ไบต์ ลดจำนวนครั้งที่เขียนลง socket"""
+    buffer, length = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        length += len(data)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, export_format='csv', gzip=False, chunk_size=None):
+    """คืน generator ของ bytes สำหรับ StreamingHttpResponse หรือเขียนลงไฟล์"""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    objects = export_queryset(queryset).iterator(chunk_size=chunk_size)
+    lines = _csv_lines(objects) if export_format == 'csv' else _ndjson_lines(objects)
+    chunks = _buffered(lines)
+    return _gzipped(chunks) if gzip else chunks
+
+
+async def async_chunks(chunks):
+    """ห่อผลของ stream_export เป็น async iterator สำหรับ StreamingHttpResponse ภายใต้ ASGI
+
+    ดึงทีละก้อนผ่าน sync_to_async (thread_sensitive) ทุกก้อนจึงถูกอ่านบน thread เดียวกัน
+    cursor ของ QuerySet.iterator() ที่เปิดค้างไว้ยังใช้ต่อได้
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # client ตัดการเชื่อมต่อกลางทาง: ปิด generator เพื่อคืน cursor บน thread เดิม
+        await sync_to_async(chunks.close)()
+
+
+def export_filename(export_format, gzip=False):
+    extension = EXPORT_FORMATS[export_format][1]
+    return f'repair_requests.{extension}' + ('.gz' if gzip else '')
@@ -0,0 +1,162 @@
+# repair_api/health.py
+"""
+probe สำหรับ load balancer / orchestrator
+
+- /health/live/  liveness: process ยังตอบ request ได้ ไม่แตะฐานข้อมูลหรือ I/O ใด ๆ
+- /health/ready/ readiness: ตรวจฐานข้อมูล migration ที่ค้าง cache และการเขียนไฟล์ media
+  ตอบ 503 เมื่อมีข้อใดล้มเหลว ให้ load balancer หยุดส่ง request มาที่ worker นี้
+
+การตรวจแต่ละข้อรันใน thread pool ของตัวเอง (ไม่ใช้ thread ของ request หรือ thread sync หลักของ ASGI)
+และรอไม่เกิน HEALTH_CHECK_TIMEOUT ข้อที่ค้างอยู่จากรอบก่อนจะไม่ถูกส่งซ้ำ (ถือว่าล้มเหลว)
+ผลลัพธ์ใช้ซ้ำภายใน process เป็นเวลา HEALTH_CHECK_CACHE_SECONDS probe ที่มาถี่ ๆ จึงไม่เพิ่มโหลด
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+
+logger = logging.getLogger(__name__)
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def check_migrations():
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    if plan:
+        raise RuntimeError(f'{len(plan)} pending migrations')
+
+
+def check_cache():
+    key = f'health:{os.getpid()}'
+    token = uuid.uuid4().hex
+    cache.set(key, token, 60)
+    if cache.get(key) != token:
+        raise RuntimeError('cache did not return the value just written')
+
+
+def check_storage():
+    name = default_storage.save(f'.health/{os.getpid()}', ContentFile(b'ok'))
+    default_storage.delete(name)
+
+
+CHECKS = {
+    'database': check_database,
+    'migrations': check_migrations,
+    'cache': check_cache,
+    'storage': check_storage,
+}
+
+
+class ReadinessProbe:
+    """ผลการตรวจ readiness ล่าสุดของ process นี้ (คำนวณใหม่เมื่อเก่ากว่า cache_seconds)"""
+
+    def __init__(self, checks):
+        self.checks = checks
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=len(checks), thread_name_prefix='health')
+        self._running = {}
+        self._result = None
+        self._checked_at = 0.0
+        # ตรวจ migration ครบแล้วครั้งหนึ่งไม่ต้องตรวจซ้ำ (เปลี่ยนได้เฉพาะตอน deploy ซึ่งเริ่ม process ใหม่)
+        self._migrated = False
+
+    def cached(self):
+        """ผลลัพธ์ที่ยังไม่หมดอายุ หรือ None"""
+        age = time.monotonic() - self._checked_at
+        if self._result is not None and age < settings.HEALTH_CHECK_CACHE_SECONDS:
+            return self._result
+        return None
+
+    def result(self):
+        # probe ที่มาพร้อมกันรอรอบเดียวกัน แทนการตรวจซ้ำทุกตัว
+        with self._lock:
+            result = self.cached()
+            if result is None:
+                result = self._check()
+                self._result, self._checked_at = result, time.monotonic()
+            return result
+
+    def _run(self, func):
+        started = time.perf_counter()
+        try:
+            func()
+        finally:
+            # ปิด connection ของ thread นี้ รอบถัดไปจึงตรวจการเปิด connection ใหม่ด้วย
+            connection.close()
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    def _check(self):
+        checks = {}
+        futures = {}
+        for name, func in self.checks.items():
+            if name == 'migrations' and self._migrated:
+                checks[name] = {'ok': True}
+                continue
+            running = self._running.get(name)
+            if running is not None and not running.done():
+                checks[name] = {'ok': False, 'error': 'previous check still running'}
+                continue
+            futures[name] = self._running[name] = self._executor.submit(self._run, func)
+
+        wait(futures.values(), timeout=settings.HEALTH_CHECK_TIMEOUT)
+        for name, future in futures.items():
+            if not future.done():
+                checks[name] = {'ok': False, 'error': 'timeout'}
+                continue
+            exc = future.exception()
+            if exc is None:
+                checks[name] = {'ok': True, 'ms': future.result()}
+                if name == 'migrations':
+                    self._migrated = True
+            else:
+                # รายละเอียด (host, path) ไปที่ log เท่านั้น endpoint นี้เรียกได้โดยไม่ต้องยืนยันตัวตน
+                logger.warning('readiness check %s ล้มเหลว: %r', name, exc)
+                checks[name] = {'ok': False, 'error': type(exc).__name__}
+
+        ok = all(check['ok'] for check in checks.values())
+        return {
+            'status': 'ok' if ok else 'unavailable',
+            'checked_at': timezone.now().isoformat(),
+            'checks': {name: checks[name] for name in self.checks},
+        }
+
+
+readiness_probe = ReadinessProbe(CHECKS)
+
+
+@csrf_exempt
+def liveness(request):
+    """Liveness probe: ไม่มี I/O ตอบได้แปลว่า process ยังรับ request ได้"""
+    return JsonResponse({'status': 'ok'})
+
+
+async def readiness(request):
+    """Readiness probe: 503 เมื่อฐานข้อมูล migration cache หรือ storage มีปัญหา"""
+    result = readiness_probe.cached()
+    if result is None:
+        # รอใน thread แยก ไม่ block event loop หรือ thread sync หลักที่ view อื่นใช้
+        result = await asyncio.to_thread(readiness_probe.result)
+    return JsonResponse(result, status=200 if result['status'] == 'ok' else 503)
+
+
+# csrf_exempt ของ Django 4.2 คืนฟังก์ชัน sync จึงตั้ง attribute เอง
+readiness.csrf_exempt = True
@@ -0,0 +1,169 @@
+# repair_api/images.py
+"""
+สร้างรูปย่อ (variants) ของ Equipment.image นอก request
+
+รูปต้นฉบับจากมือถือมักมีขนาดหลาย MB จึงสร้างรูปที่ย่อและบีบอัดแล้วตาม IMAGE_VARIANTS
+เก็บไว้ข้างรูปต้นฉบับใน storage เดียวกัน และบันทึก path ไว้ใน Equipment.image_variants
+พร้อมชื่อรูปต้นฉบับที่ใช้สร้าง (ถ้าเปลี่ยนรูป variants เดิมจะไม่ถูกใช้)
+
+- การอัพโหลดตอบกลับทันที signal ส่งงาน equipment.process_image เข้าคิว (repair_api.jobs)
+- generate_variants() ไม่แตะฐานข้อมูล จึงใช้กับ process pool ได้ (คำสั่ง generate_image_variants)
+- รูปที่ถอดรหัสไม่ได้ (ไฟล์เสีย/ไม่ใช่รูป) หรือไม่มีไฟล์ บันทึก {'source': ชื่อรูป, 'error': ...}
+  แทน variants และไม่ส่งงานซ้ำจนกว่ารูปจะถูกเปลี่ยน (ข้อผิดพลาดอื่นของ storage ลองใหม่ตามคิวงาน)
+"""
+
+import io
+import logging
+import posixpath
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .jobs import enqueue, register
+
+logger = logging.getLogger(__name__)
+
+# ชื่อ variant: (ด้านยาวสุดเป็นพิกเซล, รูปแบบไฟล์, quality)
+IMAGE_VARIANTS = {
+    'thumbnail': (320, 'JPEG', 80),
+    'medium': (1024, 'JPEG', 82),
+    'webp': (1024, 'WEBP', 80),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+VARIANTS_DIR = 'variants'
+
+
+def variant_path(name, variant):
+    """path ของ variant เช่น equipment_images/variants/abc_thumbnail.jpg"""
+    size, image_format, quality = IMAGE_VARIANTS[variant]
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(
+        directory, VARIANTS_DIR, f'{stem}_{variant}.{EXTENSIONS[image_format]}'
+    )
+
+
+def _encode(image, size, image_format, quality):
+    resized = image.copy()
+    resized.thumbnail((size, size), Image.LANCZOS)
+    buffer = io.BytesIO()
+    options = {'quality': quality}
+    if image_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    else:
+        options['method'] = 4
+    resized.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+class ImageDecodeError(Exception):
+    """ไฟล์ต้นฉบับไม่ใช่รูปที่ถอดรหัสได้ (ลองใหม่ก็ไม่สำเร็จ)"""
+
+
+# ข้อผิดพลาดที่ลองใหม่ก็ไม่หาย: บันทึกเป็นผลลัพธ์แทนการให้คิวงานลองซ้ำ
+PERMANENT_ERRORS = (ImageDecodeError, FileNotFoundError)
+
+
+def _decode(data):
+    try:
+        image = Image.open(io.BytesIO(data))
+        # ลดขนาดตอน decode JPEG (ไม่ต้องคลายรูปเต็ม 12MP ลงหน่วยความจำ)
+        largest = max(size for size, _, _ in IMAGE_VARIANTS.values())
+        image.draft('RGB', (largest, largest))
+        # หมุนรูปตาม EXIF (รูปจากมือถือ) ก่อนตัด metadata ทิ้ง
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.load()
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as exc:
+        # UnidentifiedImageError และไฟล์ที่ถูกตัดเป็น OSError (อ่านจากหน่วยความจำ ไม่ใช่ storage)
+        raise ImageDecodeError(f'{type(exc).__name__}: {exc}') from exc
+    return image
+
+
+def generate_variants(name, storage=None):
+    """สร้างทุก variant ของรูป name คืน dict สำหรับ Equipment.image_variants
+
+    raise ImageDecodeError เมื่อไฟล์ไม่ใช่รูปที่ถอดรหัสได้
+    """
+    storage = storage or default_storage
+    # อ่านทั้งไฟล์ก่อน ข้อผิดพลาดของ storage (ลองใหม่ได้) จึงไม่ปนกับการถอดรหัส
+    with storage.open(name, 'rb') as source:
+        data = source.read()
+    image = _decode(data)
+
+    variants = {'source': name}
+    for variant, (size, image_format, quality) in IMAGE_VARIANTS.items():
+        path = variant_path(name, variant)
+        if storage.exists(path):
+            storage.delete(path)
+        variants[variant] = storage.save(
+            path, ContentFile(_encode(image, size, image_format, quality))
+        )
+    return variants
+
+
+def delete_variants(variants, storage=None):
+    storage = storage or default_storage
+    for variant in IMAGE_VARIANTS:
+        path = (variants or {}).get(variant)
+        if path and storage.exists(path):
+            storage.delete(path)
+
+
+def failure_record(name, exc):
+    """ค่า image_variants ของรูปที่สร้าง variants ไม่ได้"""
+    return {'source': name, 'error': f'{type(exc).__name__}: {exc}'}
+
+
+def is_processed(equipment):
+    """รูปปัจจุบันถูกประมวลผลแล้ว (มี variants หรือบันทึกว่าสร้างไม่ได้) ไม่ต้องส่งงานซ้ำ"""
+    variants = equipment.image_variants
+    return bool(equipment.image and variants and variants.get('source') == equipment.image.name)
+
+
+def current_variants(equipment):
+    """variants ที่ตรงกับรูปปัจจุบัน (None ถ้ายังไม่ได้สร้าง สร้างไม่ได้ หรือรูปถูกเปลี่ยน)"""
+    if is_processed(equipment) and 'error' not in equipment.image_variants:
+        return equipment.image_variants
+    return None
+
+
+def save_variants(equipment_id, variants):
+    """บันทึกผลลง Equipment ถ้ารูปยังเป็นรูปเดิม คืน True ถ้าบันทึก"""
+    from .cache import bump_table_versions
+    from .models import Equipment
+
+    # update() ไม่ส่ง signal จึงต้องเปลี่ยน version ของตาราง (ETag / cache) เอง
+    updated = Equipment.objects.filter(
+        pk=equipment_id, image=variants['source']
+    ).update(image_variants=variants)
+    if updated:
+        transaction.on_commit(lambda: bump_table_versions(Equipment))
+    return bool(updated)
+
+
+@register('equipment.process_image')
+def process_equipment_image(equipment_id, name, old_variants=None):
+    """งานเบื้องหลัง: สร้าง variants ของรูปใหม่และลบ variants ของรูปเดิม"""
+    if old_variants:
+        delete_variants(old_variants)
+    if name:
+        try:
+            variants = generate_variants(name)
+        except PERMANENT_ERRORS as exc:
+            logger.warning('สร้างรูปย่อของ %s ไม่ได้: %s', name, exc)
+            save_variants(equipment_id, failure_record(name, exc))
+            return
+        if not save_variants(equipment_id, variants):
+            # รูปถูกเปลี่ยนอีกระหว่างประมวลผล
+            delete_variants(variants)
+
+
+def schedule_image_processing(equipment_id, name, old_variants=None):
+    """ส่งงานสร้าง variants เข้าคิว (บันทึกพร้อมกับการแก้ไขอุปกรณ์ในทรานแซกชันเดียวกัน)"""
+    enqueue('equipment.process_image', {
+        'equipment_id': equipment_id, 'name': name, 'old_variants': old_variants,
+    })
@@ -0,0 +1,243 @@
+# repair_api/importer.py
+"""
+นำเข้าอุปกรณ์จำนวนมากจากไฟล์ CSV / XLSX
+
+อ่านไฟล์ทีละแถว (ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ) ตรวจสอบและบันทึกเป็น batch
+ด้วย bulk_create(update_conflicts=True) โดยใช้ equipment_code เป็น key
+แถวที่มีรหัสซ้ำกับของเดิมจะถูกอัพเดท
+
+bulk_create ไม่เรียก signal จึงต้องคำนวณ active_equipment_count ของหมวดหมู่
+ที่เกี่ยวข้องและล้าง cache แดชบอร์ดเองหลังนำเข้าเสร็จ
+"""
+
+import csv
+import io
+import time
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import reset_queries, transaction
+
+from .analytics import mark_equipment_dirty
+from .cache import bump_table_versions
+from .models import Equipment, EquipmentCategory
+from .rollups import refresh_category_counts
+from .stats import invalidate_dashboard_stats
+
+REQUIRED_COLUMNS = ['equipment_code', 'name', 'location']
+OPTIONAL_COLUMNS = [
+    'category', 'description', 'purchase_date', 'warranty_expiry', 'condition', 'is_active',
+]
+UPDATE_FIELDS = [
+    'name', 'category', 'description', 'location', 'purchase_date',
+    'warranty_expiry', 'condition', 'is_active', 'updated_at',
+]
+# เก็บรายละเอียดข้อผิดพลาดไม่เกินจำนวนนี้ (ไฟล์ใหญ่ที่ผิดทั้งไฟล์จะไม่กินหน่วยความจำ)
+MAX_REPORTED_ERRORS = 100
+
+# รับได้ทั้งรหัส (good) และชื่อที่แสดง (ดี)
+CONDITIONS = {
+    **{code: code for code, _ in Equipment.CONDITION_CHOICES},
+    **{label: code for code, label in Equipment.CONDITION_CHOICES},
+}
+BOOLEANS = {
+    **dict.fromkeys(['1', 'true', 't', 'yes', 'y', 'ใช่', 'ใช้งาน'], True),
+    **dict.fromkeys(['0', 'false', 'f', 'no', 'n', 'ไม่', 'ไม่ใช้งาน'], False),
+}
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_csv_rows(fileobj):
+    reader = csv.reader(io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline=''))
+    try:
+        yield from reader
+    except csv.Error as exc:
+        raise ValueError(f'ไฟล์ CSV ไม่ถูกต้อง: {exc}')
+
+
+def iter_xlsx_rows(fileobj):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError('ต้องติดตั้ง openpyxl เพื่อนำเข้าไฟล์ .xlsx')
+    # read_only อ่านทีละแถวจาก XML โดยไม่สร้างทั้ง worksheet ในหน่วยความจำ
+    workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def iter_records(fileobj, filename):
+    """คืน (เลขบรรทัด, dict ของแถว) ทีละแถว โดยใช้แถวแรกเป็นหัวคอลัมน์"""
+    if filename.lower().endswith('.xlsx'):
+        rows = iter_xlsx_rows(fileobj)
+    elif filename.lower().endswith('.csv'):
+        rows = iter_csv_rows(fileobj)
+    else:
+        raise ValueError('รองรับเฉพาะไฟล์ .csv และ .xlsx')
+
+    header = [_text(name).lower() for name in next(rows, None) or []]
+    missing = [name for name in REQUIRED_COLUMNS if name not in header]
+    if missing:
+        raise ValueError('ไม่พบคอลัมน์: %s' % ', '.join(missing))
+    columns = [
+        (index, name) for index, name in enumerate(header)
+        if name in REQUIRED_COLUMNS or name in OPTIONAL_COLUMNS
+    ]
+
+    for line, row in enumerate(rows, start=2):
+        if not any(_text(value) for value in row):
+            continue
+        yield line, {
+            name: row[index] if index < len(row) else None for index, name in columns
+        }
+
+
+class EquipmentImporter:
+    """นำเข้าอุปกรณ์เป็น batch และเก็บสถิติของการนำเข้า"""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.EQUIPMENT_IMPORT_BATCH_SIZE
+        # ชื่อหมวดหมู่ -> id (โหลดครั้งเดียว แล้วเพิ่มเมื่อสร้างหมวดหมู่ใหม่)
+        self.categories = dict(EquipmentCategory.objects.values_list('name', 'id'))
+        self.touched_categories = set()
+        self.rows = 0
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def _error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def _field(self, name, value):
+        field = Equipment._meta.get_field(name)
+        value = field.to_python(value)
+        if value in field.empty_values:
+            if not field.null and not field.has_default():
+                raise ValidationError('ต้องระบุค่า')
+            return None if field.null else field.get_default()
+        field.run_validators(value)
+        return value
+
+    def _build(self, record):
+        values = {
+            name: self._field(name, _text(record.get(name)))
+            for name in ['equipment_code', 'name', 'location', 'description']
+        }
+        for name in ['purchase_date', 'warranty_expiry']:
+            value = record.get(name)
+            if hasattr(value, 'date'):
+                value = value.date()
+            values[name] = self._field(name, value if value else None)
+
+        condition = _text(record.get('condition'))
+        if condition and condition not in CONDITIONS:
+            raise ValidationError(f'สภาพไม่ถูกต้อง: {condition}')
+        values['condition'] = CONDITIONS.get(condition, 'good')
+
+        is_active = _text(record.get('is_active')).lower()
+        if is_active and is_active not in BOOLEANS:
+            raise ValidationError(f'is_active ไม่ถูกต้อง: {is_active}')
+        values['is_active'] = BOOLEANS.get(is_active, True)
+        values['category_id'] = self.categories.get(_text(record.get('category')))
+        return Equipment(**values)
+
+    def _resolve_categories(self, records):
+        names = {_text(record.get('category')) for _, record in records} - {''}
+        new_names = names - self.categories.keys()
+        if new_names:
+            EquipmentCategory.objects.bulk_create(
+                [EquipmentCategory(name=name) for name in new_names], ignore_conflicts=True
+            )
+            self.categories.update(
+                EquipmentCategory.objects.filter(name__in=new_names).values_list('name', 'id')
+            )
+
+    def _flush(self, records):
+        self._resolve_categories(records)
+        objs = {}
+        for line, record in records:
+            try:
+                equipment = self._build(record)
+            except ValidationError as exc:
+                self._error(line, '; '.join(exc.messages))
+                continue
+            # รหัสซ้ำภายใน batch เดียวกัน ใช้แถวหลังสุด
+            objs[equipment.equipment_code] = equipment
+        if not objs:
+            return
+
+        with transaction.atomic():
+            existing = dict(
+                Equipment.objects.filter(equipment_code__in=objs.keys()).values_list(
+                    'equipment_code', 'category_id'
+                )
+            )
+            # หมวดหมู่เดิมของอุปกรณ์ที่ถูกอัพเดทต้องถูกนับใหม่ด้วย
+            self.touched_categories.update(
+                category_id for category_id in existing.values() if category_id
+            )
+            Equipment.objects.bulk_create(
+                objs.values(),
+                update_conflicts=True,
+                unique_fields=['equipment_code'],
+                update_fields=UPDATE_FIELDS,
+            )
+            # คำร้องของอุปกรณ์ที่ย้ายหมวดหมู่ต้องถูกสรุปรายวันในหมวดหมู่ใหม่
+            moved = [
+                code for code, category_id in existing.items()
+                if objs[code].category_id != category_id
+            ]
+            if moved:
+                mark_equipment_dirty(Equipment.objects.filter(equipment_code__in=moved))
+        self.touched_categories.update(
+            obj.category_id for obj in objs.values() if obj.category_id
+        )
+        self.imported += len(objs)
+
+    def run(self, fileobj, filename, progress=None):
+        """นำเข้าทั้งไฟล์ คืนค่าสรุปผล (progress ถูกเรียกหลังแต่ละ batch)"""
+        start = time.perf_counter()
+        batch = []
+        for line, record in iter_records(fileobj, filename):
+            self.rows += 1
+            batch.append((line, record))
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                # DEBUG=True เก็บ SQL ทุก query ไว้ ล้างทิ้งเพื่อให้หน่วยความจำคงที่
+                reset_queries()
+                if progress:
+                    progress(self.summary(time.perf_counter() - start))
+        if batch:
+            self._flush(batch)
+
+        refresh_category_counts(self.touched_categories)
+        transaction.on_commit(invalidate_dashboard_stats)
+        transaction.on_commit(lambda: bump_table_versions(Equipment, EquipmentCategory))
+        return self.summary(time.perf_counter() - start)
+
+    def summary(self, seconds):
+        return {
+            'rows': self.rows,
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds else 0,
+        }
+
+
+def import_equipment(fileobj, filename, batch_size=None, progress=None):
+    return EquipmentImporter(batch_size).run(fileobj, filename, progress=progress)
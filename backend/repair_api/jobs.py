@@ -0,0 +1,295 @@
+# repair_api/jobs.py
+"""
+คิวงานเบื้องหลังที่เก็บในฐานข้อมูลเดียวกับระบบ (ไม่ต้องมี broker ภายนอก)
+
+- ลงทะเบียนฟังก์ชันด้วย @register('ชื่องาน') และส่งงานด้วย enqueue('ชื่องาน', {...})
+  payload เป็น keyword arguments ของฟังก์ชัน และต้องเป็น JSON เพราะเก็บใน Job.payload
+- enqueue ในทรานแซกชันเดียวกับข้อมูล งานจึงถูกเห็นโดย worker หลัง commit เท่านั้น
+  และหายไปพร้อมกันถ้า rollback
+- worker (คำสั่ง run_jobs) จองงานด้วย SELECT ... FOR UPDATE SKIP LOCKED บน PostgreSQL
+  บน SQLite ใช้ UPDATE ... WHERE id IN (SELECT ... LIMIT n) คำสั่งเดียว ซึ่ง atomic เพราะ
+  SQLite ให้เขียนได้ทีละ connection
+- งานที่ล้มเหลวถูกลองใหม่แบบ exponential backoff จนครบ max_attempts
+- worker ต่ออายุ heartbeat_at ของงานที่ถืออยู่จาก thread แยกระหว่างทำงาน (lease)
+  งานที่ไม่มี heartbeat เกิน JOB_LOCK_TIMEOUT (worker ตายหรือถูก kill) ถูกคืนเข้าคิว
+  งานที่ใช้เวลานานแต่ worker ยังทำงานอยู่จึงไม่ถูกคืนไปทำซ้ำ
+- JOBS_EAGER=True ทำงานทันทีหลัง commit ใน process เดิม (สำหรับพัฒนา/ทดสอบโดยไม่รัน worker)
+"""
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, reset_queries, transaction
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def register(name):
+    """decorator ลงทะเบียนฟังก์ชันเป็นงานชื่อ name"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """ส่งงานเข้าคิว คืน Job (หรือ None เมื่อ JOBS_EAGER)"""
+    if name not in _registry:
+        raise LookupError(f'ไม่รู้จักงาน {name}')
+    payload = payload or {}
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: _registry[name](**payload))
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts):
+    """วินาทีที่รอก่อนลองครั้งถัดไป: เพิ่มเป็นสองเท่าทุกครั้ง (มี jitter ไม่ให้ลองพร้อมกัน)"""
+    delay = min(
+        settings.JOB_RETRY_BACKOFF * 2 ** max(attempts - 1, 0), settings.JOB_RETRY_BACKOFF_MAX
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def claim_jobs(worker_id, limit=1):
+    """จองงานที่ถึงเวลาแล้วไม่เกิน limit งาน (สถานะเปลี่ยนเป็น running)"""
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+    claimed = {
+        'status': 'running', 'locked_by': worker_id, 'started_at': now, 'heartbeat_at': now,
+        'attempts': F('attempts') + 1,
+    }
+    with transaction.atomic():
+        if connection.features.has_select_for_update_skip_locked:
+            # worker อื่นข้ามแถวที่ถูก lock ไปแล้ว แทนที่จะรอ
+            ids = list(
+                due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit]
+            )
+            Job.objects.filter(pk__in=ids).update(**claimed)
+            jobs = Job.objects.filter(pk__in=ids)
+        else:
+            Job.objects.filter(
+                pk__in=due.values('id')[:limit], status='queued'
+            ).update(**claimed)
+            jobs = Job.objects.filter(status='running', locked_by=worker_id, started_at=now)
+        return list(jobs.order_by('run_at', 'id'))
+
+
+def release_jobs(jobs):
+    """คืนงานที่จองไว้แต่ยังไม่ได้ทำกลับเข้าคิว (เช่น worker ถูกสั่งหยุด)"""
+    Job.objects.filter(pk__in=[job.pk for job in jobs], status='running').update(
+        status='queued', locked_by='', started_at=None, heartbeat_at=None,
+        attempts=F('attempts') - 1
+    )
+
+
+def heartbeat(worker_id):
+    """ต่ออายุ lease ของงานที่ worker_id ถืออยู่ คืนจำนวนงานที่ยังเป็นของ worker นี้"""
+    return Job.objects.filter(status='running', locked_by=worker_id).update(
+        heartbeat_at=timezone.now()
+    )
+
+
+def run_job(job):
+    """ทำงานหนึ่งงาน คืนผลลัพธ์ 'succeeded', 'retried' หรือ 'failed'"""
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'ไม่รู้จักงาน {job.name}')
+        # งานที่ล้มเหลวจะไม่ทิ้งการเขียนฐานข้อมูลค้างไว้ครึ่งทาง
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc()
+        logger.warning('งาน %s #%s ล้มเหลว (ครั้งที่ %s)', job.name, job.pk, job.attempts)
+        if job.attempts >= job.max_attempts:
+            outcome, changes = 'failed', {'status': 'failed', 'finished_at': now}
+        else:
+            outcome, changes = 'retried', {
+                'status': 'queued',
+                'run_at': now + timedelta(seconds=retry_delay(job.attempts)),
+            }
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+            locked_by='', last_error=error, **changes
+        )
+        return outcome
+
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status='succeeded', finished_at=timezone.now(), locked_by=''
+    )
+    return 'succeeded'
+
+
+def requeue_stale_jobs(timeout=None):
+    """คืนงานที่ไม่มี heartbeat นานเกิน timeout (worker ตายหรือถูก kill) กลับเข้าคิว
+
+    ดูจาก heartbeat_at ไม่ใช่ started_at งานที่ทำนานแต่ worker ยังต่ออายุอยู่จึงไม่ถูกทำซ้ำ
+    """
+    timeout = settings.JOB_LOCK_TIMEOUT if timeout is None else timeout
+    stale = Job.objects.filter(
+        Q(heartbeat_at__lt=timezone.now() - timedelta(seconds=timeout))
+        | Q(heartbeat_at__isnull=True),
+        status='running',
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), locked_by='',
+        last_error='worker หยุดทำงานระหว่างประมวลผล'
+    )
+    requeued = stale.update(status='queued', locked_by='', started_at=None, heartbeat_at=None)
+    return requeued, failed
+
+
+def purge_finished_jobs(days=None):
+    """ลบงานที่สำเร็จแล้วเก่ากว่า days วัน (งานที่ล้มเหลวเก็บไว้ตรวจสอบ)"""
+    days = settings.JOB_RETENTION_DAYS if days is None else days
+    deleted, _ = Job.objects.filter(
+        status='succeeded', finished_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def queue_stats():
+    """ภาพรวมของคิวจากฐานข้อมูล: จำนวนตามสถานะ/ชื่องาน อายุงานที่ค้าง และเวลาทำงานเฉลี่ย"""
+    now = timezone.now()
+    by_status = Counter()
+    by_name = defaultdict(Counter)
+    rows = Job.objects.order_by().values('name', 'status').annotate(count=Count('id'))
+    for row in rows:
+        by_status[row['status']] += row['count']
+        by_name[row['name']][row['status']] = row['count']
+
+    oldest = Job.objects.filter(status='queued', run_at__lte=now).aggregate(
+        oldest=Min('run_at')
+    )['oldest']
+    recent = Job.objects.filter(
+        status='succeeded', finished_at__gte=now - timedelta(hours=1)
+    ).aggregate(
+        count=Count('id'),
+        duration=Avg(ExpressionWrapper(
+            F('finished_at') - F('started_at'), output_field=DurationField()
+        )),
+    )
+    return {
+        'status': {status: by_status[status] for status, _ in Job.STATUS_CHOICES},
+        'jobs': {name: dict(counts) for name, counts in sorted(by_name.items())},
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'succeeded_last_hour': recent['count'],
+        'avg_duration_ms': (
+            round(recent['duration'].total_seconds() * 1000, 1) if recent['duration'] else None
+        ),
+    }
+
+
+class WorkerMetrics:
+    """ตัวนับของ worker process นี้: จำนวนงานตามผลลัพธ์และเวลาที่ใช้ต่อชื่องาน"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.seconds = Counter()
+
+    def record(self, name, outcome, seconds):
+        self.counts[(name, outcome)] += 1
+        self.seconds[name] += seconds
+
+    def summary(self):
+        result = {}
+        for (name, outcome), count in sorted(self.counts.items()):
+            result.setdefault(name, {'seconds': round(self.seconds[name], 3)})[outcome] = count
+        return result
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class Worker:
+    """วนจองและทำงานจากคิวจนกว่าจะถูกสั่งหยุด"""
+    MAINTENANCE_INTERVAL = 60
+
+    def __init__(self, worker_id=None, batch_size=1, poll_interval=1.0):
+        self.worker_id = worker_id or default_worker_id()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.metrics = WorkerMetrics()
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def maintenance(self):
+        requeued, failed = requeue_stale_jobs()
+        purged = purge_finished_jobs()
+        if requeued or failed or purged:
+            logger.info(
+                'คืนงานค้าง %s งาน, งานล้มเหลว %s งาน, ลบงานเก่า %s งาน', requeued, failed, purged
+            )
+
+    def _send_heartbeats(self, finished):
+        # thread นี้มี connection ของตัวเอง จึงต่ออายุได้ระหว่างที่งานยาว ๆ ถือ thread หลักไว้
+        try:
+            while not finished.wait(settings.JOB_HEARTBEAT_INTERVAL):
+                try:
+                    heartbeat(self.worker_id)
+                except DatabaseError:
+                    # ลองใหม่รอบหน้า (เช่น SQLite ถูก lock ชั่วคราว) lease ยาวกว่าช่วง heartbeat หลายเท่า
+                    logger.warning('ส่ง heartbeat ของ %s ไม่สำเร็จ', self.worker_id, exc_info=True)
+        finally:
+            connection.close()
+
+    def run(self, burst=False):
+        """burst=True: หยุดเมื่อไม่มีงานที่ถึงเวลาเหลืออยู่"""
+        finished = threading.Event()
+        heartbeats = threading.Thread(
+            target=self._send_heartbeats, args=(finished,), daemon=True
+        )
+        heartbeats.start()
+        try:
+            self._loop(burst)
+        finally:
+            finished.set()
+            heartbeats.join()
+        return self.metrics.summary()
+
+    def _loop(self, burst):
+        last_maintenance = 0
+        while not self.stopping.is_set():
+            if time.monotonic() - last_maintenance > self.MAINTENANCE_INTERVAL:
+                self.maintenance()
+                last_maintenance = time.monotonic()
+
+            jobs = claim_jobs(self.worker_id, self.batch_size)
+            if not jobs:
+                if burst:
+                    break
+                self.stopping.wait(self.poll_interval)
+                continue
+
+            for index, job in enumerate(jobs):
+                if self.stopping.is_set():
+                    release_jobs(jobs[index:])
+                    break
+                started = time.perf_counter()
+                outcome = run_job(job)
+                self.metrics.record(job.name, outcome, time.perf_counter() - started)
+            # DEBUG=True เก็บ query ทุกคำสั่งไว้ในหน่วยความจำ
+            reset_queries()
@@ -0,0 +1,199 @@
+# repair_api/loadtest.py
+"""
+เครื่องมือยิง HTTP ใส่ server จริง (gunicorn หรือ uvicorn) สำหรับคำสั่ง benchmark_*
+
+- running_server() เริ่ม server ใน process ใหม่บนฐานข้อมูลทดสอบ และหยุดเมื่อจบ
+- Client เป็น HTTP/1.1 client แบบ keep-alive ทีละ request ต่อ connection
+  สุ่ม request จากรายการที่มีน้ำหนัก และเก็บ latency/status แยกตามชื่อ endpoint
+- run_load() เปิด client ทั้งหมดพร้อมกันใน event loop เดียว
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .benchmarking import percentile
+
+# เริ่ม server ใน process ใหม่ หลังติดตั้งการหน่วง query (process ของ worker ได้ไปด้วยเมื่อ fork)
+SERVER_SCRIPT = """
+import sys
+import django
+django.setup()
+from repair_api.benchmarking import simulate_query_latency
+if float(sys.argv[1]):
+    simulate_query_latency(float(sys.argv[1]) / 1000)
+sys.argv = ['server', *sys.argv[2:]]
+if sys.argv[1].endswith('wsgi:application'):
+    from gunicorn.app.wsgiapp import run
+else:
+    from uvicorn.main import main as run
+run()
+"""
+
+
+def raise_fd_limit():
+    """เพิ่ม soft limit ของ file descriptor เป็น hard limit (connection พร้อมกันจำนวนมาก)"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, threads=32, query_latency=0):
+    """คำสั่งเริ่ม server: 'wsgi' = gunicorn gthread, 'asgi' = uvicorn (worker เดียวทั้งคู่)"""
+    command = [sys.executable, '-c', SERVER_SCRIPT, str(query_latency)]
+    if server == 'wsgi':
+        return command + [
+            'repair_project.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', '1',
+            '--worker-class', 'gthread', '--threads', str(threads),
+            '--backlog', '2048', '--log-level', 'warning',
+        ]
+    return command + [
+        'repair_project.asgi:application',
+        '--host', '127.0.0.1', '--port', str(port), '--backlog', '2048',
+        '--lifespan', 'off', '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def wait_until_ready(port, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError('server หยุดทำงานก่อนเริ่มทดสอบ')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server ไม่พร้อมภายในเวลาที่กำหนด')
+
+
+@contextlib.contextmanager
+def running_server(server, database, threads=32, query_latency=0, env=None):
+    """เริ่ม server บนฐานข้อมูล SQLite ไฟล์ database คืน port ที่รับ request"""
+    port = free_port()
+    process = subprocess.Popen(
+        server_command(server, port, threads=threads, query_latency=query_latency),
+        cwd=settings.BASE_DIR,
+        env={
+            **os.environ,
+            'DATABASE_URL': f'sqlite:///{database}',
+            'DEBUG': 'False',
+            **(env or {}),
+        },
+    )
+    try:
+        wait_until_ready(port, process)
+        yield port
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+class Client:
+    """HTTP/1.1 client แบบ keep-alive ที่ส่ง request ทีละรายการ
+
+    requests: รายการ (ชื่อ, น้ำหนัก, ฟังก์ชัน rng -> (method, path, body)) หรือ
+    รายการ path ของ GET (น้ำหนักเท่ากัน ใช้ path เป็นชื่อ)
+    """
+
+    def __init__(self, port, token, requests, seed=None):
+        self.port = port
+        self.token = token
+        if requests and isinstance(requests[0], str):
+            requests = [(path, 1, lambda rng, path=path: ('GET', path, None)) for path in requests]
+        self.requests = requests
+        self.weights = [weight for _, weight, _ in requests]
+        self.rng = random.Random(seed)
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    async def request(self, method, path, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.writer.write(
+            f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+            f'Authorization: Bearer {self.token}\r\nAccept: application/json\r\n'
+            f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n'.encode()
+            + payload
+        )
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = dict(
+            line.lower().split(': ', 1) for line in lines[1:] if ': ' in line
+        )
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        return status, headers.get('connection') == 'close'
+
+    async def run(self, deadline, record_after):
+        self.reader = None
+        while time.perf_counter() < deadline:
+            if self.reader is None:
+                self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+            name, _, build = self.rng.choices(self.requests, self.weights)[0]
+            method, path, body = build(self.rng)
+            started = time.perf_counter()
+            try:
+                status, closed = await self.request(method, path, body)
+            except (OSError, asyncio.IncompleteReadError):
+                status, closed = 'error', True
+            finished = time.perf_counter()
+            if started >= record_after and finished <= deadline:
+                self.latencies[name].append(finished - started)
+                self.statuses[name][status] += 1
+            if closed:
+                self.writer.close()
+                self.reader = None
+        if self.reader is not None:
+            self.writer.close()
+
+
+def summarize(latencies, duration):
+    """สรุป latency (วินาที) เป็น ms และ throughput ต่อวินาที"""
+    return {
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / duration, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def run_load(clients, duration, warmup):
+    """ยิง request จากทุก client พร้อมกัน คืน (รายการ latency ทั้งหมด, dict ต่อชื่อ endpoint)"""
+    started = time.perf_counter()
+    record_after = started + warmup
+    deadline = record_after + duration
+    await asyncio.gather(*(client.run(deadline, record_after) for client in clients))
+
+    endpoints = defaultdict(lambda: {'latencies': [], 'statuses': Counter()})
+    for client in clients:
+        for name, latencies in client.latencies.items():
+            endpoints[name]['latencies'] += latencies
+            endpoints[name]['statuses'] += client.statuses[name]
+    latencies = [latency for endpoint in endpoints.values() for latency in endpoint['latencies']]
+    return latencies, endpoints
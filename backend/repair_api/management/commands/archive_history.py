@@ -0,0 +1,48 @@
+# repair_api/management/commands/archive_history.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from repair_api.archive import archivable_histories, archive_histories
+from repair_api.models import RepairHistory, RepairHistoryArchive
+
+
+class Command(BaseCommand):
+    help = (
+        'ย้ายประวัติของคำร้องที่ปิดแล้วนานกว่า HISTORY_ARCHIVE_AFTER_DAYS วันไปตาราง archive '
+        'ทีละ batch (ตั้ง cron ทุกคืน)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='หน่วงระหว่าง batch (วินาที) ให้ request อื่นเขียนได้')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='จำนวนแถวสูงสุดในการรันครั้งนี้')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='นับจำนวนแถวที่จะถูกย้ายอย่างเดียว')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = archivable_histories(options['older_than_days']).count()
+            self.stdout.write(f'ประวัติที่จะถูกย้าย: {count} แถว')
+            return
+
+        def progress(moved):
+            self.stdout.write(f'  moved {moved}')
+
+        started = time.perf_counter()
+        moved = archive_histories(
+            older_than_days=options['older_than_days'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            limit=options['limit'],
+            progress=progress if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'ย้าย {moved} แถวใน {time.perf_counter() - started:.1f}s '
+            f'(ตารางหลัก {RepairHistory.objects.count()} แถว, '
+            f'archive {RepairHistoryArchive.objects.count()} แถว)'
+        ))
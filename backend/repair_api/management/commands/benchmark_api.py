@@ -0,0 +1,395 @@
+# repair_api/management/commands/benchmark_api.py
+
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from collections import Counter
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client as TestClient
+from django.utils import timezone
+
+from repair_api.benchmarking import (
+    QueryCounter, benchmark_database, percentile, seed_dataset
+)
+from repair_api.loadtest import Client, raise_fd_limit, run_load, running_server, summarize
+from repair_api.models import Equipment, RepairRequest, UserProfile
+from repair_api.seeding import EQUIPMENT_WORDS
+from repair_api.serializers import RoleTokenObtainPairSerializer
+
+ROLES = ('user', 'technician', 'admin')
+
+
+def endpoints(role, data):
+    """request ของแต่ละบทบาท: (ชื่อ, น้ำหนักใน load test, ฟังก์ชัน rng -> (method, path, body))
+
+    น้ำหนักประมาณสัดส่วนการใช้งานจริง: ผู้ใช้ดูคำร้องของตัวเองและแจ้งซ่อม
+    ช่างดูงานที่ได้รับมอบหมายและอัพเดทสถานะ ผู้ดูแลดูภาพรวมและรายงาน
+    """
+    def get(path):
+        return lambda rng: ('GET', path, None)
+
+    def request_detail(suffix=''):
+        return lambda rng: ('GET', f'/api/repair-requests/{rng.choice(ids)}/{suffix}', None)
+
+    ids = data['request_ids'] or [0]
+    common = [
+        ('dashboard', 10, get('/api/dashboard/stats/')),
+        ('repair-requests list', 8, get('/api/repair-requests/')),
+        ('repair-requests page', 2, get('/api/repair-requests/?page=1')),
+        ('repair-requests search', 2, lambda rng: (
+            'GET', f'/api/repair-requests/?search={rng.choice(EQUIPMENT_WORDS)}', None
+        )),
+        ('repair-request detail', 8, request_detail()),
+        ('repair-request history', 2, request_detail('history/')),
+        ('equipment list', 3, get('/api/equipment/')),
+        ('equipment search', 1, lambda rng: (
+            'GET', f'/api/equipment/?search={rng.choice(EQUIPMENT_WORDS)}', None
+        )),
+        ('equipment detail', 3, lambda rng: (
+            'GET', f"/api/equipment/{rng.choice(data['equipment_ids'])}/", None
+        )),
+        ('categories', 2, get('/api/categories/')),
+        ('technicians', 2, get('/api/technicians/')),
+        ('profile', 1, get('/api/profiles/me/')),
+    ]
+    if role == 'user':
+        return common + [
+            ('my requests', 6, get('/api/repair-requests/my_requests/')),
+            ('create request', 2, lambda rng: ('POST', '/api/repair-requests/', {
+                'equipment': rng.choice(data['equipment_ids']),
+                'title': f'{rng.choice(EQUIPMENT_WORDS)} ชำรุด',
+                'description': 'benchmark',
+                'priority': 'medium',
+            })),
+        ]
+    if role == 'technician':
+        assigned = data['assigned_ids'] or ids
+        return common + [
+            ('assigned to me', 6, get('/api/repair-requests/assigned_to_me/')),
+            ('pending requests', 3, get('/api/repair-requests/?status=pending')),
+            ('update status', 2, lambda rng: (
+                'POST', f'/api/repair-requests/{rng.choice(assigned)}/update_status/',
+                {'status': 'in_progress', 'comment': 'benchmark'}
+            )),
+        ]
+    return common + [
+        ('analytics categories', 1, get('/api/analytics/categories/')),
+        ('analytics technicians', 1, get('/api/analytics/technicians/')),
+        ('cache stats', 1, get('/api/cache/stats/')),
+        ('job stats', 1, get('/api/jobs/stats/')),
+    ]
+
+
+def sample_users(per_role=10):
+    """ผู้ใช้ตัวอย่าง per_role คนต่อบทบาท พร้อม token และข้อมูลที่ใช้สร้าง request"""
+    equipment_ids = list(Equipment.objects.values_list('id', flat=True)[:500])
+    users = {role: [] for role in ROLES}
+    for role in ROLES:
+        profiles = UserProfile.objects.filter(role=role).select_related('user')[:per_role]
+        for profile in profiles:
+            user = profile.user
+            user.role = profile.role
+            users[role].append({
+                'token': str(RoleTokenObtainPairSerializer.get_token(user).access_token),
+                'request_ids': list(
+                    RepairRequest.objects.visible_to(user).values_list('id', flat=True)[:50]
+                ),
+                'assigned_ids': list(
+                    RepairRequest.objects.filter(
+                        assigned_to=user, status__in=['assigned', 'in_progress']
+                    ).values_list('id', flat=True)[:50]
+                ),
+                'equipment_ids': equipment_ids,
+            })
+    return users
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _slower(current, baseline, threshold, min_ms):
+    return current > baseline * (1 + threshold) and current - baseline > min_ms
+
+
+def compare_results(baseline, current, threshold, min_ms):
+    """รายการ (ชื่อ, metric, baseline, current) ที่แย่ลงเกินเกณฑ์"""
+    regressions = []
+    for name, result in current.get('micro', {}).items():
+        base = baseline.get('micro', {}).get(name)
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append((name, 'status', base['status'], result['status']))
+        # จำนวน query ไม่ขึ้นกับเครื่องที่รัน เพิ่มขึ้นแม้หนึ่ง query ก็ถือว่าแย่ลง
+        if result['queries'] > base['queries']:
+            regressions.append((name, 'queries', base['queries'], result['queries']))
+        for metric in ('p50_ms', 'p95_ms'):
+            if _slower(result[metric], base[metric], threshold, min_ms):
+                regressions.append((name, metric, base[metric], result[metric]))
+
+    load, base_load = current.get('load'), baseline.get('load')
+    if load and base_load:
+        throughput = load['overall']['throughput']
+        base_throughput = base_load['overall']['throughput']
+        if throughput < base_throughput * (1 - threshold):
+            regressions.append(('load overall', 'throughput', base_throughput, throughput))
+        for name, result in load['endpoints'].items():
+            base = base_load['endpoints'].get(name)
+            if base is None:
+                continue
+            for metric in ('p50_ms', 'p95_ms'):
+                if _slower(result[metric], base[metric], threshold, min_ms):
+                    regressions.append((f'load {name}', metric, base[metric], result[metric]))
+    return regressions
+
+
+class Command(BaseCommand):
+    help = (
+        'ชุด benchmark ของ API: วัด query และ latency ของทุก endpoint ต่อบทบาท (in-process) '
+        'และ load test ตามสัดส่วนการใช้งานของแต่ละบทบาทผ่าน server จริง '
+        'บันทึกผลเป็น JSON (--output) และเทียบกับผลก่อนหน้า (--compare)'
+    )
+
+    def add_arguments(self, parser):
+        dataset = parser.add_argument_group('ข้อมูลจำลอง')
+        dataset.add_argument('--requests', type=int, default=20_000)
+        dataset.add_argument('--users', type=int, default=500)
+        dataset.add_argument('--technicians', type=int, default=30)
+        dataset.add_argument('--equipment', type=int, default=2000)
+        dataset.add_argument('--seed', type=int, default=0)
+
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='จำนวนรอบต่อ endpoint ในการวัดแบบ in-process')
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='จำนวน connection พร้อมกันใน load test (0 = ข้าม load test)')
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--warmup', type=float, default=2.0)
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--threads', type=int, default=32, help='thread ของ gunicorn')
+        parser.add_argument(
+            '--query-latency', type=float, default=0.0,
+            help='หน่วงทุก query ของ server (ms) จำลองฐานข้อมูลที่อยู่คนละเครื่อง'
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='ปิด cache สถิติ/ข้อมูลอ้างอิงของ server (วัดเวลาที่รอฐานข้อมูลจริง)'
+        )
+        parser.add_argument('--role-mix', default='user=70,technician=25,admin=5',
+                            help='สัดส่วน connection ต่อบทบาทใน load test')
+
+        parser.add_argument('--output', help='บันทึกผลเป็นไฟล์ JSON')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='เทียบกับไฟล์ผลก่อนหน้า exit code 1 ถ้าพบ regression')
+        parser.add_argument('--results', metavar='FILE',
+                            help='ใช้ผลจากไฟล์นี้แทนการรันใหม่ (ใช้คู่กับ --compare)')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='สัดส่วนที่ยอมให้ latency/throughput แย่ลง (0.2 = 20%%)')
+        parser.add_argument('--min-ms', type=float, default=1.0,
+                            help='ไม่ถือเป็น regression ถ้า latency ต่างกันไม่เกินค่านี้ (ms)')
+
+    def handle(self, *args, **options):
+        if options['results']:
+            with open(options['results']) as fileobj:
+                results = json.load(fileobj)
+        else:
+            results = self._run(options)
+            if options['output']:
+                with open(options['output'], 'w') as fileobj:
+                    json.dump(results, fileobj, indent=2, ensure_ascii=False)
+                self.stdout.write(f"บันทึกผลที่ {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as fileobj:
+                baseline = json.load(fileobj)
+            self._report_comparison(baseline, results, options)
+
+    def _run(self, options):
+        role_mix = self._role_mix(options['role_mix'])
+        if options['concurrency']:
+            limit = raise_fd_limit()
+            if options['concurrency'] * 2 + 100 > limit:
+                raise CommandError(f'file descriptor limit ({limit}) ไม่พอ')
+
+        with benchmark_database(on_disk=True):
+            seed_dataset(
+                options['requests'], users=options['users'],
+                technicians=options['technicians'], equipment=options['equipment'],
+                seed=options['seed'],
+                log=lambda message: self.stdout.write(f'  seed {message}')
+                if options['verbosity'] > 1 else None,
+            )
+            users = sample_users()
+            results = {
+                'meta': {
+                    'created_at': timezone.now().isoformat(),
+                    'git_commit': git_commit(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'async_read_views': settings.ASYNC_READ_VIEWS,
+                    'dataset': {
+                        name: options[name]
+                        for name in ('requests', 'users', 'technicians', 'equipment', 'seed')
+                    },
+                    'load': {
+                        name: options[name]
+                        for name in (
+                            'concurrency', 'duration', 'server', 'threads', 'query_latency',
+                            'no_cache',
+                        )
+                    },
+                    'role_mix': role_mix,
+                },
+                'micro': self._micro(users, options['iterations']),
+            }
+            if options['concurrency']:
+                database = connection.settings_dict['NAME']
+                connection.close()
+                results['load'] = self._load(users, role_mix, database, options)
+        return results
+
+    def _role_mix(self, value):
+        try:
+            mix = {
+                role: int(weight)
+                for role, weight in (item.split('=') for item in value.split(','))
+            }
+        except ValueError:
+            raise CommandError('--role-mix ต้องอยู่ในรูปแบบ user=70,technician=25,admin=5')
+        if not set(mix) <= set(ROLES) or not any(mix.values()):
+            raise CommandError(f'บทบาทที่ใช้ได้: {", ".join(ROLES)}')
+        return mix
+
+    def _micro(self, users, iterations):
+        """เรียกแต่ละ endpoint ทีละ request ใน process นี้ นับ query และจับเวลา"""
+        client = TestClient()
+        counter = QueryCounter()
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<36}{'status':>7}{'queries':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        for role in ROLES:
+            data = users[role][0]
+            headers = {'Authorization': f"Bearer {data['token']}", 'Accept': 'application/json'}
+            for name, _, build in endpoints(role, data):
+                rng = random.Random(0)
+                durations, queries, statuses = [], [], Counter()
+                for _ in range(iterations):
+                    method, path, body = build(rng)
+                    before = counter.count
+                    started = time.perf_counter()
+                    if method == 'GET':
+                        response = client.get(path, headers=headers)
+                    else:
+                        response = client.post(
+                            path, body, content_type='application/json', headers=headers
+                        )
+                    durations.append(time.perf_counter() - started)
+                    queries.append(counter.count - before)
+                    statuses[response.status_code] += 1
+                key = f'{role} {name}'
+                results[key] = {
+                    'status': statuses.most_common(1)[0][0],
+                    'queries': max(queries),
+                    'p50_ms': round(percentile(durations, 50) * 1000, 2),
+                    'p95_ms': round(percentile(durations, 95) * 1000, 2),
+                    'p99_ms': round(percentile(durations, 99) * 1000, 2),
+                }
+                result = results[key]
+                self.stdout.write(
+                    f"{key:<36}{result['status']:>7}{result['queries']:>8}"
+                    f"{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                )
+        return results
+
+    def _load(self, users, role_mix, database, options):
+        """ยิง request ตามสัดส่วนของแต่ละบทบาทพร้อมกันผ่าน server จริง"""
+        rng = random.Random(options['seed'])
+        roles = list(role_mix)
+        specs = []
+        for index in range(options['concurrency']):
+            role = rng.choices(roles, [role_mix[role] for role in roles])[0]
+            data = rng.choice(users[role])
+            specs.append((role, data))
+
+        env = {'ASYNC_READ_VIEWS': str(options['server'] == 'asgi')}
+        if options['no_cache']:
+            env.update(DASHBOARD_STATS_CACHE_TTL='0', REFERENCE_CACHE_TTL='0')
+        try:
+            with running_server(
+                options['server'], database, threads=options['threads'],
+                query_latency=options['query_latency'], env=env
+            ) as port:
+                self.stdout.write(
+                    f"\nload test: {options['server']}, {len(specs)} connections, "
+                    f"{options['duration']:.0f}s"
+                )
+                clients = [
+                    Client(port, data['token'], [
+                        (f'{role} {name}', weight, build)
+                        for name, weight, build in endpoints(role, data)
+                    ], seed=index)
+                    for index, (role, data) in enumerate(specs)
+                ]
+                latencies, by_endpoint = asyncio.run(
+                    run_load(clients, options['duration'], options['warmup'])
+                )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+        statuses = sum((endpoint['statuses'] for endpoint in by_endpoint.values()), Counter())
+        overall = summarize(latencies, options['duration'])
+        overall['errors'] = sum(
+            count for status, count in statuses.items() if status == 'error' or status >= 500
+        )
+        result = {'overall': overall, 'endpoints': {}}
+        self.stdout.write(
+            f"{'endpoint':<36}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  status"
+        )
+        for name in sorted(by_endpoint):
+            endpoint = by_endpoint[name]
+            summary = summarize(endpoint['latencies'], options['duration'])
+            summary['statuses'] = {
+                str(status): count for status, count in endpoint['statuses'].items()
+            }
+            result['endpoints'][name] = summary
+            self.stdout.write(
+                f"{name:<36}{summary['throughput']:>8.1f}{summary['p50_ms']:>9.1f}"
+                f"{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}  {summary['statuses']}"
+            )
+        self.stdout.write(
+            f"{'overall':<36}{overall['throughput']:>8.1f}{overall['p50_ms']:>9.1f}"
+            f"{overall['p95_ms']:>9.1f}{overall['p99_ms']:>9.1f}  errors: {overall['errors']}"
+        )
+        return result
+
+    def _report_comparison(self, baseline, results, options):
+        regressions = compare_results(
+            baseline, results, options['threshold'], options['min_ms']
+        )
+        self.stdout.write(
+            f"\nเทียบกับ {options['compare']} "
+            f"(commit {baseline.get('meta', {}).get('git_commit')}, "
+            f"เกณฑ์ {options['threshold']:.0%})"
+        )
+        if baseline.get('meta', {}).get('dataset') != results.get('meta', {}).get('dataset'):
+            self.stdout.write(self.style.WARNING('ขนาดข้อมูลจำลองไม่เท่ากับ baseline'))
+        for name, metric, before, after in regressions:
+            self.stdout.write(self.style.ERROR(f'{name:<36}{metric:<12}{before} -> {after}'))
+        if regressions:
+            raise CommandError(f'พบ regression {len(regressions)} รายการ')
+        self.stdout.write(self.style.SUCCESS('ไม่พบ regression'))
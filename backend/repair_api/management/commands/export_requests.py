@@ -0,0 +1,49 @@
+# repair_api/management/commands/export_requests.py
+
+import sys
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from repair_api.export import EXPORT_FORMATS, stream_export
+from repair_api.models import RepairRequest
+
+
+class Command(BaseCommand):
+    help = 'ส่งออกคำร้องพร้อมประวัติเป็น CSV/NDJSON แบบ streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-',
+                            help='ไฟล์ปลายทาง (ค่าเริ่มต้น - คือ stdout)')
+        parser.add_argument('--format', dest='export_format', default='csv',
+                            choices=sorted(EXPORT_FORMATS))
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=None)
+        parser.add_argument('--user', help='ส่งออกเฉพาะคำร้องที่ผู้ใช้นี้มองเห็น (username)')
+
+    def handle(self, *args, **options):
+        queryset = RepairRequest.objects.all()
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"ไม่พบผู้ใช้ {options['user']}")
+            queryset = queryset.visible_to(user)
+
+        chunks = stream_export(
+            queryset, options['export_format'],
+            gzip=options['gzip'], chunk_size=options['chunk_size'],
+        )
+        start = time.perf_counter()
+        written = 0
+        target = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+                written += len(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+        self.stderr.write(f'{written} bytes in {time.perf_counter() - start:.2f}s')
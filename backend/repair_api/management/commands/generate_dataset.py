@@ -0,0 +1,79 @@
+# repair_api/management/commands/generate_dataset.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from repair_api.analytics import rebuild_all
+from repair_api.seeding import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'เพิ่มข้อมูลจำลองปริมาณมาก (ผู้ใช้ อุปกรณ์ คำร้อง ประวัติ) ลงฐานข้อมูลปัจจุบัน '
+        'สำหรับวางแผน capacity - ห้ามรันบนฐานข้อมูล production'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100_000,
+                            help='จำนวนคำร้องที่เพิ่ม')
+        parser.add_argument('--users', type=int, default=1000,
+                            help='จำนวนผู้ใช้ทั่วไปทั้งหมด (สร้างเพิ่มจนครบ)')
+        parser.add_argument('--technicians', type=int, default=50)
+        parser.add_argument('--admins', type=int, default=5)
+        parser.add_argument('--equipment', type=int, default=10_000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--no-histories', action='store_true',
+                            help='ไม่สร้างประวัติของคำร้อง')
+        parser.add_argument('--password', default=None,
+                            help='รหัสผ่านของผู้ใช้ที่สร้างใหม่ (ไม่ระบุ = เข้าสู่ระบบไม่ได้)')
+        parser.add_argument('--prefix', default='seed',
+                            help='prefix ของ username รหัสอุปกรณ์ และชื่อหมวดหมู่')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='จำนวน process ที่สร้างข้อมูลพร้อมกัน')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--skip-analytics', action='store_true',
+                            help='ไม่สร้างตารางสรุปรายวันใหม่ (รัน refresh_analytics --full เองภายหลัง)')
+        parser.add_argument('--defer-indexes', action='store_true',
+                            help='ลบ index ของคำร้อง/ประวัติระหว่างเพิ่มแล้วสร้างใหม่ตอนจบ '
+                                 '(เร็วกว่าเมื่อเพิ่มข้อมูลมาก ใช้เมื่อไม่มีผู้ใช้งานฐานข้อมูลนี้เท่านั้น)')
+        parser.add_argument('--force', action='store_true',
+                            help='รันแม้ DEBUG=False')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                'DEBUG=False อาจเป็นฐานข้อมูล production - ระบุ --force ถ้าต้องการรันจริง'
+            )
+        started = time.perf_counter()
+        try:
+            counts = generate_dataset(
+                options['requests'], users=options['users'],
+                technicians=options['technicians'], admins=options['admins'],
+                equipment=options['equipment'], categories=options['categories'],
+                histories=not options['no_histories'], password=options['password'],
+                prefix=options['prefix'], batch_size=options['batch_size'],
+                workers=options['workers'], defer_indexes=options['defer_indexes'],
+                seed=options['seed'],
+                log=lambda message: self.stdout.write(f'  {message}')
+                if options['verbosity'] > 1 else None,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.perf_counter() - started
+        rows = sum(counts.values())
+        self.stdout.write(
+            ', '.join(f'{table} {count}' for table, count in counts.items())
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'เพิ่ม {rows} แถวใน {elapsed:.1f} วินาที ({rows / elapsed:,.0f} แถว/วินาที)'
+        ))
+
+        if not options['skip_analytics']:
+            started = time.perf_counter()
+            rebuild_all()
+            self.stdout.write(
+                f'สร้างตารางสรุปรายวันใหม่ใน {time.perf_counter() - started:.1f} วินาที'
+            )
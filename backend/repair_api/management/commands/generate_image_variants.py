@@ -0,0 +1,97 @@
+# repair_api/management/commands/generate_image_variants.py
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from repair_api.cache import bump_table_versions
+from repair_api.images import (
+    PERMANENT_ERRORS, delete_variants, failure_record, generate_variants, is_processed,
+)
+from repair_api.models import Equipment
+
+
+def _init_worker():
+    # process ที่เริ่มแบบ spawn ต้องตั้งค่า Django เอง (fork ได้จาก process แม่แล้ว)
+    django.setup()
+
+
+def _generate(item):
+    pk, name = item
+    try:
+        return pk, generate_variants(name), None
+    except PERMANENT_ERRORS as exc:
+        # บันทึกไว้ใน image_variants ไม่ให้ถูกส่งประมวลผลซ้ำ
+        return pk, failure_record(name, exc), f'{type(exc).__name__}: {exc}'
+    except Exception as exc:
+        return pk, None, f'{type(exc).__name__}: {exc}'
+
+
+class Command(BaseCommand):
+    help = 'สร้างรูปย่อ (thumbnail, medium, webp) ของรูปอุปกรณ์ที่มีอยู่แล้วด้วย process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='สร้างใหม่ทั้งหมด รวมรูปที่มีรูปย่อแล้วและรูปที่เคยสร้างไม่ได้'
+        )
+
+    def handle(self, *args, **options):
+        equipments = Equipment.objects.exclude(image='').exclude(image__isnull=True)
+        pending = [
+            equipment for equipment in equipments.only('id', 'image', 'image_variants')
+            if options['all'] or not is_processed(equipment)
+        ]
+        self.stdout.write(f'{len(pending)} images to process')
+        if not pending:
+            return
+
+        started = time.perf_counter()
+        done = failed = 0
+        batch_size = options['batch_size']
+        # ไม่ส่ง connection ของฐานข้อมูลต่อให้ process ลูก
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers'],
+                                 initializer=_init_worker) as pool:
+            for start in range(0, len(pending), batch_size):
+                batch = {
+                    equipment.pk: equipment for equipment in pending[start:start + batch_size]
+                }
+                items = [(pk, equipment.image.name) for pk, equipment in batch.items()]
+                results = list(pool.map(_generate, items, chunksize=4))
+
+                with transaction.atomic():
+                    for pk, variants, error in results:
+                        if error:
+                            failed += 1
+                            self.stderr.write(f'{batch[pk].image.name}: {error}')
+                        else:
+                            done += 1
+                        if variants is None:
+                            continue
+                        old_variants = batch[pk].image_variants
+                        Equipment.objects.filter(
+                            pk=pk, image=variants['source']
+                        ).update(image_variants=variants)
+                        # รูปย่อของรูปต้นฉบับเดิมที่ถูกเปลี่ยนไปแล้ว
+                        if old_variants and old_variants.get('source') != variants['source']:
+                            delete_variants(old_variants)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'  {done + failed}/{len(pending)} images, '
+                    f'{(done + failed) / elapsed:.1f} images/s'
+                )
+
+        # update() ไม่ส่ง signal จึงต้องเปลี่ยน version ของตารางเอง
+        bump_table_versions(Equipment)
+        self.stdout.write(
+            f'processed: {done}, failed: {failed}, '
+            f'{time.perf_counter() - started:.1f}s'
+        )
@@ -0,0 +1,37 @@
+# repair_api/management/commands/import_equipment.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from repair_api.importer import import_equipment
+
+
+class Command(BaseCommand):
+    help = 'นำเข้าอุปกรณ์จากไฟล์ CSV หรือ XLSX (อัพเดทแถวที่มี equipment_code ซ้ำ)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='ไฟล์ .csv หรือ .xlsx (แถวแรกเป็นชื่อคอลัมน์)')
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        def progress(summary):
+            self.stdout.write(
+                f"  {summary['rows']} rows, {summary['rows_per_second']} rows/s"
+            )
+
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                summary = import_equipment(
+                    fileobj, options['path'],
+                    batch_size=options['batch_size'],
+                    progress=progress if options['verbosity'] > 1 else None,
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        for error in summary['errors']:
+            self.stdout.write(self.style.WARNING(f"บรรทัด {error['line']}: {error['error']}"))
+        self.stdout.write(
+            f"rows: {summary['rows']}, imported: {summary['imported']}, "
+            f"errors: {summary['error_count']}, {summary['seconds']}s "
+            f"({summary['rows_per_second']} rows/s)"
+        )
@@ -0,0 +1,42 @@
+# repair_api/management/commands/rebuild_status_rollup.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from repair_api.rollups import count_requests_by_key, current_rollup, rebuild_rollup
+from repair_api.stats import invalidate_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = 'สร้างใหม่หรือตรวจสอบตาราง RepairRequestStatusCount จากคำร้องจริง'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='ตรวจสอบอย่างเดียว ไม่แก้ไขข้อมูล (exit code 1 ถ้าไม่ตรง)')
+        parser.add_argument('--chunk-size', type=int, default=50000,
+                            help='จำนวน id ต่อช่วงที่นับในแต่ละ query')
+
+    def handle(self, *args, **options):
+        expected = count_requests_by_key(chunk_size=options['chunk_size'])
+
+        if options['verify']:
+            actual = current_rollup()
+            mismatches = [
+                key for key in set(expected) | set(actual)
+                if expected[key] != actual[key]
+            ]
+            for key in mismatches:
+                self.stdout.write(
+                    f'{key}: expected {expected[key]}, found {actual[key]}'
+                )
+            if mismatches:
+                raise CommandError(f'ตัวนับไม่ตรง {len(mismatches)} รายการ')
+            self.stdout.write(self.style.SUCCESS(
+                f'ตัวนับถูกต้อง ({len(expected)} keys, {sum(expected.values())} คำร้อง)'
+            ))
+            return
+
+        rebuild_rollup(expected)
+        invalidate_dashboard_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'สร้างตัวนับใหม่ {len(expected)} keys ({sum(expected.values())} คำร้อง)'
+        ))
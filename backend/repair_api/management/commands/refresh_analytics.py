@@ -0,0 +1,37 @@
+# repair_api/management/commands/refresh_analytics.py
+
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from repair_api.analytics import rebuild_all, refresh_dirty_days
+from repair_api.models import AnalyticsDirtyDay
+
+
+class Command(BaseCommand):
+    help = (
+        'คำนวณสรุปรายวันสำหรับรายงาน (DailyCategoryStats, DailyTechnicianStats) ใหม่ '
+        'สำหรับวันที่รอคำนวณ - ตั้ง cron ทุกคืน เช่น "refresh_analytics --days 2"'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='สร้างตารางสรุปใหม่ทั้งหมดจากคำร้อง')
+        parser.add_argument('--days', type=int, default=0,
+                            help='คำนวณ N วันล่าสุดใหม่ด้วย (รองรับการแก้ไขที่ไม่ผ่าน signal)')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            rebuild_all()
+            self.stdout.write(self.style.SUCCESS('สร้างตารางสรุปรายวันใหม่ทั้งหมดแล้ว'))
+            return
+
+        today = timezone.localdate()
+        AnalyticsDirtyDay.objects.bulk_create(
+            [AnalyticsDirtyDay(date=today - timedelta(days=offset))
+             for offset in range(options['days'])],
+            ignore_conflicts=True,
+        )
+        days = refresh_dirty_days()
+        self.stdout.write(self.style.SUCCESS(f'คำนวณสรุปใหม่ {len(days)} วัน'))
@@ -0,0 +1,70 @@
+# repair_api/management/commands/run_jobs.py
+
+import logging
+import multiprocessing
+import signal
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from repair_api.jobs import Worker, default_worker_id
+
+logger = logging.getLogger(__name__)
+
+
+def _run_worker(index, options):
+    # process ที่เริ่มแบบ spawn ต้องตั้งค่า Django เอง (fork ได้จาก process แม่แล้ว)
+    django.setup()
+    worker = Worker(
+        worker_id=f'{default_worker_id()}#{index}',
+        batch_size=options['batch_size'],
+        poll_interval=options['poll_interval'],
+    )
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    summary = worker.run(burst=options['burst'])
+    # process ลูกไม่มี self.stdout ของคำสั่ง จึงรายงานผ่าน logging (ตั้งค่าใน LOGGING)
+    logger.info('worker %s หยุดทำงาน: %s', worker.worker_id, summary)
+
+
+class Command(BaseCommand):
+    help = 'รัน worker ประมวลผลคิวงานเบื้องหลังที่เก็บในฐานข้อมูล'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=None,
+            help='จำนวน worker process (ค่าเริ่มต้น JOB_WORKER_CONCURRENCY)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5, help='จำนวนงานที่จองต่อครั้ง')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument(
+            '--burst', action='store_true', help='หยุดเมื่อไม่มีงานที่ถึงเวลาเหลืออยู่'
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency'] or settings.JOB_WORKER_CONCURRENCY
+        self.stdout.write(f'starting {concurrency} job worker(s)')
+        if concurrency == 1:
+            _run_worker(0, options)
+            return
+
+        # ไม่ส่ง connection ของฐานข้อมูลต่อให้ process ลูก
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_run_worker, args=(index, options), daemon=False)
+            for index in range(concurrency)
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(signum, frame):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
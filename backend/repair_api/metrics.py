@@ -0,0 +1,132 @@
+# repair_api/metrics.py
+"""
+metrics รูปแบบ Prometheus สำหรับ GET /metrics
+
+- MetricsMiddleware (repair_api.middleware) บันทึกจำนวน request และ latency histogram ต่อ view,
+  request ที่กำลังทำงาน และจำนวน query/เวลาในฐานข้อมูล
+- cache ข้อมูลอ้างอิง (repair_api.cache) นับ lookup ตามผลลัพธ์ ตอน scrape คำนวณ hit ratio ให้ด้วย
+- ค่าทางธุรกิจ (คำร้องที่ยังไม่ปิด คิวงานเบื้องหลัง) คำนวณตอน scrape จากค่าที่ cache ไว้
+- ต้องส่ง METRICS_TOKEN ใน header Authorization ยกเว้นเมื่อ DEBUG=True และไม่ได้ตั้ง token
+
+รันหลาย process (gunicorn -w N หรือ uvicorn --workers N): ตั้ง PROMETHEUS_MULTIPROC_DIR
+ทุก worker จะเขียนค่าลงไฟล์ (mmap) ในโฟลเดอร์นั้น และ /metrics ของ worker ใดก็รวมค่าของทุก worker
+ต้องล้างโฟลเดอร์ก่อนเริ่ม server ทุกครั้ง (gunicorn.conf.py ทำให้)
+"""
+
+import atexit
+import os
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+MULTIPROCESS_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+QUEUE_STATS_CACHE_KEY = 'metrics:queue_stats'
+
+if MULTIPROCESS_DIR:
+    os.makedirs(MULTIPROCESS_DIR, exist_ok=True)
+
+REQUESTS = Counter(
+    'http_requests', 'จำนวน request ที่ตอบแล้ว', ['method', 'view', 'status'],
+)
+LATENCY = Histogram(
+    'http_request_duration_seconds', 'เวลาตั้งแต่รับ request จนได้ response', ['method', 'view'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'request ที่กำลังทำงาน', ['method'],
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Counter('db_queries', 'จำนวน query ที่ request รัน', ['view'])
+DB_SECONDS = Counter('db_query_duration_seconds', 'เวลารวมที่ request รอฐานข้อมูล', ['view'])
+CACHE_LOOKUPS = Counter(
+    'reference_cache_lookups', 'การอ่าน cache ข้อมูลอ้างอิงตามผลลัพธ์ (hit/miss/stale/wait)',
+    ['cache', 'outcome'],
+)
+
+if MULTIPROCESS_DIR:
+    # gauge แบบ live ของ process ที่ปิดไปแล้วต้องไม่ถูกรวม (gunicorn เรียกซ้ำใน child_exit)
+    atexit.register(mark_process_dead, os.getpid())
+
+
+def _cache_hit_ratio(families):
+    """hit ratio ต่อชื่อ cache จากตัวนับ lookup ที่รวมทุก process แล้ว (นิยามเดียวกับ CacheStats)"""
+    lookups = {}
+    for family in families:
+        if family.name != 'reference_cache_lookups':
+            continue
+        for sample in family.samples:
+            if not sample.name.endswith('_total'):
+                continue
+            counts = lookups.setdefault(sample.labels['cache'], {'total': 0, 'miss': 0})
+            counts['total'] += sample.value
+            if sample.labels['outcome'] == 'miss':
+                counts['miss'] += sample.value
+    ratio = GaugeMetricFamily(
+        'reference_cache_hit_ratio', 'สัดส่วน lookup ที่ไม่ต้องคำนวณใหม่', labels=['cache'],
+    )
+    for name, counts in sorted(lookups.items()):
+        if counts['total']:
+            ratio.add_metric([name], (counts['total'] - counts['miss']) / counts['total'])
+    return ratio
+
+
+def _business_metrics():
+    from .jobs import queue_stats
+    from .stats import open_request_counts
+
+    open_requests = GaugeMetricFamily(
+        'repair_requests_open', 'คำร้องที่ยังไม่ปิดตามสถานะและความสำคัญ',
+        labels=['status', 'priority'],
+    )
+    for status, priority, count in open_request_counts():
+        open_requests.add_metric([status, priority], count)
+    yield open_requests
+
+    queue = cache.get(QUEUE_STATS_CACHE_KEY)
+    if queue is None:
+        queue = queue_stats()
+        cache.set(QUEUE_STATS_CACHE_KEY, queue, settings.METRICS_QUEUE_CACHE_SECONDS)
+    jobs = GaugeMetricFamily('background_jobs', 'งานเบื้องหลังตามสถานะ', labels=['status'])
+    for status, count in queue['status'].items():
+        jobs.add_metric([status], count)
+    yield jobs
+    yield GaugeMetricFamily(
+        'background_jobs_oldest_due_seconds', 'อายุของงานที่ถึงเวลาแล้วแต่ยังไม่ถูกหยิบ',
+        value=queue['oldest_due_seconds'],
+    )
+
+
+class _Scrape:
+    """registry ชั่วคราวของการ scrape หนึ่งครั้ง (generate_latest ต้องการเพียง collect())"""
+
+    def collect(self):
+        if MULTIPROCESS_DIR:
+            families = list(MultiProcessCollector(None).collect())
+        else:
+            families = list(REGISTRY.collect())
+        yield from families
+        yield _cache_hit_ratio(families)
+        yield from _business_metrics()
+
+
+def metrics_view(request):
+    """GET /metrics ในรูปแบบ text ของ Prometheus"""
+    if not settings.METRICS_ENABLED:
+        return JsonResponse({'error': 'ไม่ได้เปิดใช้ metrics'}, status=404)
+    token = settings.METRICS_TOKEN
+    if not token:
+        # ชื่อ view จำนวน request และสถานะคิวไม่ควรเปิดให้ทุกคนอ่านบน production
+        if not settings.DEBUG:
+            return JsonResponse(
+                {'error': 'ต้องตั้งค่า METRICS_TOKEN ก่อนเปิดอ่าน metrics'}, status=403
+            )
+    elif not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'ต้องระบุ token ของ metrics'}, status=401)
+    return HttpResponse(generate_latest(_Scrape()), content_type=CONTENT_TYPE_LATEST)
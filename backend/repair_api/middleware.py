@@ -0,0 +1,169 @@
+# repair_api/middleware.py
+
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import metrics, querystats
+
+logger = logging.getLogger(__name__)
+
+
+def _view_label(request):
+    """ชื่อ view ของ request (จำนวนค่าจำกัด ไม่ขึ้นกับ id ใน URL) None ถ้าไม่ตรง URL ใด"""
+    match = request.resolver_match
+    return (match.view_name or match.route) if match else None
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware ที่รองรับทั้ง sync และ async
+
+    middleware ของ WhiteNoise 6.6 เป็น sync อย่างเดียว ภายใต้ ASGI Django จึงต้องรัน
+    middleware ที่เหลือและทุก view (รวมถึง view แบบ async) ใน thread ผ่าน async_to_sync
+    คลาสนี้ส่งต่อ request ที่ไม่ใช่ไฟล์ static ไปแบบ async โดยไม่ต้องสลับ thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class QueryInstrumentationMiddleware:
+    """บันทึกจำนวน query เวลาในฐานข้อมูล และ query ที่ซ้ำกันของแต่ละ request (repair_api.querystats)
+
+    - ส่ง header Server-Timing (db, app) เมื่อ QUERY_INSTRUMENTATION_HEADER=True
+    - log view ที่ใช้ query เกิน QUERY_COUNT_WARNING ครั้ง เวลาในฐานข้อมูลเกิน QUERY_TIME_WARNING_MS
+      หรือรัน query รูปแบบเดียวกันเกิน QUERY_DUPLICATE_WARNING ครั้ง (มักเป็น N+1)
+    - response แบบ streaming (export, SSE) นับเฉพาะ query ก่อนเริ่มส่งข้อมูล
+    - ใช้ QueryStats เดียวกับ MetricsMiddleware (querystats.collect_request) query จึงถูกบันทึกครั้งเดียว
+    - QUERY_INSTRUMENTATION=False ถอด middleware ออกจาก chain (ไม่มีค่าใช้จ่าย)
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        querystats.install()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with querystats.collect_request(request) as stats:
+            response = self.get_response(request)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        with querystats.collect_request(request) as stats:
+            response = await self.get_response(request)
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, stats, elapsed):
+        view = _view_label(request)
+        if view:
+            querystats.view_stats.record(view, stats)
+
+        if settings.QUERY_INSTRUMENTATION_HEADER:
+            timing = [
+                f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"',
+                f'app;dur={elapsed * 1000:.1f}',
+            ]
+            if response.has_header('Server-Timing'):
+                timing.insert(0, response['Server-Timing'])
+            response['Server-Timing'] = ', '.join(timing)
+
+        duplicates = stats.duplicates()
+        worst = max(duplicates.values(), default=0)
+        if (stats.count > settings.QUERY_COUNT_WARNING
+                or stats.duration_ms > settings.QUERY_TIME_WARNING_MS
+                or worst > settings.QUERY_DUPLICATE_WARNING):
+            logger.warning(
+                'query เกินเกณฑ์ %s %s (%s): %d queries, %.1f ms, ซ้ำ %d ครั้ง%s',
+                request.method, request.path, view or '-', stats.count, stats.duration_ms,
+                stats.duplicate_count,
+                ''.join(
+                    f'\n  {count}x {sql[:200]}' for sql, count in list(duplicates.items())[:3]
+                ),
+            )
+
+
+class MetricsMiddleware:
+    """บันทึก metrics ของ request สำหรับ /metrics (repair_api.metrics)
+
+    จำนวน request และ latency ต่อ view จำนวน request ที่กำลังทำงาน และ query/เวลาในฐานข้อมูล
+    response แบบ streaming นับเวลาถึงตอนเริ่มส่งข้อมูลเช่นเดียวกับ QueryInstrumentationMiddleware
+    METRICS_ENABLED=False ถอด middleware ออกจาก chain
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        querystats.install()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        in_progress = metrics.IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        try:
+            with querystats.collect_request(request) as stats:
+                response = self.get_response(request)
+        finally:
+            in_progress.dec()
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        in_progress = metrics.IN_PROGRESS.labels(request.method)
+        in_progress.inc()
+        try:
+            with querystats.collect_request(request) as stats:
+                response = await self.get_response(request)
+        finally:
+            in_progress.dec()
+        self._finish(request, response, stats, time.perf_counter() - started)
+        return response
+
+    def _finish(self, request, response, stats, elapsed):
+        # URL ที่ไม่ตรง view ใดรวมเป็นค่าเดียว (กัน label มีค่าไม่จำกัดจาก URL สุ่ม)
+        view = _view_label(request) or 'unmatched'
+        metrics.REQUESTS.labels(request.method, view, response.status_code).inc()
+        metrics.LATENCY.labels(request.method, view).observe(elapsed)
+        if stats.count:
+            metrics.DB_QUERIES.labels(view).inc(stats.count)
+            metrics.DB_SECONDS.labels(view).inc(stats.duration)
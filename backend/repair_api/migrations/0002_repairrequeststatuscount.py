@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_status_counts(apps, schema_editor):
+    RepairRequest = apps.get_model('repair_api', 'RepairRequest')
+    RepairRequestStatusCount = apps.get_model('repair_api', 'RepairRequestStatusCount')
+    rows = RepairRequest.objects.values(
+        'requester_id', 'assigned_to_id', 'status'
+    ).annotate(total=models.Count('id')).order_by()
+    RepairRequestStatusCount.objects.bulk_create(
+        [
+            RepairRequestStatusCount(
+                requester_id=row['requester_id'],
+                assigned_to_id=row['assigned_to_id'],
+                status=row['status'],
+                count=row['total'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('repair_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepairRequestStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20, verbose_name='สถานะ')),
+                ('count', models.IntegerField(default=0, verbose_name='จำนวน')),
+                ('assigned_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ช่างที่รับผิดชอบ')),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ผู้แจ้ง')),
+            ],
+            options={
+                'verbose_name': 'ตัวนับสถานะคำร้อง',
+                'verbose_name_plural': 'ตัวนับสถานะคำร้อง',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='repairrequeststatuscount',
+            constraint=models.UniqueConstraint(fields=('requester', 'assigned_to', 'status'), name='unique_status_count_key'),
+        ),
+        migrations.AddConstraint(
+            model_name='repairrequeststatuscount',
+            constraint=models.UniqueConstraint(condition=models.Q(('assigned_to__isnull', True)), fields=('requester', 'status'), name='unique_status_count_key_unassigned'),
+        ),
+        migrations.RunPython(build_status_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:57
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_active_equipment(apps, schema_editor):
+    EquipmentCategory = apps.get_model('repair_api', 'EquipmentCategory')
+    Equipment = apps.get_model('repair_api', 'Equipment')
+    active_counts = Equipment.objects.filter(
+        category=models.OuterRef('pk'), is_active=True
+    ).order_by().values('category').annotate(total=models.Count('id')).values('total')
+    EquipmentCategory.objects.update(active_equipment_count=Coalesce(
+        models.Subquery(active_counts, output_field=models.IntegerField()), 0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0002_repairrequeststatuscount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentcategory',
+            name='active_equipment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='จำนวนอุปกรณ์ที่ใช้งาน'),
+        ),
+        migrations.RunPython(count_active_equipment, migrations.RunPython.noop),
+    ]
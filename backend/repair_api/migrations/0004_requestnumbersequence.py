@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # ตั้งค่าเริ่มต้นจากเลขที่คำร้องเดิมรูปแบบ REQ{ปี}{ลำดับ}
+    RepairRequest = apps.get_model('repair_api', 'RepairRequest')
+    RequestNumberSequence = apps.get_model('repair_api', 'RequestNumberSequence')
+    last_numbers = {}
+    for number in RepairRequest.objects.values_list('request_number', flat=True).iterator():
+        year, sequence = number[3:7], number[7:]
+        if number.startswith('REQ') and year.isdigit() and sequence.isdigit():
+            year = int(year)
+            last_numbers[year] = max(last_numbers.get(year, 0), int(sequence))
+    RequestNumberSequence.objects.bulk_create([
+        RequestNumberSequence(year=year, last_number=last)
+        for year, last in last_numbers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0003_equipmentcategory_active_equipment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestNumberSequence',
+            fields=[
+                ('year', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='ปี')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='เลขล่าสุด')),
+            ],
+            options={
+                'verbose_name': 'ลำดับเลขที่คำร้อง',
+                'verbose_name_plural': 'ลำดับเลขที่คำร้อง',
+            },
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
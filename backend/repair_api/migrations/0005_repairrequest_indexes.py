@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0004_requestnumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['-request_date'], name='repairreq_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['requester', '-request_date'], name='repairreq_requester_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['requester', 'status', '-request_date'], name='repairreq_req_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['assigned_to', '-request_date'], name='repairreq_assignee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['status', '-request_date'], name='repairreq_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['priority', '-request_date'], name='repairreq_priority_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['equipment', '-request_date'], name='repairreq_equipment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'assigned', 'in_progress'])), fields=['status', '-request_date'], name='repairreq_open_date_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Full-text (trigram) search index for RepairRequest and Equipment
+
+from django.db import migrations
+
+# ต้องตรงกับ repair_api.search.SEARCH_FIELDS
+SEARCH_TABLES = {
+    'repair_api_repairrequest': ['request_number', 'title', 'description'],
+    'repair_api_equipment': ['equipment_code', 'name', 'location'],
+}
+
+
+def sqlite_statements(table, columns):
+    fts = f'{table}_fts'
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f'INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{table}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END',
+        f'CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END',
+        f'CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} '
+        f'BEGIN {delete_old} {insert_new} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgresql_statements(table, columns):
+    document = " || ' ' || ".join(f"COALESCE({column}, '')" for column in columns)
+    return [
+        f'CREATE INDEX IF NOT EXISTS {table}_search_trgm ON {table} '
+        f'USING gin (({document}) gin_trgm_ops)',
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+            if not cursor.fetchone()[0]:
+                # SQLite ที่ไม่มี FTS5 จะค้นหาด้วย icontains แบบเดิม
+                return
+        for table, columns in SEARCH_TABLES.items():
+            for statement in sqlite_statements(table, columns):
+                schema_editor.execute(statement)
+    elif vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, columns in SEARCH_TABLES.items():
+            for statement in postgresql_statements(table, columns):
+                schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in SEARCH_TABLES:
+        if vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif vendor == 'postgresql':
+            schema_editor.execute(f'DROP INDEX IF EXISTS {table}_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0005_repairrequest_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
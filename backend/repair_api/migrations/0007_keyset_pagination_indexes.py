@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='repairrequest',
+            name='repairreq_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['-created_at', '-id'], name='equipment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['is_active', '-created_at', '-id'], name='equipment_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipment',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='equipment_cat_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['-request_date', '-id'], name='repairreq_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipment',
+            name='image_variants',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='รูปย่อ'),
+        ),
+    ]
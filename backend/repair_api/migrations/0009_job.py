@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:43
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0008_equipment_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='ชื่องาน')),
+                ('payload', models.JSONField(default=dict, verbose_name='ข้อมูลงาน')),
+                ('status', models.CharField(choices=[('queued', 'รอดำเนินการ'), ('running', 'กำลังทำงาน'), ('succeeded', 'สำเร็จ'), ('failed', 'ล้มเหลว')], default='queued', max_length=20, verbose_name='สถานะ')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='จำนวนครั้งที่ทำ')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='จำนวนครั้งสูงสุด')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='เริ่มได้ตั้งแต่')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=100, verbose_name='worker')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='ข้อผิดพลาดล่าสุด')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'งานเบื้องหลัง',
+                'verbose_name_plural': 'งานเบื้องหลัง',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'run_at', 'id'], name='job_status_run_at_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('repair_api', '0009_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsDirtyDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='วันที่')),
+            ],
+            options={
+                'verbose_name': 'วันที่รอคำนวณสรุป',
+                'verbose_name_plural': 'วันที่รอคำนวณสรุป',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='วันที่')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='คำร้องใหม่')),
+                ('assigned_count', models.PositiveIntegerField(default=0, verbose_name='มอบหมายแล้ว')),
+                ('assign_seconds', models.FloatField(default=0, verbose_name='เวลารวมจนมอบหมาย (วินาที)')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='เสร็จสิ้น')),
+                ('complete_seconds', models.FloatField(default=0, verbose_name='เวลารวมจนเสร็จสิ้น (วินาที)')),
+                ('estimated_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='ค่าใช้จ่ายประมาณรวม')),
+                ('actual_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='ค่าใช้จ่ายจริงรวม')),
+            ],
+            options={
+                'verbose_name': 'สรุปรายวันตามหมวดหมู่',
+                'verbose_name_plural': 'สรุปรายวันตามหมวดหมู่',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyTechnicianStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='วันที่')),
+                ('assigned_count', models.PositiveIntegerField(default=0, verbose_name='ได้รับมอบหมาย')),
+                ('completed_count', models.PositiveIntegerField(default=0, verbose_name='เสร็จสิ้น')),
+                ('complete_seconds', models.FloatField(default=0, verbose_name='เวลารวมจนเสร็จสิ้น (วินาที)')),
+                ('actual_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='ค่าใช้จ่ายจริงรวม')),
+            ],
+            options={
+                'verbose_name': 'สรุปรายวันตามช่าง',
+                'verbose_name_plural': 'สรุปรายวันตามช่าง',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['assigned_date'], name='repairreq_assigned_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='repairrequest',
+            index=models.Index(fields=['completed_date'], name='repairreq_completed_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailytechnicianstats',
+            name='technician',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ช่าง'),
+        ),
+        migrations.AddField(
+            model_name='dailycategorystats',
+            name='category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='repair_api.equipmentcategory', verbose_name='หมวดหมู่'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailytechnicianstats',
+            constraint=models.UniqueConstraint(fields=('date', 'technician'), name='unique_daily_technician'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorystats',
+            constraint=models.UniqueConstraint(fields=('date', 'category'), name='unique_daily_category'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailycategorystats',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('date',), name='unique_daily_category_uncategorized'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('repair_api', '0010_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RepairHistoryArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(max_length=20, verbose_name='สถานะ')),
+                ('comment', models.TextField(blank=True, null=True, verbose_name='ความคิดเห็น')),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='วันที่ย้ายเข้า archive')),
+            ],
+            options={
+                'verbose_name': 'ประวัติการซ่อม (archive)',
+                'verbose_name_plural': 'ประวัติการซ่อม (archive)',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='repairhistory',
+            index=models.Index(fields=['repair_request', '-created_at'], name='repairhist_request_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='repairhistoryarchive',
+            name='repair_request',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_histories', to='repair_api.repairrequest', verbose_name='คำร้องซ่อม'),
+        ),
+        migrations.AddField(
+            model_name='repairhistoryarchive',
+            name='updated_by',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='ผู้อัพเดท'),
+        ),
+        migrations.AddIndex(
+            model_name='repairhistoryarchive',
+            index=models.Index(fields=['repair_request', '-created_at'], name='repairhistarc_request_date_idx'),
+        ),
+    ]
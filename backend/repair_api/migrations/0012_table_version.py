@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0011_repair_history_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='โมเดล')),
+                ('version', models.BigIntegerField(default=0, verbose_name='version')),
+            ],
+            options={
+                'verbose_name': 'version ของตาราง',
+                'verbose_name_plural': 'version ของตาราง',
+            },
+        ),
+    ]
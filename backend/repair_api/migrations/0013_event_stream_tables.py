@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0012_table_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTicket',
+            fields=[
+                ('ticket', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='ตั๋ว')),
+                ('token', models.TextField(verbose_name='access token')),
+                ('expires_at', models.DateTimeField(verbose_name='หมดอายุ')),
+            ],
+            options={
+                'verbose_name': 'ตั๋วเปิด event stream',
+                'verbose_name_plural': 'ตั๋วเปิด event stream',
+            },
+        ),
+        migrations.CreateModel(
+            name='StreamEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('payload', models.JSONField(verbose_name='ข้อมูล event')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'event ของคำร้อง',
+                'verbose_name_plural': 'event ของคำร้อง',
+            },
+        ),
+    ]
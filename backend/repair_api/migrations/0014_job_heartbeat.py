@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repair_api', '0013_event_stream_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='heartbeat ล่าสุด'),
+        ),
+    ]
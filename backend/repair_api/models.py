@@ -1,6 +1,8 @@
 # repair_api/models.py
 
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -8,6 +10,12 @@ class EquipmentCategory(models.Model):
     """หมวดหมู่อุปกรณ์ เช่น คอมพิวเตอร์, เครื่องพิมพ์, เฟอร์นิเจอร์"""
     name = models.CharField(max_length=100, unique=True, verbose_name="ชื่อหมวดหมู่")
     description = models.TextField(blank=True, null=True, verbose_name="คำอธิบาย")
+    # ตัวนับอุปกรณ์ที่ใช้งานอยู่ (denormalized) - อัพเดทโดย signal ของ Equipment
+    active_equipment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="จำนวนอุปกรณ์ที่ใช้งาน"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -54,6 +62,13 @@ class Equipment(models.Model):
         null=True,
         verbose_name="รูปภาพ"
     )
+    # รูปย่อที่สร้างจาก image (repair_api.images) - {'source': ชื่อรูปต้นฉบับ, variant: path}
+    image_variants = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="รูปย่อ"
+    )
     is_active = models.BooleanField(default=True, verbose_name="ใช้งานอยู่")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -62,11 +77,113 @@ class Equipment(models.Model):
         verbose_name = "อุปกรณ์"
         verbose_name_plural = "อุปกรณ์"
         ordering = ['-created_at']
+        # index สำหรับ keyset pagination บน (-created_at, -id) ของ EquipmentViewSet
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='equipment_created_idx'),
+            models.Index(
+                fields=['is_active', '-created_at', '-id'], name='equipment_active_created_idx'
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'], name='equipment_cat_created_idx'
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # จำหมวดหมู่ที่นับอุปกรณ์นี้อยู่ เพื่อปรับ active_equipment_count เมื่อมีการแก้ไข
+        # (ข้ามเมื่อโหลดด้วย only()/defer() ไม่เช่นนั้นจะ query ฟิลด์ที่ขาดวนซ้ำไม่รู้จบ)
+        if 'category_id' in field_names and 'is_active' in field_names:
+            instance._counted_category_id = instance.counted_category_id()
+        # หมวดหมู่เดิม เพื่อคำนวณสรุปรายวัน (repair_api.analytics) ใหม่เมื่อย้ายหมวดหมู่
+        if 'category_id' in field_names:
+            instance._analytics_category_id = instance.category_id
+        return instance
+
+    def counted_category_id(self):
+        """หมวดหมู่ที่นับอุปกรณ์นี้เป็น active (None ถ้าไม่ถูกนับ)"""
+        return self.category_id if self.is_active else None
 
     def __str__(self):
         return f"{self.equipment_code} - {self.name}"
 
 
+class RequestNumberSequence(models.Model):
+    """ตัวนับเลขที่คำร้องต่อปี (ใช้โดย repair_api.numbering)"""
+    year = models.PositiveIntegerField(primary_key=True, verbose_name="ปี")
+    last_number = models.PositiveIntegerField(default=0, verbose_name="เลขล่าสุด")
+
+    class Meta:
+        verbose_name = "ลำดับเลขที่คำร้อง"
+        verbose_name_plural = "ลำดับเลขที่คำร้อง"
+
+    def __str__(self):
+        return f"{self.year}: {self.last_number}"
+
+
+class RepairRequestQuerySet(models.QuerySet):
+    def bulk_create(self, objs, batch_size=None, **kwargs):
+        """สร้างคำร้องหลายรายการ พร้อมผลข้างเคียงเดียวกับ save() และ signal ของคำร้องใหม่
+
+        แจกเลขที่คำร้อง ปรับตัวนับสถานะ บันทึกวันที่ที่สรุปรายวันต้องคำนวณใหม่
+        และหลัง commit ล้าง cache แดชบอร์ด เปลี่ยน version ของตาราง และส่ง event
+        (ไม่รองรับ ignore_conflicts/update_conflicts เพราะไม่รู้ว่าแถวใดถูกสร้างจริง)
+        """
+        from .analytics import local_days, mark_dirty
+        from .cache import bump_table_versions
+        from .events import publish_on_commit, repair_request_event
+        from .numbering import allocate_request_numbers
+        from .rollups import apply_rollup_deltas
+        from .stats import invalidate_dashboard_stats
+
+        if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+            raise ValueError('RepairRequest.bulk_create ไม่รองรับ ignore_conflicts/update_conflicts')
+        objs = list(objs)
+        if not objs:
+            return objs
+        with transaction.atomic(using=self.db):
+            # แจกเลขที่คำร้องให้ทั้งชุดด้วยการจองครั้งเดียว
+            missing = [obj for obj in objs if not obj.request_number]
+            if missing:
+                numbers = allocate_request_numbers(timezone.now().year, len(missing))
+                for obj, number in zip(missing, numbers):
+                    obj.request_number = number
+            objs = super().bulk_create(objs, batch_size=batch_size, **kwargs)
+
+            apply_rollup_deltas(Counter(obj.rollup_key() for obj in objs))
+            days = set()
+            for obj in objs:
+                days |= local_days(obj.request_date, obj.assigned_date, obj.completed_date)
+                obj._rollup_key = obj.rollup_key()
+                obj._analytics_state = obj.analytics_state()
+            mark_dirty(days)
+            transaction.on_commit(invalidate_dashboard_stats)
+            transaction.on_commit(lambda: bump_table_versions(RepairRequest))
+            # ฐานข้อมูลที่ไม่คืน id จาก INSERT หลายแถว ไม่มี id ให้ส่งใน event
+            publish_on_commit([
+                repair_request_event(
+                    'created', obj.pk, obj.request_number, None, obj.rollup_key()
+                )
+                for obj in objs if obj.pk is not None
+            ])
+        return objs
+
+    def visible_to(self, user):
+        """คำร้องที่ผู้ใช้มองเห็นตามบทบาท"""
+        role = get_user_role(user)
+        if role == 'technician':
+            # ช่างเห็นงานที่ได้รับมอบหมายและงานที่รอรับ
+            return self.filter(models.Q(assigned_to_id=user.pk) | models.Q(status='pending'))
+        if role != 'admin':
+            # ผู้ใช้ทั่วไป (หรือไม่มีโปรไฟล์) เห็นเฉพาะคำร้องของตัวเอง
+            return self.filter(requester_id=user.pk)
+        return self
+
+
+# สถานะของงานที่ยังไม่ปิด
+OPEN_STATUSES = ['pending', 'assigned', 'in_progress']
+
+
 class RepairRequest(models.Model):
     """คำร้องขอซ่อม"""
     STATUS_CHOICES = [
@@ -145,34 +262,140 @@ class RepairRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = RepairRequestQuerySet.as_manager()
+
     class Meta:
         verbose_name = "คำร้องขอซ่อม"
         verbose_name_plural = "คำร้องขอซ่อม"
         ordering = ['-request_date']
+        # index ตามรูปแบบ filter + ORDER BY -request_date ของ RepairRequestViewSet
+        indexes = [
+            # มี id ต่อท้ายเพื่อให้ keyset pagination อ่านตาม index ได้โดยไม่ต้อง sort
+            models.Index(fields=['-request_date', '-id'], name='repairreq_date_id_idx'),
+            models.Index(fields=['requester', '-request_date'], name='repairreq_requester_date_idx'),
+            models.Index(
+                fields=['requester', 'status', '-request_date'],
+                name='repairreq_req_status_date_idx'
+            ),
+            models.Index(fields=['assigned_to', '-request_date'], name='repairreq_assignee_date_idx'),
+            models.Index(fields=['status', '-request_date'], name='repairreq_status_date_idx'),
+            models.Index(fields=['priority', '-request_date'], name='repairreq_priority_date_idx'),
+            models.Index(fields=['equipment', '-request_date'], name='repairreq_equipment_date_idx'),
+            # ช่วงวันที่ที่ repair_api.analytics คำนวณสรุปรายวันใหม่
+            models.Index(fields=['assigned_date'], name='repairreq_assigned_date_idx'),
+            models.Index(fields=['completed_date'], name='repairreq_completed_date_idx'),
+            # partial index เฉพาะงานที่ยังไม่ปิด (ฐานข้อมูลที่ไม่รองรับจะข้ามไป)
+            models.Index(
+                fields=['status', '-request_date'],
+                name='repairreq_open_date_idx',
+                condition=models.Q(status__in=OPEN_STATUSES)
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # จำค่าเดิมไว้ เพื่อย้ายตัวนับใน RepairRequestStatusCount เมื่อสถานะเปลี่ยน
+        # (ข้ามเมื่อโหลดด้วย only()/defer() ไม่เช่นนั้นจะ query ฟิลด์ที่ขาดวนซ้ำไม่รู้จบ
+        # save() อ่านค่าเดิมจากฐานข้อมูลแทน)
+        if cls.ROLLUP_FIELDS.issubset(field_names):
+            instance._rollup_key = instance.rollup_key()
+        # ค่าที่สรุปรายวันขึ้นอยู่ (repair_api.analytics) เพื่อรู้ว่าวันไหนต้องคำนวณใหม่
+        if cls.ANALYTICS_FIELDS.issubset(field_names):
+            instance._analytics_state = instance.analytics_state()
+        return instance
+
+    ROLLUP_FIELDS = frozenset({'requester_id', 'assigned_to_id', 'status'})
+
+    def rollup_key(self):
+        return (self.requester_id, self.assigned_to_id, self.status)
+
+    def _stored_rollup_key(self):
+        """key ของแถวที่บันทึกอยู่ในฐานข้อมูล (None ถ้ายังไม่มีแถว)"""
+        return type(self)._base_manager.filter(pk=self.pk).values_list(
+            'requester_id', 'assigned_to_id', 'status'
+        ).first()
+
+    def history_entries(self):
+        """ประวัติทั้งหมด (RepairHistory และ RepairHistoryArchive) เรียงจากใหม่ไปเก่า
+
+        ใช้ผลที่ prefetch ไว้ (histories_prefetch ใน views.py) ถ้ามี
+        """
+        entries = [*self.histories.all(), *self.archived_histories.all()]
+        entries.sort(key=lambda entry: (entry.created_at, entry.id), reverse=True)
+        return entries
+
+    ANALYTICS_FIELDS = frozenset({
+        'request_date', 'assigned_date', 'completed_date', 'status',
+        'equipment_id', 'assigned_to_id', 'estimated_cost', 'actual_cost',
+    })
+
+    def analytics_state(self):
+        return (
+            self.request_date, self.assigned_date, self.completed_date, self.status,
+            self.equipment_id, self.assigned_to_id, self.estimated_cost, self.actual_cost,
+        )
 
     def save(self, *args, **kwargs):
-        if not self.request_number:
-            # สร้างเลขที่คำร้องอัตโนมัติ เช่น REQ2024001
-            from django.utils import timezone
-            year = timezone.now().year
-            last_request = RepairRequest.objects.filter(
-                request_number__startswith=f'REQ{year}'
-            ).order_by('-request_number').first()
-            
-            if last_request:
-                last_number = int(last_request.request_number[-3:])
-                new_number = last_number + 1
-            else:
-                new_number = 1
-            
-            self.request_number = f'REQ{year}{new_number:03d}'
-        
-        super().save(*args, **kwargs)
+        from .numbering import allocate_request_numbers
+        from .rollups import move_rollup_count
+
+        with transaction.atomic():
+            if not self.request_number:
+                # สร้างเลขที่คำร้องอัตโนมัติ เช่น REQ2024001 จากตัวนับต่อปี
+                self.request_number = allocate_request_numbers(timezone.now().year)[0]
+            if not self._state.adding and not hasattr(self, '_rollup_key'):
+                # โหลดด้วย only()/defer() ไม่รู้ค่าเดิม signal ของ post_save ก็ใช้ค่านี้
+                self._rollup_key = self._stored_rollup_key()
+
+            super().save(*args, **kwargs)
+            new_key = self.rollup_key()
+            move_rollup_count(getattr(self, '_rollup_key', None), new_key)
+            self._rollup_key = new_key
 
     def __str__(self):
         return f"{self.request_number} - {self.title}"
 
 
+class RepairRequestStatusCount(models.Model):
+    """ตัวนับคำร้องแยกตาม ผู้แจ้ง/ช่าง/สถานะ (อัพเดทพร้อมกับการบันทึกคำร้อง)"""
+    requester = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="ผู้แจ้ง"
+    )
+    assigned_to = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="ช่างที่รับผิดชอบ"
+    )
+    status = models.CharField(max_length=20, verbose_name="สถานะ")
+    count = models.IntegerField(default=0, verbose_name="จำนวน")
+
+    class Meta:
+        verbose_name = "ตัวนับสถานะคำร้อง"
+        verbose_name_plural = "ตัวนับสถานะคำร้อง"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['requester', 'assigned_to', 'status'],
+                name='unique_status_count_key',
+            ),
+            # NULL ไม่ถือว่าซ้ำกันใน unique constraint ปกติ จึงต้องแยกกรณีที่ยังไม่มอบหมาย
+            models.UniqueConstraint(
+                fields=['requester', 'status'],
+                condition=models.Q(assigned_to__isnull=True),
+                name='unique_status_count_key_unassigned',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.requester_id}/{self.assigned_to_id}/{self.status} = {self.count}"
+
+
 class RepairHistory(models.Model):
     """ประวัติการอัพเดทสถานะ"""
     repair_request = models.ForeignKey(
@@ -194,11 +417,54 @@ class RepairHistory(models.Model):
         verbose_name = "ประวัติการซ่อม"
         verbose_name_plural = "ประวัติการซ่อม"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['repair_request', '-created_at'], name='repairhist_request_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.repair_request.request_number} - {self.status}"
 
 
+class RepairHistoryArchive(models.Model):
+    """ประวัติของคำร้องที่ปิดไปนานแล้ว ย้ายจาก RepairHistory โดย repair_api.archive
+
+    ฟิลด์เหมือน RepairHistory และใช้ id เดิม การอ่านประวัติรวมทั้งสองตารางเสมอ
+    (RepairRequest.history_entries)
+    """
+    id = models.BigIntegerField(primary_key=True)
+    repair_request = models.ForeignKey(
+        RepairRequest,
+        on_delete=models.CASCADE,
+        related_name='archived_histories',
+        verbose_name="คำร้องซ่อม"
+    )
+    updated_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="ผู้อัพเดท"
+    )
+    status = models.CharField(max_length=20, verbose_name="สถานะ")
+    comment = models.TextField(blank=True, null=True, verbose_name="ความคิดเห็น")
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="วันที่ย้ายเข้า archive")
+
+    class Meta:
+        verbose_name = "ประวัติการซ่อม (archive)"
+        verbose_name_plural = "ประวัติการซ่อม (archive)"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['repair_request', '-created_at'], name='repairhistarc_request_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.repair_request_id} - {self.status}"
+
+
 class UserProfile(models.Model):
     """ข้อมูลเพิ่มเติมของผู้ใช้"""
     ROLE_CHOICES = [
@@ -228,5 +494,200 @@ class UserProfile(models.Model):
         verbose_name = "โปรไฟล์ผู้ใช้"
         verbose_name_plural = "โปรไฟล์ผู้ใช้"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # จำ claims เดิมใน token (role, department) เพื่อตรวจว่ามีการเปลี่ยนแปลงหรือไม่
+        instance._token_claims = instance.token_claims()
+        return instance
+
+    def token_claims(self):
+        return {'role': self.role, 'department': self.department or ''}
+
     def __str__(self):
-        return f"{self.user.username} - {self.role}"
\ No newline at end of file
+        return f"{self.user.username} - {self.role}"
+
+
+class Job(models.Model):
+    """งานเบื้องหลังในคิว (repair_api.jobs) ประมวลผลโดยคำสั่ง run_jobs"""
+    STATUS_CHOICES = [
+        ('queued', 'รอดำเนินการ'),
+        ('running', 'กำลังทำงาน'),
+        ('succeeded', 'สำเร็จ'),
+        ('failed', 'ล้มเหลว'),
+    ]
+
+    name = models.CharField(max_length=100, verbose_name="ชื่องาน")
+    payload = models.JSONField(default=dict, verbose_name="ข้อมูลงาน")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name="สถานะ"
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name="จำนวนครั้งที่ทำ")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="จำนวนครั้งสูงสุด")
+    run_at = models.DateTimeField(default=timezone.now, verbose_name="เริ่มได้ตั้งแต่")
+    locked_by = models.CharField(max_length=100, blank=True, default='', verbose_name="worker")
+    started_at = models.DateTimeField(null=True, blank=True)
+    # worker ที่ถืองานอยู่ต่ออายุทุก JOB_HEARTBEAT_INTERVAL (lease ของงาน)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name="heartbeat ล่าสุด")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='', verbose_name="ข้อผิดพลาดล่าสุด")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "งานเบื้องหลัง"
+        verbose_name_plural = "งานเบื้องหลัง"
+        ordering = ['-created_at']
+        indexes = [
+            # worker ดึงงานที่ถึงเวลาตามลำดับ run_at
+            models.Index(fields=['status', 'run_at', 'id'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class DailyCategoryStats(models.Model):
+    """สรุปคำร้องรายวันต่อหมวดหมู่อุปกรณ์ (คำนวณโดย repair_api.analytics)
+
+    เก็บผลรวมและจำนวน ไม่ใช่ค่าเฉลี่ย จึงรวมเป็นรายเดือน/รายปีได้ถูกต้อง
+    - created_count นับตามวันที่แจ้ง, assigned_* ตามวันที่มอบหมาย
+    - completed_* และค่าใช้จ่ายนับตามวันที่เสร็จสิ้น (เฉพาะคำร้องสถานะ completed)
+    """
+    date = models.DateField(verbose_name="วันที่")
+    category = models.ForeignKey(
+        EquipmentCategory,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name="หมวดหมู่"
+    )
+    created_count = models.PositiveIntegerField(default=0, verbose_name="คำร้องใหม่")
+    assigned_count = models.PositiveIntegerField(default=0, verbose_name="มอบหมายแล้ว")
+    assign_seconds = models.FloatField(default=0, verbose_name="เวลารวมจนมอบหมาย (วินาที)")
+    completed_count = models.PositiveIntegerField(default=0, verbose_name="เสร็จสิ้น")
+    complete_seconds = models.FloatField(default=0, verbose_name="เวลารวมจนเสร็จสิ้น (วินาที)")
+    estimated_cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="ค่าใช้จ่ายประมาณรวม"
+    )
+    actual_cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="ค่าใช้จ่ายจริงรวม"
+    )
+
+    class Meta:
+        verbose_name = "สรุปรายวันตามหมวดหมู่"
+        verbose_name_plural = "สรุปรายวันตามหมวดหมู่"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_daily_category'),
+            # อุปกรณ์ที่ไม่มีหมวดหมู่ (NULL ไม่ถือว่าซ้ำกันใน unique constraint ปกติ)
+            models.UniqueConstraint(
+                fields=['date'],
+                condition=models.Q(category__isnull=True),
+                name='unique_daily_category_uncategorized',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} / {self.category_id}"
+
+
+class DailyTechnicianStats(models.Model):
+    """สรุปงานรายวันต่อช่าง (คำนวณโดย repair_api.analytics)"""
+    date = models.DateField(verbose_name="วันที่")
+    technician = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="ช่าง"
+    )
+    assigned_count = models.PositiveIntegerField(default=0, verbose_name="ได้รับมอบหมาย")
+    completed_count = models.PositiveIntegerField(default=0, verbose_name="เสร็จสิ้น")
+    complete_seconds = models.FloatField(default=0, verbose_name="เวลารวมจนเสร็จสิ้น (วินาที)")
+    actual_cost = models.DecimalField(
+        max_digits=14, decimal_places=2, default=0, verbose_name="ค่าใช้จ่ายจริงรวม"
+    )
+
+    class Meta:
+        verbose_name = "สรุปรายวันตามช่าง"
+        verbose_name_plural = "สรุปรายวันตามช่าง"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'technician'], name='unique_daily_technician'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} / {self.technician_id}"
+
+
+class AnalyticsDirtyDay(models.Model):
+    """วันที่มีคำร้องเปลี่ยนแปลงและรอคำนวณสรุปรายวันใหม่"""
+    date = models.DateField(primary_key=True, verbose_name="วันที่")
+
+    class Meta:
+        verbose_name = "วันที่รอคำนวณสรุป"
+        verbose_name_plural = "วันที่รอคำนวณสรุป"
+
+    def __str__(self):
+        return str(self.date)
+
+
+class TableVersion(models.Model):
+    """version ของตาราง (เวลาที่เขียนล่าสุด) ใช้แทน cache เมื่อ cache ไม่แชร์ระหว่าง process
+
+    ดู repair_api.cache.table_versions
+    """
+    label = models.CharField(max_length=100, primary_key=True, verbose_name="โมเดล")
+    version = models.BigIntegerField(default=0, verbose_name="version")
+
+    class Meta:
+        verbose_name = "version ของตาราง"
+        verbose_name_plural = "version ของตาราง"
+
+    def __str__(self):
+        return f"{self.label}: {self.version}"
+
+
+
+class StreamEvent(models.Model):
+    """event ของคำร้องที่รอส่งให้ process ของ SSE (repair_api.events.DatabaseBroker)
+
+    process ที่เขียนข้อมูล (gunicorn) กับ process ที่เปิด stream (uvicorn) เป็นคนละตัว
+    id เรียงตามลำดับการส่ง และใช้เป็น Last-Event-ID ของ client
+    """
+    id = models.BigAutoField(primary_key=True)
+    payload = models.JSONField(verbose_name="ข้อมูล event")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "event ของคำร้อง"
+        verbose_name_plural = "event ของคำร้อง"
+
+    def __str__(self):
+        return f"{self.pk}: {self.payload.get('type')} {self.payload.get('id')}"
+
+
+class EventTicket(models.Model):
+    """ตั๋วใช้ครั้งเดียวสำหรับเปิด SSE แทน access token ใน URL (repair_api.sse)
+
+    API ที่ออกตั๋วกับ process ของ SSE ที่รับตั๋วเป็นคนละ process จึงเก็บในฐานข้อมูลแทน cache
+    """
+    ticket = models.CharField(max_length=64, primary_key=True, verbose_name="ตั๋ว")
+    token = models.TextField(verbose_name="access token")
+    expires_at = models.DateTimeField(verbose_name="หมดอายุ")
+
+    class Meta:
+        verbose_name = "ตั๋วเปิด event stream"
+        verbose_name_plural = "ตั๋วเปิด event stream"
+
+    def __str__(self):
+        return f"{self.ticket[:8]}... ({self.expires_at})"
+
+def get_user_role(user):
+    """บทบาทของผู้ใช้ (จาก claim ใน token ถ้ามี ไม่เช่นนั้นอ่านจาก UserProfile)"""
+    if hasattr(user, 'role'):
+        return user.role
+    return UserProfile.objects.filter(user_id=user.pk).values_list('role', flat=True).first()
\ No newline at end of file
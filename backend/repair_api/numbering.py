@@ -0,0 +1,104 @@
+# repair_api/numbering.py
+
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import RequestNumberSequence
+
+
+def format_request_number(year, number):
+    # อย่างน้อย 3 หลักเหมือนรูปแบบเดิม (REQ2024001) และขยายได้เกิน 999
+    return f'REQ{year}{number:03d}'
+
+
+def reserve_numbers(year, count):
+    """จองเลขลำดับต่อเนื่อง count เลขของปี year คืนค่า (เลขแรก, เลขสุดท้าย)
+
+    UPDATE แถวของปีนั้นก่อนอ่าน ทำให้แถวถูก lock จนจบ transaction
+    จึงไม่มีสอง transaction ได้เลขซ้ำกัน
+    """
+    sequence = RequestNumberSequence.objects.filter(year=year)
+    with transaction.atomic():
+        if not sequence.update(last_number=F('last_number') + count):
+            try:
+                with transaction.atomic():
+                    RequestNumberSequence.objects.create(year=year, last_number=count)
+                return 1, count
+            except IntegrityError:
+                # มี transaction อื่นสร้างแถวของปีนี้ไปก่อน
+                sequence.update(last_number=F('last_number') + count)
+        last = sequence.values_list('last_number', flat=True).get()
+    return last - count + 1, last
+
+
+class RequestNumberAllocator:
+    """แจกเลขที่คำร้อง โดยจองจากฐานข้อมูลเป็นก้อน (block) ต่อ process
+
+    block_size=1 จองทุกครั้งภายใน transaction ของผู้เรียก (เลขไม่ขาดช่วง)
+    block_size>1 ลดการ lock แถว sequence แต่เลขอาจขาดช่วงเมื่อ process หยุด
+    และไม่เรียงตามเวลาข้าม process
+    """
+
+    def __init__(self, block_size=1):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._blocks = {}  # year -> [[เลขถัดไป, เลขสุดท้ายของ block], ...]
+
+    def allocate(self, year, count=1):
+        if self.block_size <= 1:
+            first, last = reserve_numbers(year, count)
+            return list(range(first, last + 1))
+
+        numbers = []
+        with self._lock:
+            blocks = self._blocks.setdefault(year, [])
+            while blocks and len(numbers) < count:
+                block = blocks[0]
+                take = min(count - len(numbers), block[1] - block[0] + 1)
+                numbers.extend(range(block[0], block[0] + take))
+                block[0] += take
+                if block[0] > block[1]:
+                    blocks.pop(0)
+        if len(numbers) == count:
+            return numbers
+
+        needed = count - len(numbers)
+        first, last = reserve_numbers(year, max(needed, self.block_size))
+        numbers.extend(range(first, first + needed))
+        if first + needed <= last:
+            # เก็บเลขที่เหลือเข้า block หลัง commit เท่านั้น ถ้า transaction ถูก rollback
+            # การจองในฐานข้อมูลจะหายไปด้วย และเลขเหล่านั้นต้องไม่ถูกแจกซ้ำ
+            remaining = [first + needed, last]
+            transaction.on_commit(lambda: self._store_block(year, remaining))
+        return numbers
+
+    def _store_block(self, year, block):
+        with self._lock:
+            self._blocks.setdefault(year, []).append(block)
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None or _allocator.block_size != settings.REQUEST_NUMBER_BLOCK_SIZE:
+            _allocator = RequestNumberAllocator(settings.REQUEST_NUMBER_BLOCK_SIZE)
+        return _allocator
+
+
+def allocate_request_numbers(year, count=1):
+    """คืนรายการเลขที่คำร้อง (string) ที่ไม่ซ้ำกัน count รายการ"""
+    return [
+        format_request_number(year, number)
+        for number in get_allocator().allocate(year, count)
+    ]
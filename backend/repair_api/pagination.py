@@ -0,0 +1,138 @@
+# repair_api/pagination.py
+
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(CursorPagination):
+    """Keyset (cursor) pagination บน (ฟิลด์วันที่, id) เรียงจากใหม่ไปเก่า
+
+    ต่างจาก CursorPagination ของ DRF ที่ใช้ฟิลด์แรก + offset สำหรับค่าที่ซ้ำกัน
+    คลาสนี้ใช้ id เป็นตัวตัดสินเสมอ ทุกหน้าจึงเป็น index range scan โดยไม่มี
+    COUNT(*) หรือ OFFSET และ cursor ถูก sign ไว้ (แก้ไขจากฝั่ง client ไม่ได้)
+    """
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'cursor ไม่ถูกต้อง'
+    cursor_salt = 'repair_api.pagination.cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """เหมือน paginate_queryset แต่อ่านแถวด้วย async ORM (สำหรับ async view)"""
+        queryset = self._page_queryset(queryset, request)
+        if queryset is None:
+            return None
+        return self._set_page([row async for row in queryset])
+
+    def _page_queryset(self, queryset, request):
+        """queryset ของหน้าที่ขอ (page_size + 1 แถว เพื่อรู้ว่ามีหน้าถัดไปหรือไม่)"""
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        field = self.ordering[0].lstrip('-')
+
+        if self.cursor is None:
+            self.reverse = False
+        else:
+            value, pk, self.reverse = self.cursor
+            value = queryset.model._meta.get_field(field).to_python(value)
+            # หน้าถัดไป: แถวที่เก่ากว่าตำแหน่ง cursor, หน้าก่อนหน้า: แถวที่ใหม่กว่า
+            lookup = 'gt' if self.reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) |
+                Q(**{field: value, f'id__{lookup}': pk})
+            )
+
+        order = self.ordering
+        if self.reverse:
+            order = [name[1:] if name.startswith('-') else f'-{name}' for name in order]
+        return queryset.order_by(*order)[:self.page_size + 1]
+
+    def _set_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        if self.reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        self.page = rows
+        return rows
+
+    def _position(self, row, reverse):
+        value = getattr(row, self.ordering[0].lstrip('-'))
+        return [value.isoformat() if hasattr(value, 'isoformat') else value, row.pk, reverse]
+
+    def encode_cursor(self, position):
+        token = signing.dumps(position, salt=self.cursor_salt, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            value, pk, reverse = signing.loads(token, salt=self.cursor_salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk, bool(reverse)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1], False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0], True))
+
+    def get_html_context(self):
+        return {
+            'previous_url': self.get_previous_link(),
+            'next_url': self.get_next_link(),
+        }
+
+
+class RepairRequestKeysetPagination(KeysetPagination):
+    ordering = ('-request_date', '-id')
+
+
+class EquipmentKeysetPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class KeysetPaginationMixin:
+    """ใช้ keyset pagination เป็นค่าเริ่มต้น แต่ยังใช้เลขหน้าได้
+
+    - ส่ง ?page=N (เช่น หน้า admin) จะใช้ PageNumberPagination แบบเดิม
+    - ส่ง ?search=... จะใช้เลขหน้าเช่นกัน เพราะผลค้นหาเรียงตามความเกี่ยวข้อง
+      ซึ่งไม่ใช่ลำดับของ keyset
+    """
+    page_number_pagination_class = PageNumberPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params if self.request is not None else {}
+            if 'page' in params or params.get('search'):
+                self._paginator = self.page_number_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
@@ -0,0 +1,173 @@
+# repair_api/querystats.py
+"""
+นับ query ต่อ request: จำนวน เวลารวมในฐานข้อมูล และ query ที่ซ้ำกัน (รูปแบบ N+1)
+
+- install() ติด execute wrapper ให้ทุก connection รวมถึง connection ของ thread ที่ view แบบ async
+  ส่ง query ไปผ่าน sync_to_async ตัว wrapper บันทึกลง QueryStats ของ collect() ที่ทำงานอยู่
+  ซึ่งเก็บใน ContextVar (asgiref คัดลอก context ไปยัง thread ให้) นอก collect() แทบไม่มีค่าใช้จ่าย
+- collect_request() ให้ middleware ทุกตัวของ request เดียวกันใช้ QueryStats ร่วมกัน
+- fingerprint() แทนค่าคงที่ด้วย ? และย่อ IN (...) query ที่ต่างกันแค่ค่า id จึงนับเป็นตัวเดียวกัน
+- view_stats สะสมสถิติต่อ view ของ process นี้ (ดูได้ที่ /api/queries/stats/)
+"""
+
+import contextlib
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_current = ContextVar('repair_api_query_stats', default=None)
+_install_lock = threading.Lock()
+_installed = False
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """รูปแบบของ query โดยไม่สนค่าพารามิเตอร์ ค่าคงที่ และจำนวนค่าใน IN (...)"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """query ที่เกิดขึ้นในหนึ่งช่วง (หนึ่ง request) จากทุก thread
+
+    parent: QueryStats ของ collect() ชั้นนอก ซึ่งต้องเห็น query เดียวกันด้วย
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, sql, duration):
+        key = fingerprint(sql)
+        stats = self
+        while stats is not None:
+            with stats._lock:
+                stats.count += 1
+                stats.duration += duration
+                stats.fingerprints[key] += 1
+            stats = stats.parent
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def duplicates(self):
+        """{fingerprint: จำนวนครั้ง} ของ query ที่รันซ้ำ เรียงจากมากไปน้อย"""
+        with self._lock:
+            return {key: count for key, count in self.fingerprints.most_common() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        """จำนวน query ที่เกินมาจากการรันซ้ำ (ครั้งแรกของแต่ละรูปแบบไม่นับ)"""
+        return sum(count - 1 for count in self.duplicates().values())
+
+
+def _record(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - started)
+
+
+def _install_wrapper(sender, connection, **kwargs):
+    # connection_created ถูกส่งทุกครั้งที่เชื่อมต่อใหม่ แต่ wrapper อยู่กับ DatabaseWrapper เดิม
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+def install():
+    """ติด wrapper ให้ connection ที่เปิดอยู่ของ thread นี้ และทุก connection ที่เปิดหลังจากนี้"""
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(_install_wrapper, weak=False)
+        _installed = True
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(None, connection)
+
+
+@contextlib.contextmanager
+def collect():
+    """บันทึกทุก query ภายในบล็อก (รวมถึง thread ที่รับ context ต่อไป) คืน QueryStats"""
+    install()
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextlib.contextmanager
+def collect_request(request):
+    """collect() ครั้งเดียวต่อ request: middleware ชั้นในใช้ QueryStats เดียวกับชั้นนอก
+
+    query แต่ละตัวจึงถูกบันทึกครั้งเดียว แทนการบันทึกซ้ำทุกชั้นของ collect() ที่ซ้อนกัน
+    """
+    stats = getattr(request, '_query_stats', None)
+    if stats is not None:
+        yield stats
+        return
+    with collect() as stats:
+        request._query_stats = stats
+        yield stats
+
+
+class ViewQueryStats:
+    """สถิติ query สะสมต่อ view ของ process นี้"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, stats):
+        with self._lock:
+            values = self._views.setdefault(view, {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'db_ms': 0.0, 'max_db_ms': 0.0, 'duplicates': 0,
+            })
+            values['requests'] += 1
+            values['queries'] += stats.count
+            values['max_queries'] = max(values['max_queries'], stats.count)
+            values['db_ms'] += stats.duration_ms
+            values['max_db_ms'] = max(values['max_db_ms'], stats.duration_ms)
+            values['duplicates'] += stats.duplicate_count
+
+    def snapshot(self):
+        """สถิติต่อ view เรียงตามจำนวน query รวมจากมากไปน้อย"""
+        with self._lock:
+            views = {view: dict(values) for view, values in self._views.items()}
+        for values in views.values():
+            values['avg_queries'] = round(values['queries'] / values['requests'], 2)
+            values['avg_db_ms'] = round(values['db_ms'] / values['requests'], 2)
+            values['db_ms'] = round(values['db_ms'], 2)
+            values['max_db_ms'] = round(values['max_db_ms'], 2)
+        return dict(sorted(views.items(), key=lambda item: -item[1]['queries']))
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+view_stats = ViewQueryStats()
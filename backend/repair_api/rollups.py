@@ -0,0 +1,115 @@
+# repair_api/rollups.py
+
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, IntegerField, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Equipment, EquipmentCategory, RepairRequest, RepairRequestStatusCount
+
+
+def _key_filter(key):
+    requester_id, assigned_to_id, status = key
+    return {
+        'requester_id': requester_id,
+        'assigned_to_id': assigned_to_id,
+        'status': status,
+    }
+
+
+def apply_rollup_deltas(deltas):
+    """ปรับตัวนับตาม dict {(requester_id, assigned_to_id, status): delta}
+
+    ต้องเรียกภายใน transaction เดียวกับการแก้ไขคำร้อง
+    """
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        rows = RepairRequestStatusCount.objects.filter(**_key_filter(key))
+        if rows.update(count=F('count') + delta) or delta < 0:
+            # ตัวนับที่ไม่มีอยู่แล้ว (เช่น ผู้ใช้ถูกลบ) ไม่ต้องลดต่อ
+            continue
+        try:
+            with transaction.atomic():
+                RepairRequestStatusCount.objects.create(count=delta, **_key_filter(key))
+        except IntegrityError:
+            # มี transaction อื่นสร้างแถวเดียวกันไปก่อน
+            rows.update(count=F('count') + delta)
+
+
+def move_rollup_count(old_key, new_key):
+    """ย้ายคำร้องหนึ่งรายการจาก key เดิมไป key ใหม่ (None = ไม่มี)"""
+    if old_key == new_key:
+        return
+    deltas = Counter()
+    if old_key is not None:
+        deltas[old_key] -= 1
+    if new_key is not None:
+        deltas[new_key] += 1
+    apply_rollup_deltas(deltas)
+
+
+def count_requests_by_key(chunk_size=50000):
+    """นับคำร้องจริงทีละช่วง id เพื่อไม่ให้ scan ทั้งตารางใน query เดียว"""
+    counts = Counter()
+    bounds = RepairRequest.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return counts
+    for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        rows = RepairRequest.objects.filter(
+            id__gte=start, id__lt=start + chunk_size
+        ).values('requester_id', 'assigned_to_id', 'status').annotate(
+            total=Count('id')
+        ).order_by()
+        for row in rows:
+            counts[(row['requester_id'], row['assigned_to_id'], row['status'])] += row['total']
+    return counts
+
+
+def current_rollup():
+    """อ่านตัวนับปัจจุบันทั้งหมด (เฉพาะที่ไม่เป็นศูนย์)"""
+    return Counter({
+        (row.requester_id, row.assigned_to_id, row.status): row.count
+        for row in RepairRequestStatusCount.objects.exclude(count=0)
+    })
+
+
+def rebuild_rollup(counts, batch_size=1000):
+    """แทนที่ตัวนับทั้งหมดด้วยค่าที่นับใหม่"""
+    with transaction.atomic():
+        RepairRequestStatusCount.objects.all().delete()
+        RepairRequestStatusCount.objects.bulk_create(
+            [
+                RepairRequestStatusCount(count=total, **_key_filter(key))
+                for key, total in counts.items() if total
+            ],
+            batch_size=batch_size,
+        )
+
+
+def move_category_count(old_category_id, new_category_id):
+    """ย้ายอุปกรณ์ที่ใช้งานอยู่หนึ่งชิ้นระหว่างหมวดหมู่ (None = ไม่ถูกนับ)"""
+    if old_category_id == new_category_id:
+        return
+    if old_category_id is not None:
+        EquipmentCategory.objects.filter(
+            id=old_category_id, active_equipment_count__gt=0
+        ).update(active_equipment_count=F('active_equipment_count') - 1)
+    if new_category_id is not None:
+        EquipmentCategory.objects.filter(id=new_category_id).update(
+            active_equipment_count=F('active_equipment_count') + 1
+        )
+
+
+def refresh_category_counts(category_ids=None):
+    """คำนวณ active_equipment_count ใหม่ด้วย UPDATE เดียว (ใช้หลัง bulk operation)"""
+    active_counts = Equipment.objects.filter(
+        category=OuterRef('pk'), is_active=True
+    ).order_by().values('category').annotate(total=Count('id')).values('total')
+    categories = EquipmentCategory.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(id__in=category_ids)
+    categories.update(active_equipment_count=Coalesce(
+        Subquery(active_counts, output_field=IntegerField()), 0
+    ))
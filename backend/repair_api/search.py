@@ -0,0 +1,99 @@
+# repair_api/search.py
+"""
+ค้นหาข้อความแบบใช้ index สำหรับพารามิเตอร์ ``search``
+
+ข้อความภาษาไทยไม่มีการเว้นวรรคระหว่างคำ จึงใช้ trigram แทนการตัดคำ:
+- SQLite: ตาราง FTS5 (tokenize='trigram') ที่อัพเดทด้วย trigger
+- PostgreSQL: GIN index แบบ gin_trgm_ops (pg_trgm) บนข้อความที่ต่อกันของทุกคอลัมน์
+
+คำค้นที่สั้นกว่า 3 ตัวอักษร หรือฐานข้อมูลที่ไม่รองรับ จะใช้ icontains แบบเดิม
+
+หมายเหตุ: migration ที่ทำให้ SQLite สร้างตารางคำร้อง/อุปกรณ์ใหม่ (table remake)
+จะลบ trigger ของ FTS ไปด้วย ต้องสร้าง trigger และ rebuild index ใหม่ใน migration นั้น
+"""
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Equipment, RepairRequest
+
+# โมเดล -> คอลัมน์ที่ค้นหา (ชุดเดียวกับ icontains เดิมของแต่ละ ViewSet)
+SEARCH_FIELDS = {
+    RepairRequest: ['request_number', 'title', 'description'],
+    Equipment: ['equipment_code', 'name', 'location'],
+}
+
+MIN_TRIGRAM_LENGTH = 3
+
+_fts_tables = {}
+
+
+def fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def document_sql(model):
+    """นิพจน์ SQL ที่ต่อทุกคอลัมน์ค้นหาเข้าด้วยกัน (ต้องตรงกับ index ใน migration)"""
+    quote = connection.ops.quote_name
+    prefix = f'{quote(model._meta.db_table)}.'
+    return " || ' ' || ".join(
+        f"COALESCE({prefix}{quote(model._meta.get_field(name).column)}, '')"
+        for name in SEARCH_FIELDS[model]
+    )
+
+
+def _has_fts_table(model):
+    key = (connection.settings_dict['NAME'], model)
+    if key not in _fts_tables:
+        _fts_tables[key] = fts_table(model) in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def _icontains(queryset, term):
+    condition = Q()
+    for name in SEARCH_FIELDS[queryset.model]:
+        condition |= Q(**{f'{name}__icontains': term})
+    return queryset.filter(condition)
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_queryset(queryset, term):
+    """กรอง queryset ด้วยคำค้น และเรียงตามความเกี่ยวข้อง (search_rank มาก่อน)"""
+    model = queryset.model
+    term = term.strip()
+    if len(term) < MIN_TRIGRAM_LENGTH:
+        return _icontains(queryset, term)
+
+    if connection.vendor == 'sqlite' and _has_fts_table(model):
+        table = connection.ops.quote_name(model._meta.db_table)
+        pk = connection.ops.quote_name(model._meta.pk.column)
+        fts = connection.ops.quote_name(fts_table(model))
+        # ครอบด้วย "..." ให้เป็น phrase เดียว (trigram จะจับคู่แบบ substring)
+        match = '"%s"' % term.replace('"', '""')
+        # join ตาราง FTS โดยตรง (ORM ไม่รองรับ virtual table) ให้ SQLite ค้นจาก index
+        # ก่อนแล้วค่อยดึงแถวตาม primary key; rank ของ FTS5 (bm25) ยิ่งน้อยยิ่งเกี่ยวข้อง
+        return queryset.extra(
+            tables=[fts_table(model)],
+            where=[f'{fts}.rowid = {table}.{pk}', f'{fts} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-{fts}.rank'},
+        ).order_by('-search_rank', *model._meta.ordering)
+
+    if connection.vendor == 'postgresql':
+        document = document_sql(model)
+        matches = RawSQL(
+            f'({document}) ILIKE %s', [f'%{_escape_like(term)}%'],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f'word_similarity(%s, {document})', [term], output_field=FloatField()
+        )
+        return queryset.filter(matches).annotate(
+            search_rank=rank
+        ).order_by('-search_rank', *model._meta.ordering)
+
+    return _icontains(queryset, term)
@@ -0,0 +1,498 @@
+# repair_api/seeding.py
+"""
+สร้างข้อมูลจำลองปริมาณมาก (ผู้ใช้ อุปกรณ์ คำร้อง ประวัติ) สำหรับวางแผน capacity
+
+- INSERT ด้วย executemany ทีละ batch โดยตรง ข้าม save()/signal ไม่มี query ต่อแถว
+  และกำหนด created_at/updated_at ตามไทม์ไลน์ของคำร้องได้ (auto_now ของ ORM เขียนทับเสมอ)
+- hash รหัสผ่านครั้งเดียวแล้วใช้กับผู้ใช้ทุกคน (PBKDF2 ต่อคนใช้เวลาหลายร้อย ms)
+- กำหนด primary key และจองเลขที่คำร้องทั้งหมดล่วงหน้าครั้งเดียว แต่ละ chunk จึงสร้างแถว
+  ได้เองโดยไม่ต้องอ่านกลับ และแบ่งให้หลาย process ทำพร้อมกันได้ (workers)
+  บน SQLite ที่เขียนได้ทีละ connection process หลักเป็นผู้ INSERT แถวที่ worker สร้าง
+- เลือกได้ (defer_indexes=True) ให้ลบ index ของคำร้อง/ประวัติ (และ trigger ของ FTS) ระหว่างเพิ่ม
+  แล้วสร้างใหม่ครั้งเดียว (deferred_indexes) ใช้กับฐานข้อมูลที่ไม่มีผู้ใช้งานอื่นเท่านั้น
+- ข้อมูลของแต่ละ chunk ขึ้นกับ seed และลำดับของแถวเท่านั้น ผลลัพธ์จึงเหมือนกันไม่ว่าใช้กี่ process
+- ตัวนับที่ปกติอัพเดทด้วย signal (ตัวนับสถานะ จำนวนอุปกรณ์ต่อหมวดหมู่) คำนวณใหม่หลังเพิ่มข้อมูล
+  ส่วนสรุปรายวัน (analytics.rebuild_all) ให้ผู้เรียกเลือกเอง เพราะใช้เวลาตามขนาดข้อมูลทั้งหมด
+"""
+
+import contextlib
+import multiprocessing
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import bump_table_versions
+from .models import (
+    Equipment,
+    EquipmentCategory,
+    RepairHistory,
+    RepairRequest,
+    UserProfile,
+)
+from .numbering import format_request_number, reserve_numbers
+from .rollups import count_requests_by_key, rebuild_rollup, refresh_category_counts
+from .search import SEARCH_FIELDS, fts_table
+
+# คำศัพท์สำหรับสร้างข้อความจำลองที่หลากหลายพอให้ทดสอบการค้นหาได้
+EQUIPMENT_WORDS = ['คอมพิวเตอร์', 'เครื่องพิมพ์', 'โปรเจคเตอร์', 'เครื่องปรับอากาศ',
+                   'โต๊ะ', 'เก้าอี้', 'สแกนเนอร์', 'จอภาพ', 'เราเตอร์', 'ตู้เย็น']
+PROBLEM_WORDS = ['เปิดไม่ติด', 'มีเสียงดัง', 'กระดาษติด', 'จอไม่แสดงผล', 'น้ำรั่ว',
+                 'ชำรุด', 'เชื่อมต่อไม่ได้', 'ความร้อนสูง', 'ไฟกระพริบ', 'ขาหัก']
+FIRST_NAMES = ['สมชาย', 'สมหญิง', 'วิชัย', 'สุดา', 'ประเสริฐ', 'มาลี', 'อนันต์', 'กาญจนา',
+               'ธนา', 'ปิยะ', 'รัตนา', 'สุริยา', 'นภา', 'ชัยวัฒน์', 'อรุณี', 'พรทิพย์']
+LAST_NAMES = ['ใจดี', 'รักไทย', 'สุขสันต์', 'มั่นคง', 'ทองดี', 'ศรีสุข', 'แก้วมณี', 'บุญมา',
+              'วงศ์ใหญ่', 'พึ่งบุญ', 'เจริญผล', 'สายทอง']
+DEPARTMENTS = ['บัญชี', 'บุคคล', 'ไอที', 'การตลาด', 'จัดซื้อ', 'ผลิต', 'อาคารสถานที่', 'ขาย']
+
+STATUS_WEIGHTS = {'pending': 15, 'assigned': 10, 'in_progress': 15, 'completed': 50,
+                  'cancelled': 10}
+CONDITIONS = [choice for choice, _ in Equipment.CONDITION_CHOICES]
+PRIORITIES = [choice for choice, _ in RepairRequest.PRIORITY_CHOICES]
+
+# ขนาด page cache ของ SQLite ระหว่างเพิ่มข้อมูล (KiB)
+SQLITE_CACHE_KB = 256 * 1024
+
+# ช่วงเวลาของคำร้องจำลองย้อนหลัง (นาที)
+HISTORY_SPAN_MINUTES = 60 * 24 * 730
+
+USER_FIELDS = ['id', 'password', 'last_login', 'is_superuser', 'username', 'first_name',
+               'last_name', 'email', 'is_staff', 'is_active', 'date_joined']
+PROFILE_FIELDS = ['user', 'role', 'department', 'phone', 'created_at', 'updated_at']
+EQUIPMENT_FIELDS = ['id', 'equipment_code', 'name', 'category', 'description', 'location',
+                    'purchase_date', 'warranty_expiry', 'condition', 'image', 'image_variants',
+                    'is_active', 'created_at', 'updated_at']
+REQUEST_FIELDS = ['id', 'request_number', 'equipment', 'requester', 'title', 'description',
+                  'priority', 'status', 'assigned_to', 'request_date', 'assigned_date',
+                  'completed_date', 'estimated_cost', 'actual_cost', 'remarks',
+                  'created_at', 'updated_at']
+HISTORY_FIELDS = ['repair_request', 'updated_by', 'status', 'comment', 'created_at']
+
+# ข้อมูลที่ทุก chunk ใช้ร่วมกัน (ส่งให้ worker ครั้งเดียวตอนเริ่ม process)
+_context = None
+
+
+def insert_rows(model, fields, rows):
+    """INSERT แถว (tuple เรียงตาม fields) ด้วย executemany ครั้งเดียว ข้าม save()/pre_save/signal
+
+    ค่าวันที่/เวลาต้องแปลงเป็นค่าที่ฐานข้อมูลรับได้มาก่อนแล้ว (_datetime_adapter, _db_date)
+    """
+    if not rows:
+        return 0
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})',
+            rows,
+        )
+    return len(rows)
+
+
+def _insert_triggers(model):
+    """trigger ของ SQLite ที่เพิ่มแถวใหม่เข้าตารางค้นหา FTS (repair_api.search) ของ model"""
+    if connection.vendor != 'sqlite' or model not in SEARCH_FIELDS:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = %s",
+            [f'{fts_table(model)}_ai'],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+@contextlib.contextmanager
+def deferred_indexes(*models):
+    """ลบ index ใน Meta.indexes ของ models (และ trigger ของ FTS บน SQLite) ระหว่างเพิ่มข้อมูล
+    แล้วสร้างใหม่ครั้งเดียวตอนจบ
+
+    การสร้าง index จากทั้งตารางครั้งเดียวเร็วกว่าแทรกทีละแถวมาก เมื่อข้อมูลที่เพิ่มมีขนาดใกล้เคียง
+    หรือมากกว่าข้อมูลเดิม ระหว่างนี้ query ที่พึ่ง index จะช้า จึงใช้กับฐานข้อมูลทดสอบเท่านั้น
+    """
+    quote = connection.ops.quote_name
+    triggers = {}
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+            sqls = _insert_triggers(model)
+            if sqls:
+                triggers[model] = (_next_id(model), sqls)
+                editor.execute(f"DROP TRIGGER {quote(f'{fts_table(model)}_ai')}")
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+            for model, (first_id, sqls) in triggers.items():
+                for sql in sqls:
+                    editor.execute(sql)
+                # แถวที่เพิ่มระหว่างไม่มี trigger: เพิ่มเข้าตาราง FTS ทีเดียวด้วย INSERT ... SELECT
+                columns = ', '.join(
+                    quote(model._meta.get_field(name).column) for name in SEARCH_FIELDS[model]
+                )
+                editor.execute(
+                    f'INSERT INTO {quote(fts_table(model))}(rowid, {columns}) '
+                    f'SELECT {quote(model._meta.pk.column)}, {columns} '
+                    f'FROM {quote(model._meta.db_table)} WHERE {quote(model._meta.pk.column)} >= %s',
+                    [first_id],
+                )
+
+
+def _next_id(model):
+    return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+
+def _full_name(index):
+    return (FIRST_NAMES[index % len(FIRST_NAMES)],
+            LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)])
+
+
+def _plan_users(prefix, role, count, first_id):
+    """ผู้ใช้ที่มีอยู่แล้วของ prefix นี้ และส่วนที่ต้องสร้างเพิ่มจนครบ count ตั้งแต่ id first_id
+
+    คืน (รายการ id ทั้งหมด, {id: ชื่อเต็ม}, งาน (id แรก, ลำดับแรก, จำนวน, prefix, role) หรือ None)
+    """
+    existing = list(
+        User.objects.filter(username__startswith=prefix)
+        .order_by('id').values_list('id', 'first_name', 'last_name')
+    )
+    ids = [row[0] for row in existing]
+    names = {row[0]: f'{row[1]} {row[2]}'.strip() for row in existing}
+    missing = count - len(existing)
+    if missing <= 0:
+        return ids, names, None
+    for offset in range(missing):
+        ids.append(first_id + offset)
+        names[first_id + offset] = ' '.join(_full_name(len(existing) + offset))
+    return ids, names, (first_id, len(existing), missing, prefix, role)
+
+
+def _chunks(first_id, start, count, batch_size):
+    """แบ่งช่วง (id แรก, ลำดับแรก, จำนวน) เป็นช่วงละไม่เกิน batch_size"""
+    for offset in range(0, count, batch_size):
+        yield first_id + offset, start + offset, min(batch_size, count - offset)
+
+
+def _datetime_adapter(now):
+    """(เวลาปัจจุบัน, ฟังก์ชันแปลง datetime เป็นค่าที่ส่งให้ฐานข้อมูล)
+
+    ให้ผลเหมือน connection.ops.adapt_datetimefield_value แต่เรียกได้เร็วกว่ามาก:
+    SQLite เก็บเวลาเป็นข้อความ UTC แบบ naive (timezone.now() เป็น UTC อยู่แล้ว)
+    ส่วนฐานข้อมูลอื่นรับ datetime ได้โดยตรง
+    """
+    if connection.vendor == 'sqlite':
+        return now.replace(tzinfo=None), str
+    return now, lambda moment: moment
+
+
+def _db_date(day):
+    return connection.ops.adapt_datefield_value(day)
+
+
+def _user_rows(first_id, start, count, prefix, role):
+    rng = random.Random(f"{_context['seed']}:{prefix}:{start}")
+    now, adapt = _datetime_adapter(_context['now'])
+    now = adapt(now)
+    users, profiles = [], []
+    for offset in range(count):
+        user_id = first_id + offset
+        index = start + offset
+        first_name, last_name = _full_name(index)
+        username = f'{prefix}{index}'
+        users.append((
+            user_id, _context['password'], None, False, username, first_name, last_name,
+            f'{username}@example.com', role == 'admin', True, now,
+        ))
+        profiles.append((
+            user_id, role, rng.choice(DEPARTMENTS), f'08{rng.randint(0, 99_999_999):08d}',
+            now, now,
+        ))
+    return users, profiles
+
+
+def _equipment_rows(first_id, start, count):
+    rng = random.Random(f"{_context['seed']}:equipment:{start}")
+    now, adapt = _datetime_adapter(_context['now'])
+    today = timezone.localdate(_context['now'])
+    categories = _context['category_ids']
+    prefix = _context['equipment_prefix']
+    rows = []
+    for offset in range(count):
+        index = start + offset
+        purchase_date = today - timedelta(days=rng.randint(30, 3650))
+        created_at = adapt(now - timedelta(minutes=rng.randint(0, HISTORY_SPAN_MINUTES)))
+        rows.append((
+            first_id + offset, f'{prefix}{index:07d}', f'{rng.choice(EQUIPMENT_WORDS)} {index}',
+            rng.choice(categories), None, f'อาคาร {index % 50} ชั้น {index % 7 + 1}',
+            _db_date(purchase_date),
+            _db_date(purchase_date + timedelta(days=365 * rng.randint(1, 3))),
+            rng.choice(CONDITIONS), None, None, rng.random() > 0.1, created_at, created_at,
+        ))
+    return rows
+
+
+def _request_rows(first_id, start, count):
+    """คำร้อง count รายการเริ่มที่ id first_id พร้อมประวัติที่สอดคล้องกับสถานะ
+
+    เวลาแต่ละขั้น (แจ้ง -> มอบหมาย -> เริ่มงาน -> เสร็จสิ้น/ยกเลิก) เรียงกันและไม่เกินเวลาปัจจุบัน
+    สุ่มด้วย rng.random() โดยตรงแทน choice()/randint() ซึ่งช้ากว่าหลายเท่าในลูปนี้
+    """
+    context = _context
+    rand = random.Random(f"{context['seed']}:requests:{first_id}").random
+    now, adapt = _datetime_adapter(context['now'])
+    equipment_ids = context['equipment_ids']
+    requester_ids = context['requester_ids']
+    technician_ids = context['technician_ids']
+    admin_ids = context['admin_ids']
+    names = context['technician_names']
+    year = context['year']
+    first_number = context['first_number'] + start
+    # สถานะตามสัดส่วน STATUS_WEIGHTS: สุ่มตำแหน่งในตารางที่แต่ละสถานะซ้ำตามน้ำหนัก
+    statuses = [status for status, weight in STATUS_WEIGHTS.items() for _ in range(weight)]
+    with_histories = context['histories']
+    minute = timedelta(minutes=1)
+    requests, histories = [], []
+    for offset in range(count):
+        request_id = first_id + offset
+        number = first_number + offset
+        request_status = statuses[int(rand() * len(statuses))]
+        requester_id = requester_ids[int(rand() * len(requester_ids))]
+        request_date = now - minute * int(rand() * HISTORY_SPAN_MINUTES)
+        assigned_to = assigned_date = completed_date = actual_cost = None
+        events = []
+        if request_status != 'pending':
+            assigned_to = technician_ids[int(rand() * len(technician_ids))]
+            assigned_date = min(request_date + minute * (5 + int(rand() * 60 * 48)), now)
+            events.append((admin_ids[int(rand() * len(admin_ids))], 'assigned',
+                           f'มอบหมายงานให้ {names[assigned_to]}', assigned_date))
+        if request_status in ('in_progress', 'completed'):
+            started = min(assigned_date + minute * (10 + int(rand() * 60 * 24)), now)
+            events.append((assigned_to, 'in_progress', 'เริ่มดำเนินการซ่อม', started))
+        if request_status == 'completed':
+            completed_date = min(started + minute * (60 + int(rand() * 60 * 24 * 14)), now)
+            events.append((assigned_to, 'completed', 'ซ่อมเสร็จเรียบร้อย', completed_date))
+        elif request_status == 'cancelled':
+            cancelled = min(assigned_date + minute * (10 + int(rand() * 60 * 72)), now)
+            events.append((requester_id, 'cancelled', 'ผู้แจ้งยกเลิกคำร้อง', cancelled))
+        estimated_cents = (100 + int(rand() * 49900)) * 100
+        if completed_date is not None:
+            actual_cost = Decimal(int(estimated_cents * (0.6 + rand() * 0.9))).scaleb(-2)
+        updated_at = events[-1][3] if events else request_date
+        requests.append((
+            request_id, format_request_number(year, number),
+            equipment_ids[int(rand() * len(equipment_ids))], requester_id,
+            f'{EQUIPMENT_WORDS[int(rand() * len(EQUIPMENT_WORDS))]} '
+            f'{PROBLEM_WORDS[int(rand() * len(PROBLEM_WORDS))]}',
+            ' '.join([PROBLEM_WORDS[int(rand() * len(PROBLEM_WORDS))] for _ in range(3)])
+            + f' ({number})',
+            PRIORITIES[int(rand() * len(PRIORITIES))], request_status, assigned_to,
+            adapt(request_date),
+            adapt(assigned_date) if assigned_date else None,
+            adapt(completed_date) if completed_date else None,
+            Decimal(estimated_cents).scaleb(-2), actual_cost, None,
+            adapt(request_date), adapt(updated_at),
+        ))
+        if with_histories:
+            for user_id, event_status, comment, moment in events:
+                histories.append((request_id, user_id, event_status, comment, adapt(moment)))
+    return requests, histories
+
+
+def _chunk_rows(task):
+    """สร้างแถวของหนึ่ง chunk คืนรายการ (ชื่อตาราง, โมเดล, fields, แถว) ตามลำดับที่ต้อง INSERT"""
+    kind, first_id, start, count, *extra = task
+    if kind == 'users':
+        users, profiles = _user_rows(first_id, start, count, *extra)
+        return [('users', User, USER_FIELDS, users),
+                ('profiles', UserProfile, PROFILE_FIELDS, profiles)]
+    if kind == 'equipment':
+        return [('equipment', Equipment, EQUIPMENT_FIELDS,
+                 _equipment_rows(first_id, start, count))]
+    requests, histories = _request_rows(first_id, start, count)
+    return [('requests', RepairRequest, REQUEST_FIELDS, requests),
+            ('histories', RepairHistory, HISTORY_FIELDS, histories)]
+
+
+def _write_chunk(chunk):
+    """INSERT แถวของหนึ่ง chunk ใน transaction ของตัวเอง คืน {ชื่อตาราง: จำนวนแถว}"""
+    with transaction.atomic():
+        return {table: insert_rows(model, fields, rows) for table, model, fields, rows in chunk}
+
+
+def _insert_chunk(task):
+    return _write_chunk(_chunk_rows(task))
+
+
+def _init_worker(context):
+    global _context
+    if not apps.ready:
+        # start method แบบ spawn: process ใหม่ยังไม่ได้ตั้งค่า Django
+        django.setup()
+    _context = context
+
+
+@contextlib.contextmanager
+def _bulk_load_cache():
+    """ขยาย page cache ของ SQLite ระหว่างเพิ่มข้อมูลแล้วคืนค่าเดิม
+
+    cache เริ่มต้น (2 MB) เล็กเกินไปสำหรับ index ที่ยังต้องแทรกทีละแถว (foreign key, unique)
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KB}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {previous}')
+
+
+def _reset_sequences(*models):
+    # INSERT ที่กำหนด id เองไม่เลื่อน sequence ของ PostgreSQL (SQLite เลื่อนให้เอง)
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+
+def generate_dataset(requests, users=200, technicians=20, admins=1, equipment=1000,
+                     categories=20, histories=True, password=None, prefix='bench',
+                     batch_size=5000, workers=1, defer_indexes=False, seed=0, log=None):
+    """เพิ่มคำร้องจำลอง requests รายการ (พร้อมประวัติถ้า histories=True)
+
+    ผู้ใช้แต่ละบทบาท หมวดหมู่ และอุปกรณ์ (แยกตาม prefix) จะถูกสร้างเพิ่มจนครบจำนวนที่กำหนด
+    เท่านั้น จึงเรียกซ้ำบนฐานข้อมูลเดิมเพื่อขยายขนาดข้อมูลได้
+
+    password: รหัสผ่านของผู้ใช้ที่สร้างใหม่ทุกคน (None = เข้าสู่ระบบด้วยรหัสผ่านไม่ได้)
+    workers: จำนวน process ที่สร้างข้อมูลพร้อมกัน บน SQLite (เขียนได้ทีละ connection)
+        process หลักเป็นผู้ INSERT ส่วนฐานข้อมูลอื่นแต่ละ process INSERT เอง
+    defer_indexes: ลบ index ของคำร้อง/ประวัติระหว่างเพิ่มแล้วสร้างใหม่ตอนจบ (deferred_indexes)
+        เร็วขึ้นมากเมื่อข้อมูลที่เพิ่มมากกว่าข้อมูลเดิม แต่ระหว่างนั้น query อื่นบนตารางจะช้า
+        และการค้นหาไม่เห็นคำร้องใหม่ จึงต้องระบุเองเฉพาะฐานข้อมูลที่ไม่มีผู้ใช้งาน
+
+    คืน dict จำนวนแถวที่เพิ่มแยกตามตาราง
+    """
+    log = log or (lambda message: None)
+
+    password_hash = make_password(password)
+    role_ids, user_tasks, technician_names = {}, [], {}
+    next_user_id = _next_id(User)
+    for role, label, count in (('user', 'user', users), ('technician', 'tech', technicians),
+                               ('admin', 'admin', admins)):
+        ids, names, task = _plan_users(f'{prefix}_{label}_', role, count, next_user_id)
+        role_ids[role] = ids
+        if role == 'technician':
+            technician_names = names
+        if task is not None:
+            user_tasks.append(task)
+            next_user_id += task[2]
+
+    EquipmentCategory.objects.bulk_create(
+        [EquipmentCategory(name=f'{prefix}_category_{i}') for i in range(categories)],
+        ignore_conflicts=True,
+    )
+    category_ids = list(
+        EquipmentCategory.objects.filter(name__startswith=f'{prefix}_category_')
+        .values_list('id', flat=True)
+    )
+    equipment_prefix = prefix.upper()
+    equipment_ids = list(
+        Equipment.objects.filter(equipment_code__startswith=equipment_prefix)
+        .order_by('id').values_list('id', flat=True)
+    )
+    equipment_task = None
+    if equipment > len(equipment_ids):
+        first_id = _next_id(Equipment)
+        missing = equipment - len(equipment_ids)
+        equipment_task = (first_id, len(equipment_ids), missing)
+        equipment_ids += range(first_id, first_id + missing)
+
+    if requests and not (equipment_ids and role_ids['user'] and role_ids['technician']
+                         and role_ids['admin']):
+        raise ValueError('ต้องมีอุปกรณ์ ผู้ใช้ ช่าง และผู้ดูแลอย่างน้อยอย่างละหนึ่งก่อนสร้างคำร้อง')
+
+    year = timezone.now().year
+    first_number = reserve_numbers(year, requests)[0] if requests else 0
+    first_request_id = _next_id(RepairRequest)
+
+    context = {
+        'seed': seed, 'now': timezone.now(), 'year': year, 'first_number': first_number,
+        'password': password_hash, 'histories': histories,
+        'equipment_prefix': equipment_prefix, 'category_ids': category_ids,
+        'equipment_ids': equipment_ids, 'requester_ids': role_ids['user'],
+        'technician_ids': role_ids['technician'], 'admin_ids': role_ids['admin'],
+        'technician_names': technician_names,
+    }
+    # ผู้ใช้และอุปกรณ์ต้อง commit ก่อนคำร้องที่อ้างถึง (foreign key ตรวจตอน commit)
+    reference_tasks = [
+        ('users', first_id, start, count, user_prefix, role)
+        for user_first_id, user_start, user_count, user_prefix, role in user_tasks
+        for first_id, start, count in _chunks(user_first_id, user_start, user_count, batch_size)
+    ]
+    if equipment_task:
+        reference_tasks += [('equipment', *chunk) for chunk in _chunks(*equipment_task, batch_size)]
+    request_tasks = [
+        ('requests', *chunk) for chunk in _chunks(first_request_id, 0, requests, batch_size)
+    ]
+    counts = dict.fromkeys(['users', 'profiles', 'equipment', 'requests', 'histories'], 0)
+    # SQLite เขียนได้ทีละ connection: worker แค่สร้างแถวแล้วส่งกลับมาให้ process นี้ INSERT
+    single_writer = connection.vendor == 'sqlite'
+    pool = None
+    if workers > 1:
+        if not single_writer:
+            # process ลูกเปิด connection ของตัวเอง ห้ามใช้ connection ที่สืบทอดมาร่วมกัน
+            connections.close_all()
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(context,))
+    _init_worker(context)
+
+    def run(tasks):
+        if pool is None:
+            results = map(_insert_chunk, tasks)
+        elif single_writer:
+            results = map(_write_chunk, pool.imap(_chunk_rows, tasks))
+        else:
+            results = pool.imap_unordered(_insert_chunk, tasks)
+        for rows in results:
+            for table, count in rows.items():
+                counts[table] += count
+            log(', '.join(f'{table}: {count}' for table, count in counts.items()))
+
+    try:
+        with _bulk_load_cache():
+            run(reference_tasks)
+            deferred = (
+                deferred_indexes(RepairRequest, RepairHistory) if defer_indexes
+                else contextlib.nullcontext()
+            )
+            with deferred:
+                run(request_tasks)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    _reset_sequences(User, Equipment, RepairRequest)
+    # INSERT ตรงไม่ผ่าน signal จึงต้องคำนวณตัวนับใหม่และล้าง cache ที่อิง version ของตาราง
+    rebuild_rollup(count_requests_by_key())
+    refresh_category_counts()
+    bump_table_versions(User, UserProfile, EquipmentCategory, Equipment, RepairRequest,
+                        RepairHistory)
+    return counts
+
@@ -1,7 +1,15 @@
 # repair_api/serializers.py
 
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import transaction
+from .authentication import RoleRefreshToken, add_role_claims
+from .images import IMAGE_VARIANTS, current_variants
 from .models import (
     EquipmentCategory, 
     Equipment, 
@@ -77,6 +85,19 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Login: ใส่บทบาทและแผนกลงใน token เพื่อไม่ต้อง query ทุก request"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_role_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh: access token ใหม่ได้บทบาทล่าสุดจากฐานข้อมูล"""
+    token_class = RoleRefreshToken
+
+
 class EquipmentCategorySerializer(serializers.ModelSerializer):
     """Serializer สำหรับหมวดหมู่อุปกรณ์"""
     equipment_count = serializers.SerializerMethodField()
@@ -88,6 +109,11 @@ class EquipmentCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_equipment_count(self, obj):
+        # ใช้ค่าที่ annotate มาจาก EquipmentCategoryViewSet หรือคอลัมน์ตัวนับ ถ้ามี
+        if hasattr(obj, 'annotated_equipment_count'):
+            return obj.annotated_equipment_count
+        if settings.EQUIPMENT_COUNT_DENORMALIZED:
+            return obj.active_equipment_count
         return obj.equipments.filter(is_active=True).count()
 
 
@@ -95,17 +121,31 @@ class EquipmentSerializer(serializers.ModelSerializer):
     """Serializer สำหรับอุปกรณ์"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     condition_display = serializers.CharField(source='get_condition_display', read_only=True)
+    image_variants = serializers.SerializerMethodField()
     
     class Meta:
         model = Equipment
         fields = [
             'id', 'equipment_code', 'name', 'category', 'category_name',
             'description', 'location', 'purchase_date', 'warranty_expiry',
-            'condition', 'condition_display', 'image', 'is_active',
+            'condition', 'condition_display', 'image', 'image_variants', 'is_active',
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_image_variants(self, obj):
+        """URL ของรูปย่อแต่ละขนาด (null ถ้ายังประมวลผลไม่เสร็จ ให้ใช้ image แทน)"""
+        variants = current_variants(obj)
+        if variants is None:
+            return None
+        storage = obj.image.storage
+        request = self.context.get('request')
+        urls = {}
+        for variant in IMAGE_VARIANTS:
+            url = storage.url(variants[variant])
+            urls[variant] = request.build_absolute_uri(url) if request else url
+        return urls
+
 
 class RepairHistorySerializer(serializers.ModelSerializer):
     """Serializer สำหรับประวัติการซ่อม"""
@@ -121,8 +161,8 @@ class RepairHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class RepairRequestSerializer(serializers.ModelSerializer):
-    """Serializer สำหรับคำร้องขอซ่อม"""
+class RepairRequestListSerializer(serializers.ModelSerializer):
+    """Serializer สำหรับรายการคำร้องขอซ่อม (ไม่รวมประวัติ)"""
     requester_name = serializers.CharField(source='requester.get_full_name', read_only=True)
     requester_username = serializers.CharField(source='requester.username', read_only=True)
     assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True)
@@ -130,7 +170,6 @@ class RepairRequestSerializer(serializers.ModelSerializer):
     equipment_code = serializers.CharField(source='equipment.equipment_code', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     priority_display = serializers.CharField(source='get_priority_display', read_only=True)
-    histories = RepairHistorySerializer(many=True, read_only=True)
     
     class Meta:
         model = RepairRequest
@@ -141,16 +180,25 @@ class RepairRequestSerializer(serializers.ModelSerializer):
             'status', 'status_display', 'assigned_to', 'assigned_to_name',
             'request_date', 'assigned_date', 'completed_date',
             'estimated_cost', 'actual_cost', 'remarks',
-            'histories', 'created_at', 'updated_at'
+            'created_at', 'updated_at'
         ]
         read_only_fields = [
             'id', 'request_number', 'requester', 'request_date', 
             'created_at', 'updated_at'
         ]
 
+
+class RepairRequestSerializer(RepairRequestListSerializer):
+    """Serializer สำหรับคำร้องขอซ่อม (รายละเอียดพร้อมประวัติ)"""
+    # รวมประวัติที่ถูกย้ายไปตาราง archive (repair_api.archive)
+    histories = RepairHistorySerializer(source='history_entries', many=True, read_only=True)
+    
+    class Meta(RepairRequestListSerializer.Meta):
+        fields = RepairRequestListSerializer.Meta.fields + ['histories']
+
     def create(self, validated_data):
         # กำหนด requester จาก request.user
-        validated_data['requester'] = self.context['request'].user
+        validated_data['requester_id'] = self.context['request'].user.id
         return super().create(validated_data)
 
 
@@ -164,7 +212,7 @@ class RepairRequestCreateSerializer(serializers.ModelSerializer):
         ]
 
     def create(self, validated_data):
-        validated_data['requester'] = self.context['request'].user
+        validated_data['requester_id'] = self.context['request'].user.id
         return super().create(validated_data)
 
 
@@ -190,21 +238,56 @@ class RepairRequestUpdateSerializer(serializers.ModelSerializer):
             elif validated_data['status'] == 'completed' and not instance.completed_date:
                 instance.completed_date = timezone.now()
         
-        # อัพเดทข้อมูล
-        instance = super().update(instance, validated_data)
-        
-        # บันทึกประวัติ
-        if comment or 'status' in validated_data:
-            RepairHistory.objects.create(
-                repair_request=instance,
-                updated_by=self.context['request'].user,
-                status=instance.status,
-                comment=comment or ''
-            )
+        # อัพเดทข้อมูล ตัวนับสถานะ และประวัติใน transaction เดียวกัน
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            
+            # บันทึกประวัติ
+            if comment or 'status' in validated_data:
+                RepairHistory.objects.create(
+                    repair_request=instance,
+                    updated_by_id=self.context['request'].user.id,
+                    status=instance.status,
+                    comment=comment or ''
+                )
         
         return instance
 
 
+class RepairRequestBulkSerializer(serializers.Serializer):
+    """Serializer สำหรับแก้ไขคำร้องหลายรายการพร้อมกัน"""
+    ACTION_CHOICES = [
+        ('assign', 'มอบหมายงาน'),
+        ('set_status', 'เปลี่ยนสถานะ'),
+        ('cancel', 'ยกเลิก'),
+    ]
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.REPAIR_REQUEST_BULK_MAX_ITEMS
+    )
+    action = serializers.ChoiceField(choices=ACTION_CHOICES)
+    technician_id = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=RepairRequest.STATUS_CHOICES, required=False)
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        if attrs['action'] == 'assign':
+            technician = User.objects.filter(
+                id=attrs.get('technician_id'),
+                profile__role__in=['technician', 'admin']
+            ).first()
+            if technician is None:
+                raise serializers.ValidationError(
+                    {'technician_id': 'ไม่พบช่างซ่อมที่ระบุ'}
+                )
+            attrs['technician'] = technician
+        elif attrs['action'] == 'set_status' and not attrs.get('status'):
+            raise serializers.ValidationError({'status': 'กรุณาระบุสถานะ'})
+        return attrs
+
+
 class DashboardStatsSerializer(serializers.Serializer):
     """Serializer สำหรับสถิติในแดชบอร์ด"""
     total_requests = serializers.IntegerField()
@@ -213,4 +296,4 @@ class DashboardStatsSerializer(serializers.Serializer):
     completed_requests = serializers.IntegerField()
     total_equipment = serializers.IntegerField()
     active_equipment = serializers.IntegerField()
-    recent_requests = RepairRequestSerializer(many=True)
\ No newline at end of file
+    recent_requests = RepairRequestListSerializer(many=True)
\ No newline at end of file
@@ -0,0 +1,187 @@
+# repair_api/signals.py
+
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .analytics import local_days, mark_dirty, mark_equipment_dirty
+from .authentication import invalidate_user_tokens, restore_user_tokens, revoke_user_tokens
+from .cache import bump_table_versions
+from .events import publish_on_commit, repair_request_event
+from .images import is_processed, schedule_image_processing
+from .models import (
+    DailyCategoryStats, Equipment, EquipmentCategory, RepairHistory, RepairRequest,
+    RepairRequestStatusCount, UserProfile,
+)
+from .rollups import apply_rollup_deltas, move_category_count, move_rollup_count
+from .stats import invalidate_dashboard_stats
+
+
+@receiver([post_save, post_delete], sender=RepairRequest)
+@receiver([post_save, post_delete], sender=RepairHistory)
+@receiver([post_save, post_delete], sender=Equipment)
+def invalidate_dashboard_stats_on_write(sender, **kwargs):
+    """ล้าง cache สถิติแดชบอร์ดหลัง commit เพื่อไม่ให้ข้อมูลเก่าถูก cache ซ้ำ"""
+    transaction.on_commit(invalidate_dashboard_stats)
+
+
+@receiver([post_save, post_delete], sender=RepairRequest)
+@receiver([post_save, post_delete], sender=RepairHistory)
+@receiver([post_save, post_delete], sender=Equipment)
+@receiver([post_save, post_delete], sender=EquipmentCategory)
+@receiver([post_save, post_delete], sender=User)
+@receiver([post_save, post_delete], sender=UserProfile)
+def bump_table_version_on_write(sender, **kwargs):
+    """เปลี่ยน version ของตารางหลัง commit ทำให้ ETag และ cache ข้อมูลอ้างอิงเดิมใช้ไม่ได้"""
+    transaction.on_commit(lambda: bump_table_versions(sender))
+
+
+@receiver(post_save, sender=RepairRequest)
+def publish_request_change(sender, instance, created, **kwargs):
+    """ส่ง event เมื่อคำร้องถูกสร้าง หรือสถานะ/ช่างที่รับผิดชอบเปลี่ยน
+
+    (Model.save() อัพเดท _rollup_key หลัง post_save จึงยังเป็นค่าก่อนบันทึก)
+    """
+    old_key = None if created else getattr(instance, '_rollup_key', None)
+    new_key = instance.rollup_key()
+    if created or old_key != new_key:
+        publish_on_commit([repair_request_event(
+            'created' if created else 'updated', instance.pk, instance.request_number,
+            old_key, new_key
+        )])
+
+
+@receiver(pre_delete, sender=RepairRequest)
+def remember_request_state_before_delete(sender, instance, **kwargs):
+    """คำร้องที่โหลดด้วย only()/defer(): อ่านฟิลด์ที่ขาดตอนที่แถวยังอยู่ (post_delete อ่านไม่ได้แล้ว)"""
+    deferred = instance.get_deferred_fields()
+    if deferred:
+        instance.refresh_from_db(fields=deferred)
+    if not hasattr(instance, '_rollup_key'):
+        instance._rollup_key = instance.rollup_key()
+
+
+@receiver(post_delete, sender=RepairRequest)
+def publish_request_delete(sender, instance, **kwargs):
+    old_key = getattr(instance, '_rollup_key', None) or instance.rollup_key()
+    publish_on_commit([
+        repair_request_event('deleted', instance.pk, instance.request_number, old_key, None)
+    ])
+
+
+@receiver(post_delete, sender=RepairRequest)
+def remove_deleted_request_from_rollup(sender, instance, **kwargs):
+    key = getattr(instance, '_rollup_key', None) or instance.rollup_key()
+    move_rollup_count(key, None)
+
+
+@receiver(post_save, sender=RepairRequest)
+def mark_analytics_days_on_save(sender, instance, created, **kwargs):
+    """วันที่ของค่าเดิมและค่าใหม่ต้องคำนวณสรุปรายวันใหม่ (ถ้าค่าที่สรุปใช้เปลี่ยน)"""
+    old_state = None if created else getattr(instance, '_analytics_state', None)
+    new_state = instance.analytics_state()
+    if old_state != new_state:
+        days = local_days(*new_state[:3])
+        if old_state is not None:
+            days |= local_days(*old_state[:3])
+        elif not created:
+            # ไม่รู้ค่าเดิม (เช่นโหลดด้วย only()) จึงรวมวันนี้ซึ่งอาจเป็นวันที่ถูกแก้ไข
+            days.add(timezone.localdate())
+        mark_dirty(days)
+    instance._analytics_state = new_state
+
+
+@receiver(post_delete, sender=RepairRequest)
+def mark_analytics_days_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_analytics_state', None) or instance.analytics_state()
+    mark_dirty(local_days(*state[:3]))
+
+
+@receiver(post_save, sender=Equipment)
+def mark_analytics_days_on_category_change(sender, instance, created, **kwargs):
+    """คำร้องของอุปกรณ์ที่ย้ายหมวดหมู่ต้องถูกนับในหมวดหมู่ใหม่"""
+    old_category_id = getattr(instance, '_analytics_category_id', instance.category_id)
+    if not created and old_category_id != instance.category_id:
+        mark_equipment_dirty(Equipment.objects.filter(pk=instance.pk))
+    instance._analytics_category_id = instance.category_id
+
+
+@receiver(pre_delete, sender=EquipmentCategory)
+def mark_analytics_days_on_category_delete(sender, instance, **kwargs):
+    """อุปกรณ์ของหมวดหมู่ที่ถูกลบจะไม่มีหมวดหมู่ (SET_NULL) ยอดต้องย้ายไปแถวที่ไม่มีหมวดหมู่"""
+    mark_dirty(set(
+        DailyCategoryStats.objects.filter(category=instance).values_list('date', flat=True)
+    ))
+
+
+@receiver(pre_delete, sender=User)
+def release_technician_rollup(sender, instance, **kwargs):
+    """คำร้องของช่างที่ถูกลบจะกลายเป็น assigned_to=NULL (SET_NULL) จึงย้ายตัวนับตาม"""
+    deltas = Counter()
+    rows = RepairRequestStatusCount.objects.filter(
+        assigned_to=instance
+    ).exclude(requester=instance)
+    for row in rows:
+        deltas[(row.requester_id, None, row.status)] += row.count
+    apply_rollup_deltas(deltas)
+
+
+@receiver(post_save, sender=Equipment)
+def update_category_count_on_save(sender, instance, **kwargs):
+    new_category_id = instance.counted_category_id()
+    move_category_count(getattr(instance, '_counted_category_id', None), new_category_id)
+    instance._counted_category_id = new_category_id
+
+
+@receiver(post_delete, sender=Equipment)
+def update_category_count_on_delete(sender, instance, **kwargs):
+    old_category_id = getattr(instance, '_counted_category_id', instance.counted_category_id())
+    move_category_count(old_category_id, None)
+
+
+@receiver(post_save, sender=Equipment)
+def process_image_on_save(sender, instance, **kwargs):
+    """ส่งงานสร้างรูปย่อเมื่อมีรูปใหม่ (หรือรูปเดิมยังไม่มีรูปย่อ) และลบรูปย่อของรูปเก่า
+
+    รูปที่บันทึกไว้แล้วว่าสร้างรูปย่อไม่ได้ (image_variants มี error) จะไม่ถูกส่งซ้ำ
+    """
+    name = instance.image.name or ''
+    old_variants = instance.image_variants
+    if old_variants and old_variants.get('source') == name:
+        old_variants = None
+    if (name and not is_processed(instance)) or old_variants:
+        schedule_image_processing(instance.pk, name, old_variants)
+
+
+@receiver(post_delete, sender=Equipment)
+def delete_image_variants(sender, instance, **kwargs):
+    variants = instance.image_variants
+    if variants:
+        schedule_image_processing(instance.pk, '', variants)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_tokens_on_role_change(sender, instance, created, **kwargs):
+    """access token ที่มี role/department เดิมต้องใช้ไม่ได้หลังการเปลี่ยนแปลง"""
+    claims = instance.token_claims()
+    if not created and getattr(instance, '_token_claims', claims) != claims:
+        transaction.on_commit(lambda: invalidate_user_tokens(instance.user_id, claims))
+    instance._token_claims = claims
+
+
+@receiver(post_save, sender=User)
+def update_tokens_on_active_change(sender, instance, **kwargs):
+    if not instance.is_active:
+        transaction.on_commit(lambda: revoke_user_tokens(instance.pk))
+    elif not kwargs['created']:
+        transaction.on_commit(lambda: restore_user_tokens(instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: revoke_user_tokens(user_id))
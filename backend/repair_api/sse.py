@@ -0,0 +1,245 @@
+# repair_api/sse.py
+"""
+Server-Sent Events: ส่งการเปลี่ยนสถานะ/การมอบหมายของคำร้องซ่อมแบบ real-time
+
+GET /api/events/ ส่ง access token ใน header Authorization หรือ ?ticket= สำหรับ EventSource
+ของ browser ที่ตั้ง header เองไม่ได้ (ขอจาก POST /api/events/ticket/ ใช้ได้ครั้งเดียวและหมดอายุ
+ใน EVENT_TICKET_SECONDS จึงไม่มี access token ใน URL หรือ access log)
+แต่ละ connection ได้เฉพาะ event ของคำร้องที่ผู้ใช้มองเห็นตามบทบาท ต่อใหม่ด้วย Last-Event-ID
+จะได้ event ที่พลาดไป ระหว่างเปิด stream ตรวจ token ซ้ำทุก EVENT_STREAM_RECHECK_SECONDS
+บัญชีที่ถูกระงับหรือเปลี่ยนบทบาทจะถูกปิด stream (client ต่อใหม่ด้วย token ใหม่)
+
+รันเป็น process แยกจาก API (events ใน Procfile) reverse proxy ส่ง EVENTS_PATH มาที่ process นี้
+event จาก API มาทาง DatabaseBroker (repair_api.events) ตั๋วอยู่ในตาราง EventTicket
+การตรวจ token (ครั้งแรกและทุก EVENT_STREAM_RECHECK_SECONDS) รันใน thread pool ของตัวเอง
+ไม่ต่อคิวบน thread sync หลักของ ASGI
+
+เป็น ASGI app ที่ครอบ Django (repair_project/asgi.py) ไม่ใช่ view เพราะ Django 4.2
+ไม่แจ้งเมื่อ client ปิด connection ระหว่าง streaming ทำให้ connection ที่ค้างไม่ถูกคืน
+connection หนึ่งใช้เพียง coroutine และคิวเล็ก ๆ ไม่ถือ thread หรือ connection ฐานข้อมูล
+"""
+
+import asyncio
+import json
+import secrets
+import time
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import RoleJWTAuthentication
+from .events import get_broker, visible_to
+from .models import EventTicket, get_user_role
+from .stats import in_own_connection
+
+EVENTS_PATH = '/api/events/'
+ALLOWED_METHODS = b'GET, OPTIONS'
+# field ที่ใช้ภายใน ไม่ส่งให้ client
+PRIVATE_FIELDS = ('keys', 'event_id')
+
+
+def _authenticate(raw_token, fresh=False):
+    """คืน (user_id, role, เวลาหมดอายุของ token) จาก access token"""
+    authentication = RoleJWTAuthentication()
+    authentication.fresh = fresh
+    token = authentication.get_validated_token(raw_token)
+    user = authentication.get_user(token)
+    # user id ใน token เป็น string แต่ event เก็บ id เป็นตัวเลข
+    return User._meta.pk.to_python(user.pk), get_user_role(user), token.get('exp')
+
+
+def issue_ticket(raw_token):
+    """ตั๋วใช้ครั้งเดียวแทน access token ใน query string ของ EVENTS_PATH"""
+    now = timezone.now()
+    EventTicket.objects.filter(expires_at__lte=now).delete()
+    ticket = secrets.token_urlsafe(32)
+    EventTicket.objects.create(
+        ticket=ticket, token=raw_token,
+        expires_at=now + timedelta(seconds=settings.EVENT_TICKET_SECONDS),
+    )
+    return ticket
+
+
+def _redeem_ticket(ticket):
+    raw_token = EventTicket.objects.filter(
+        ticket=ticket, expires_at__gt=timezone.now()
+    ).values_list('token', flat=True).first()
+    # ผู้ที่ลบแถวได้เท่านั้นที่ได้ token ตั๋วเดียวกันจึงเปิด stream ได้ครั้งเดียวแม้มาพร้อมกัน
+    deleted, _ = EventTicket.objects.filter(ticket=ticket).delete()
+    return raw_token if deleted else None
+
+
+async def _raw_token(headers, query):
+    authorization = headers.get(b'authorization', b'').decode('latin1').split()
+    if len(authorization) == 2 and authorization[0] == 'Bearer':
+        return authorization[1]
+    ticket = (query.get('ticket') or [None])[0]
+    return await in_own_connection(_redeem_ticket)(ticket) if ticket else None
+
+
+def _cors_headers(headers):
+    origin = headers.get(b'origin')
+    if origin is None:
+        return []
+    allowed = getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False) or (
+        origin.decode('latin1') in getattr(settings, 'CORS_ALLOWED_ORIGINS', ())
+    )
+    if not allowed:
+        return []
+    return [
+        (b'access-control-allow-origin', origin),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin'),
+    ]
+
+
+def format_event(event):
+    data = {name: value for name, value in event.items() if name not in PRIVATE_FIELDS}
+    return (
+        f"id: {event['event_id']}\nevent: repair_request\n"
+        f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+    ).encode('utf-8')
+
+
+async def _send_json(send, status, data, extra_headers=()):
+    body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), *extra_headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _send_preflight(send, cors):
+    """ตอบ CORS preflight (OPTIONS) ของ browser ที่ส่ง header Authorization/Last-Event-ID"""
+    await send({
+        'type': 'http.response.start',
+        'status': 204,
+        'headers': [
+            (b'allow', ALLOWED_METHODS),
+            *cors,
+            *([
+                (b'access-control-allow-methods', ALLOWED_METHODS),
+                (b'access-control-allow-headers', b'authorization, last-event-id, cache-control'),
+                (b'access-control-max-age', b'86400'),
+            ] if cors else []),
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def _still_authorized(raw_token):
+    """token ยังใช้ได้หรือไม่ (บัญชีถูกระงับ/ลบ หรือบทบาทเปลี่ยนระหว่างเปิด stream)"""
+    try:
+        # ตรวจกับฐานข้อมูลจริงทุกรอบ (รอบตรวจห่างกัน EVENT_STREAM_RECHECK_SECONDS อยู่แล้ว)
+        await in_own_connection(_authenticate)(raw_token, True)
+    except AuthenticationFailed:
+        return False
+    return True
+
+
+async def event_stream(scope, receive, send):
+    headers = dict(scope['headers'])
+    query = parse_qs(scope.get('query_string', b'').decode('latin1'))
+    cors = _cors_headers(headers)
+    if scope['method'] == 'OPTIONS':
+        await _send_preflight(send, cors)
+        return
+    if scope['method'] != 'GET':
+        await _send_json(
+            send, 405, {'detail': 'Method not allowed'}, [(b'allow', ALLOWED_METHODS), *cors]
+        )
+        return
+    raw_token = await _raw_token(headers, query)
+    if not raw_token:
+        await _send_json(send, 401, {'detail': 'กรุณาส่ง access token'}, cors)
+        return
+    try:
+        # การตรวจ token อาจ query ฐานข้อมูล จึงทำใน thread
+        user_id, role, expires = await in_own_connection(_authenticate)(raw_token)
+    except AuthenticationFailed as exc:
+        # InvalidToken มี detail เป็น dict (detail, code, messages)
+        detail = exc.detail.get('detail', '') if isinstance(exc.detail, dict) else exc.detail
+        await _send_json(send, 401, {'detail': str(detail)}, cors)
+        return
+
+    # browser ส่ง Last-Event-ID เองเมื่อต่อใหม่ (client อื่นส่งใน query string ได้)
+    last_event_id = (
+        headers.get(b'last-event-id', b'').decode('latin1')
+        or (query.get('last_event_id') or [None])[0]
+    )
+    subscription, missed = await get_broker().asubscribe(
+        last_event_id, accepts=lambda event: visible_to(event, user_id, role)
+    )
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    # ปลุก coroutine ที่รอ event อยู่ทันทีเมื่อ client ปิด connection
+    disconnected.add_done_callback(lambda _: subscription.wake())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                # ไม่ให้ reverse proxy (nginx) buffer response
+                (b'x-accel-buffering', b'no'),
+                *cors,
+            ],
+        })
+        retry = f'retry: {settings.EVENT_STREAM_RETRY_MS}\n\n'.encode()
+        await send({'type': 'http.response.body', 'body': retry, 'more_body': True})
+        for event in missed:
+            await send(
+                {'type': 'http.response.body', 'body': format_event(event), 'more_body': True}
+            )
+
+        # ปิด stream เมื่อ token หมดอายุ client จะต่อใหม่ด้วย token ใหม่ (และสิทธิ์ล่าสุด)
+        deadline = expires or time.time() + settings.EVENT_STREAM_MAX_SECONDS
+        deadline = min(deadline, time.time() + settings.EVENT_STREAM_MAX_SECONDS)
+        next_check = time.time() + settings.EVENT_STREAM_RECHECK_SECONDS
+        while not disconnected.done():
+            now = time.time()
+            if now >= next_check:
+                if not await _still_authorized(raw_token):
+                    break
+                next_check = now + settings.EVENT_STREAM_RECHECK_SECONDS
+            remaining = deadline - now
+            if remaining <= 0:
+                break
+            event = await subscription.get(
+                min(settings.EVENT_STREAM_HEARTBEAT, remaining, next_check - now)
+            )
+            if disconnected.done() or subscription.overflowed:
+                break
+            # comment ของ SSE รักษา connection ไม่ให้ proxy ตัดเมื่อไม่มี event
+            body = format_event(event) if event else b': ping\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        subscription.close()
+        disconnected.cancel()
+
+
+class EventStreamApp:
+    """ASGI app ที่ตอบ EVENTS_PATH เอง และส่ง request อื่นต่อให้ Django"""
+
+    def __init__(self, app, path=EVENTS_PATH):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == self.path:
+            await event_stream(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
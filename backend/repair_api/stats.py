@@ -0,0 +1,186 @@
+# repair_api/stats.py
+
+import asyncio
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import OPEN_STATUSES, Equipment, RepairRequest, RepairRequestStatusCount
+
+STATS_CACHE_PREFIX = 'dashboard_stats'
+STATS_VERSION_KEY = f'{STATS_CACHE_PREFIX}:version'
+
+
+def _sum_count(condition=None):
+    return Coalesce(Sum('count', filter=condition), 0)
+
+
+def _request_counters(user, role):
+    """นับสถิติคำร้องตามบทบาทจากตาราง RepairRequestStatusCount ด้วย query เดียว
+
+    อ่านเฉพาะแถวตัวนับ (ผู้แจ้ง/ช่าง/สถานะ) แทนการ scan ตารางคำร้อง
+    """
+    in_progress = Q(status__in=['assigned', 'in_progress'])
+    if role == 'technician':
+        # ช่างเห็นงานที่ได้รับมอบหมายและงานที่รอรับ
+        queryset = RepairRequestStatusCount.objects.filter(
+            Q(assigned_to_id=user.pk) | Q(status='pending')
+        )
+        mine = Q(assigned_to_id=user.pk)
+        aggregates = {
+            'total_requests': _sum_count(mine),
+            'pending_requests': _sum_count(Q(status='pending')),
+            'in_progress_requests': _sum_count(mine & Q(status='in_progress')),
+            'completed_requests': _sum_count(mine & Q(status='completed')),
+        }
+    else:
+        if role == 'user':
+            queryset = RepairRequestStatusCount.objects.filter(requester_id=user.pk)
+        else:  # admin
+            queryset = RepairRequestStatusCount.objects.all()
+        aggregates = {
+            'total_requests': _sum_count(),
+            'pending_requests': _sum_count(Q(status='pending')),
+            'in_progress_requests': _sum_count(in_progress),
+            'completed_requests': _sum_count(Q(status='completed')),
+        }
+    return queryset.aggregate(**aggregates)
+
+
+def _equipment_counters():
+    """นับอุปกรณ์ทั้งหมดและที่ใช้งานอยู่ด้วย query เดียว"""
+    return Equipment.objects.aggregate(
+        total_equipment=Count('id'),
+        active_equipment=Count('id', filter=Q(is_active=True)),
+    )
+
+
+def _recent_requests(user, role, limit=5):
+    """คำร้องล่าสุด พร้อม join ที่ serializer ต้องใช้"""
+    latest = RepairRequest.objects.all()
+    if role == 'user':
+        latest = latest.filter(requester_id=user.pk)
+    elif role == 'technician':
+        latest = latest.filter(Q(assigned_to_id=user.pk) | Q(status='pending'))
+    # เลือก id ล่าสุดใน subquery ก่อน แล้วค่อย join เฉพาะแถวที่ได้
+    # (ไม่ให้ฐานข้อมูล join ทั้งตารางก่อน sort)
+    latest_ids = latest.order_by('-created_at').values('id')[:limit]
+    return RepairRequest.objects.filter(id__in=latest_ids).select_related(
+        'equipment', 'requester', 'assigned_to'
+    ).order_by('-created_at')
+
+
+def compute_dashboard_stats(user, role):
+    """คำนวณสถิติแดชบอร์ดจากฐานข้อมูลโดยตรง (ไม่ผ่าน cache)"""
+    from .serializers import RepairRequestListSerializer
+
+    data = _request_counters(user, role)
+    data.update(_equipment_counters())
+    data['recent_requests'] = RepairRequestListSerializer(
+        _recent_requests(user, role), many=True
+    ).data
+    return data
+
+
+def in_own_connection(func):
+    """รัน func ใน thread ของ executor กลางด้วย connection ของ thread นั้น (ไม่ใช่ของ request)
+
+    async ORM ของ Django 4.2 ส่งทุก query ของ request ไปยัง thread เดียวกัน query ที่ await
+    พร้อมกันด้วย asyncio.gather จึงยังทำงานทีละ query ต้องแยก connection จึงจะขนานกันจริง
+    """
+    def run(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            # ปิดตาม CONN_MAX_AGE เช่นเดียวกับตอนจบ request
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+async def acompute_dashboard_stats(user, role):
+    """compute_dashboard_stats สำหรับ async view: query ทั้งสามชุดไม่ขึ้นต่อกันจึงรันพร้อมกัน"""
+    from .serializers import RepairRequestListSerializer
+
+    counters, equipment, recent = await asyncio.gather(
+        in_own_connection(_request_counters)(user, role),
+        in_own_connection(_equipment_counters)(),
+        in_own_connection(lambda: list(_recent_requests(user, role)))(),
+    )
+    counters.update(equipment)
+    counters['recent_requests'] = RepairRequestListSerializer(recent, many=True).data
+    return counters
+
+
+def _stats_version():
+    version = cache.get(STATS_VERSION_KEY)
+    if version is None:
+        # ใช้เวลาปัจจุบันเป็นค่าเริ่มต้น เพื่อไม่ให้ชนกับ key เก่าที่ยังค้างอยู่ใน cache
+        cache.add(STATS_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(STATS_VERSION_KEY)
+    return version
+
+
+def _stats_cache_key(user, role, version):
+    # admin ทุกคนเห็นตัวเลขชุดเดียวกัน จึงแชร์ key ต่อบทบาท
+    if role in ('user', 'technician'):
+        return f'{STATS_CACHE_PREFIX}:{version}:{role}:{user.pk}'
+    return f'{STATS_CACHE_PREFIX}:{version}:admin'
+
+
+def get_dashboard_stats(user, role):
+    """สถิติแดชบอร์ดผ่าน cache ต่อบทบาท/ผู้ใช้ (TTL สั้น + invalidate เมื่อมีการเขียน)"""
+    key = _stats_cache_key(user, role, _stats_version())
+    data = cache.get(key)
+    if data is None:
+        data = compute_dashboard_stats(user, role)
+        cache.set(key, data, settings.DASHBOARD_STATS_CACHE_TTL)
+    return data
+
+
+async def _astats_version():
+    version = await cache.aget(STATS_VERSION_KEY)
+    if version is None:
+        await cache.aadd(STATS_VERSION_KEY, time.time_ns(), None)
+        version = await cache.aget(STATS_VERSION_KEY)
+    return version
+
+
+async def aget_dashboard_stats(user, role):
+    """get_dashboard_stats สำหรับ async view (ใช้ key เดียวกัน)"""
+    key = _stats_cache_key(user, role, await _astats_version())
+    data = await cache.aget(key)
+    if data is None:
+        data = await acompute_dashboard_stats(user, role)
+        await cache.aset(key, data, settings.DASHBOARD_STATS_CACHE_TTL)
+    return data
+
+
+def open_request_counts():
+    """จำนวนคำร้องที่ยังไม่ปิดแยกตามสถานะและความสำคัญ [(status, priority, count), ...]
+
+    ใช้ version เดียวกับสถิติแดชบอร์ด (invalidate เมื่อมีการเขียนคำร้อง รวมถึงแก้ไขทีละหลายรายการ)
+    ตอนคำนวณอ่านเฉพาะงานที่ยังไม่ปิดผ่าน partial index จึง scrape /metrics ถี่ ๆ ได้
+    """
+    key = f'{STATS_CACHE_PREFIX}:{_stats_version()}:open'
+    data = cache.get(key)
+    if data is None:
+        rows = RepairRequest.objects.filter(status__in=OPEN_STATUSES).order_by().values(
+            'status', 'priority'
+        ).annotate(count=Count('id'))
+        data = [(row['status'], row['priority'], row['count']) for row in rows]
+        cache.set(key, data, settings.DASHBOARD_STATS_CACHE_TTL)
+    return data
+
+
+def invalidate_dashboard_stats():
+    """เปลี่ยน version ทำให้ key สถิติเดิมทั้งหมดใช้ไม่ได้ทันที"""
+    try:
+        cache.incr(STATS_VERSION_KEY)
+    except ValueError:
+        cache.add(STATS_VERSION_KEY, time.time_ns(), None)
@@ -0,0 +1,51 @@
+# repair_api/testing.py
+"""
+ตัวช่วยสำหรับการทดสอบ: จำกัดจำนวน query ของ endpoint (query budget)
+
+    from repair_api.testing import query_budget
+
+    with query_budget(2, 'repair-requests list'):
+        client.get('/api/repair-requests/', headers=headers)
+
+ต่างจาก assertNumQueries ตรงที่นับทุก connection ทุก thread (view แบบ async ส่ง query ไป thread อื่น)
+ยอมให้น้อยกว่า budget ได้ และเมื่อเกินจะแสดง query ที่ซ้ำกันซึ่งมักเป็นต้นเหตุ (N+1)
+QueryBudgetTests (repair_api.tests) ใช้ตัวช่วยนี้ตรวจ endpoint หลักทั้งหมด
+"""
+
+import contextlib
+
+from .querystats import collect
+
+
+class QueryBudgetExceeded(AssertionError):
+    """จำนวน query เกิน budget หรือ query รูปแบบเดียวกันซ้ำเกินที่กำหนด"""
+
+    def __init__(self, label, budget, stats, max_duplicates=None):
+        self.label = label
+        self.budget = budget
+        self.stats = stats
+        lines = [f'{label or "query budget"}: {stats.count} queries (budget {budget})']
+        if max_duplicates is not None:
+            lines[0] += f', ซ้ำได้ไม่เกิน {max_duplicates} ครั้ง'
+        for sql, count in stats.fingerprints.most_common(10):
+            lines.append(f'  {count}x {sql[:300]}')
+        super().__init__('\n'.join(lines))
+
+
+@contextlib.contextmanager
+def query_budget(budget, label='', max_duplicates=None):
+    """ล้มเหลว (QueryBudgetExceeded) ถ้าโค้ดในบล็อกใช้ query เกิน budget
+
+    max_duplicates: จำนวนครั้งสูงสุดที่ query รูปแบบเดียวกันรันได้ (None = ไม่ตรวจ)
+    """
+    with collect() as stats:
+        yield stats
+    worst = max(stats.fingerprints.values(), default=0)
+    if stats.count > budget or (max_duplicates is not None and worst > max_duplicates):
+        raise QueryBudgetExceeded(label, budget, stats, max_duplicates)
+
+
+def assert_query_budget(budget, func, *args, label='', max_duplicates=None, **kwargs):
+    """เรียก func(*args, **kwargs) ภายใน query_budget และคืนผลลัพธ์"""
+    with query_budget(budget, label=label, max_duplicates=max_duplicates):
+        return func(*args, **kwargs)
@@ -1,3 +1,1980 @@
-from django.test import TestCase
+# repair_api/tests.py
 
-# Create your tests here.
+import asyncio
+import csv
+import gzip
+import io
+import json
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import F, Q, Sum
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import async_views, querystats, stats
+from .analytics import (
+    COMPLETED, aggregate_days, category_report, rebuild_all, refresh_dirty_days,
+    technician_report,
+)
+from .archive import archive_histories
+from .authentication import RoleJWTAuthentication
+from .benchmarking import explain, full_table_scans, percentile
+from .bulk import bulk_update_requests
+from .cache import _key, cached_reference, stats as cache_stats, table_versions
+from .health import CHECKS, ReadinessProbe
+from .events import DatabaseBroker, repair_request_event, visible_to
+from .models import (
+    AnalyticsDirtyDay, DailyCategoryStats, DailyTechnicianStats, Equipment, EquipmentCategory,
+    Job, RepairHistory, RepairHistoryArchive, RepairRequest, StreamEvent, TableVersion,
+    UserProfile,
+)
+from .management.commands.benchmark_api import (
+    ROLES, Command as BenchmarkCommand, compare_results, endpoints, sample_users,
+)
+from .loadtest import Client, run_load, summarize
+from .jobs import (
+    Worker, claim_jobs, enqueue, register, requeue_stale_jobs, retry_delay, run_job,
+)
+from .images import IMAGE_VARIANTS, current_variants, process_equipment_image
+from .importer import EquipmentImporter, import_equipment
+from .numbering import get_allocator
+from .serializers import RoleTokenObtainPairSerializer
+from .sse import EVENTS_PATH, event_stream
+from .testing import query_budget
+from .rollups import count_requests_by_key, current_rollup, refresh_category_counts
+from .search import SEARCH_FIELDS, _has_fts_table, _icontains, search_queryset
+from .seeding import generate_dataset
+from .stats import get_dashboard_stats
+from .views import EquipmentCategoryViewSet, RepairRequestViewSet, technician_list
+
+
+def make_user(username, role='user', **extra):
+    """ผู้ใช้พร้อมโปรไฟล์ตามบทบาท (รหัสผ่าน 'password')"""
+    user = User.objects.create_user(username, password='password', **extra)
+    UserProfile.objects.create(user=user, role=role)
+    return user
+
+
+def make_equipment(code='EQ-001', **extra):
+    return Equipment.objects.create(
+        equipment_code=code, name=f'อุปกรณ์ {code}', location='อาคาร 1', **extra
+    )
+
+
+def make_requests(requester, equipment, count, **extra):
+    return [
+        RepairRequest(
+            equipment=equipment, requester=requester, title=f'คำร้อง {i}',
+            description='เสีย', **extra,
+        )
+        for i in range(count)
+    ]
+
+
+class RepairRequestBulkCreateTests(TestCase):
+    """bulk_create ต้องมีผลข้างเคียงเดียวกับการสร้างทีละรายการด้วย save()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.requester = make_user('requester')
+        cls.technician = make_user('technician', role='technician')
+        cls.equipment = make_equipment()
+
+    def test_updates_rollup_dirty_days_versions_and_events(self):
+        AnalyticsDirtyDay.objects.all().delete()
+        versions = table_versions([RepairRequest])
+        events = StreamEvent.objects.count()
+        objs = make_requests(self.requester, self.equipment, 3) + make_requests(
+            self.requester, self.equipment, 2, status='assigned', assigned_to=self.technician
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            created = RepairRequest.objects.bulk_create(objs)
+
+        numbers = [obj.request_number for obj in created]
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertTrue(all(numbers))
+        self.assertEqual(current_rollup(), count_requests_by_key())
+        self.assertTrue(AnalyticsDirtyDay.objects.exists())
+        self.assertNotEqual(table_versions([RepairRequest]), versions)
+        self.assertEqual(StreamEvent.objects.count() - events, 5)
+
+        # save() ต่อจาก bulk_create ย้ายตัวนับจาก key ที่ถูกต้อง
+        created[0].status = 'cancelled'
+        created[0].save()
+        self.assertEqual(current_rollup(), count_requests_by_key())
+
+    def test_deferred_loads_keep_rollup_in_sync(self):
+        RepairRequest.objects.bulk_create(make_requests(self.requester, self.equipment, 3))
+        for queryset in (RepairRequest.objects.only('id'), RepairRequest.objects.defer('status')):
+            with self.subTest(str(queryset.query)):
+                repair_request = queryset.first()
+                # อ่านฟิลด์ที่ขาดต้องไม่เรียก from_db วนซ้ำ
+                self.assertEqual(repair_request.requester_id, self.requester.pk)
+                repair_request.status = 'in_progress'
+                repair_request.assigned_to = self.technician
+                repair_request.save()
+                self.assertEqual(current_rollup(), count_requests_by_key())
+                queryset.last().delete()
+                self.assertEqual(current_rollup(), count_requests_by_key())
+
+    def test_rejects_ignore_conflicts(self):
+        objs = make_requests(self.requester, self.equipment, 1)
+        with self.assertRaises(ValueError):
+            RepairRequest.objects.bulk_create(objs, ignore_conflicts=True)
+
+
+class RequestNumberConcurrencyTests(TransactionTestCase):
+    """สร้างคำร้องพร้อมกันหลาย thread แล้วเลขที่คำร้องต้องไม่ซ้ำ (แต่ละ thread ใช้ connection ของตัวเอง)"""
+
+    threads = 8
+    per_thread = 20
+
+    def setUp(self):
+        self.equipment = make_equipment()
+        self.requesters = [make_user(f'stress_{i}') for i in range(self.threads)]
+        get_allocator().reset()
+
+    def _run(self, bulk_size=0):
+        errors = []
+
+        def worker(user):
+            try:
+                remaining = self.per_thread
+                while remaining:
+                    size = min(bulk_size or 1, remaining)
+                    objs = make_requests(user, self.equipment, size)
+                    if bulk_size:
+                        RepairRequest.objects.bulk_create(objs)
+                    else:
+                        objs[0].save()
+                    remaining -= size
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in self.requesters]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        numbers = list(RepairRequest.objects.values_list('request_number', flat=True))
+        self.assertEqual(len(numbers), self.threads * self.per_thread)
+        duplicates = [number for number, count in Counter(numbers).items() if count > 1]
+        self.assertEqual(duplicates, [])
+        self.assertEqual(current_rollup(), count_requests_by_key())
+
+    def test_save(self):
+        self._run()
+
+    def test_bulk_create(self):
+        self._run(bulk_size=5)
+
+    @override_settings(REQUEST_NUMBER_BLOCK_SIZE=10)
+    def test_save_with_number_blocks(self):
+        self._run()
+
+    @override_settings(REQUEST_NUMBER_BLOCK_SIZE=10)
+    def test_bulk_create_with_number_blocks(self):
+        self._run(bulk_size=5)
+
+
+def endpoint_cases(equipment_id):
+    """(ชื่อ, บทบาทผู้เรียก, action, query params) ของทุกเส้นทางที่อ่าน RepairRequest"""
+    return [
+        ('list (admin)', 'admin', 'list', {}),
+        ('list (user)', 'user', 'list', {}),
+        ('list (technician)', 'technician', 'list', {}),
+        ('list ?status', 'admin', 'list', {'status': 'in_progress'}),
+        ('list ?status=pending', 'technician', 'list', {'status': 'pending'}),
+        ('list ?priority', 'admin', 'list', {'priority': 'urgent'}),
+        ('list ?equipment', 'admin', 'list', {'equipment': equipment_id}),
+        ('list (user) ?status', 'user', 'list', {'status': 'completed'}),
+        ('my_requests', 'user', 'my_requests', {}),
+        ('assigned_to_me', 'technician', 'assigned_to_me', {}),
+    ]
+
+
+def is_unfiltered_count(sql):
+    # COUNT(*) ของทั้งตารางต้องอ่านทุกแถวอยู่แล้ว ไม่นับว่าเป็นการถดถอย
+    return sql.lstrip().upper().startswith('SELECT COUNT(*)') and ' WHERE ' not in sql.upper()
+
+
+class QueryPlanTests(TestCase):
+    """ทุก query ของ endpoint คำร้องต้องใช้ index (EXPLAIN ไม่มี full scan ของตารางคำร้อง)"""
+
+    table = RepairRequest._meta.db_table
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(2000, users=50, technicians=5, equipment=100, histories=False)
+        cls.users = {
+            role: UserProfile.objects.filter(role=role).select_related('user').first().user
+            for role in ('user', 'technician', 'admin')
+        }
+
+    def test_endpoints_use_indexes(self):
+        factory = APIRequestFactory()
+        equipment_id = Equipment.objects.values_list('id', flat=True).first()
+        for name, role, action, params in endpoint_cases(equipment_id):
+            with self.subTest(name):
+                request = factory.get('/', params)
+                force_authenticate(request, self.users[role])
+                view = RepairRequestViewSet.as_view({'get': action})
+                with CaptureQueriesContext(connection) as ctx:
+                    response = view(request)
+                self.assertEqual(response.status_code, 200)
+                statements = [
+                    query['sql'] for query in ctx.captured_queries
+                    if query['sql'].lstrip().upper().startswith('SELECT')
+                    and self.table in query['sql']
+                ]
+                self.assertTrue(statements)
+                for sql in statements:
+                    plan = explain(sql)
+                    if not is_unfiltered_count(sql):
+                        self.assertNotIn(self.table, full_table_scans(plan), '\n'.join(plan))
+
+
+class SearchIndexTests(TestCase):
+    """trigger ต้องทำให้ index ค้นหาตรงกับตารางเสมอ และผลต้องเท่ากับ icontains"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.requester = make_user('requester')
+        cls.equipment = make_equipment()
+
+    def setUp(self):
+        for model in SEARCH_FIELDS:
+            if not _has_fts_table(model):
+                # SQLite ที่ไม่มี FTS5 ใช้ icontains (migration 0006 ไม่สร้างตาราง)
+                self.skipTest('ไม่มีตาราง FTS5')
+
+    def _numbers(self, term):
+        return set(search_queryset(RepairRequest.objects.all(), term).values_list(
+            'request_number', flat=True
+        ))
+
+    def _create(self, title, **extra):
+        return RepairRequest.objects.create(
+            equipment=self.equipment, requester=self.requester, title=title,
+            description='เสีย', **extra
+        )
+
+    def test_triggers_follow_insert_update_delete(self):
+        repair_request = self._create('จอภาพกะพริบ')
+        bulk, = RepairRequest.objects.bulk_create(make_requests(self.requester, self.equipment, 1))
+        self.assertEqual(self._numbers('กะพริบ'), {repair_request.request_number})
+        self.assertEqual(self._numbers(bulk.request_number), {bulk.request_number})
+
+        repair_request.title = 'แป้นพิมพ์ค้าง'
+        repair_request.save()
+        self.assertEqual(self._numbers('กะพริบ'), set())
+        self.assertEqual(self._numbers('แป้นพิมพ์'), {repair_request.request_number})
+        # queryset.update() ก็ผ่าน trigger เช่นกัน
+        RepairRequest.objects.filter(pk=repair_request.pk).update(description='สายหลวม')
+        self.assertEqual(self._numbers('สายหลวม'), {repair_request.request_number})
+
+        repair_request.delete()
+        self.assertEqual(self._numbers('แป้นพิมพ์'), set())
+
+        self.equipment.location = 'ห้องประชุมใหญ่'
+        self.equipment.save()
+        self.assertEqual(
+            list(search_queryset(Equipment.objects.all(), 'ประชุม')), [self.equipment]
+        )
+
+    def test_quotes_and_operators_are_literal(self):
+        quoted = self._create('จอ "LED" ดับ')
+        self._create('จอ LED ดับ')
+        self.assertEqual(self._numbers('"LED"'), {quoted.request_number})
+        for term in ('""""', 'LED" OR "ดับ', 'NEAR(จอ LED)', "LED' --", '*ดับ*'):
+            with self.subTest(term=term):
+                self.assertEqual(
+                    self._numbers(term),
+                    set(_icontains(RepairRequest.objects.all(), term.strip()).values_list(
+                        'request_number', flat=True
+                    ))
+                )
+
+    def test_matches_icontains(self):
+        RepairRequest.objects.bulk_create([
+            RepairRequest(equipment=self.equipment, requester=self.requester, title=title,
+                          description=description)
+            for title, description in (
+                ('Printer JAM', 'กระดาษติดถาดสอง'), ('น้ำรั่วจากแอร์', 'ห้อง 301'),
+                ('แอร์ไม่เย็น', 'น้ำแข็งเกาะ'), ('printer offline', 'ต่อเครือข่ายไม่ได้'),
+            )
+        ])
+        for term in ('printer', 'PRINTER', 'แอร์', 'น้ำ', 'ถาดสอง', 'ไม่พบคำนี้', 'ab'):
+            with self.subTest(term=term):
+                self.assertEqual(
+                    self._numbers(term),
+                    set(_icontains(RepairRequest.objects.all(), term).values_list(
+                        'request_number', flat=True
+                    ))
+                )
+
+
+# จำนวน query สูงสุดต่อ request ของ endpoint หลัก (ชื่อเดียวกับผลของ benchmark_api)
+# นับเมื่อ cache อุ่นแล้ว ถ้าเปลี่ยนโค้ดแล้วใช้ query น้อยลง ให้ลด budget ตามด้วย
+QUERY_BUDGETS = {
+    'user dashboard': 0,
+    'user repair-requests list': 1,
+    'user repair-requests page': 2,
+    'user repair-requests search': 2,
+    'user repair-request detail': 3,
+    'user repair-request history': 3,
+    'user equipment list': 1,
+    'user equipment search': 2,
+    'user equipment detail': 1,
+    'user categories': 0,
+    'user technicians': 0,
+    'user profile': 2,
+    'user my requests': 1,
+    'user create request': 12,
+    'technician dashboard': 0,
+    'technician repair-requests list': 1,
+    'technician repair-requests page': 2,
+    'technician repair-requests search': 2,
+    'technician repair-request detail': 3,
+    'technician repair-request history': 3,
+    'technician equipment list': 1,
+    'technician equipment search': 2,
+    'technician equipment detail': 1,
+    'technician categories': 0,
+    'technician technicians': 0,
+    'technician profile': 2,
+    'technician assigned to me': 1,
+    'technician pending requests': 1,
+    'technician update status': 8,
+    'admin dashboard': 0,
+    'admin repair-requests list': 1,
+    'admin repair-requests page': 2,
+    'admin repair-requests search': 2,
+    'admin repair-request detail': 3,
+    'admin repair-request history': 3,
+    'admin equipment list': 1,
+    'admin equipment search': 2,
+    'admin equipment detail': 1,
+    'admin categories': 0,
+    'admin technicians': 0,
+    'admin profile': 2,
+    'admin analytics categories': 0,
+    'admin analytics technicians': 0,
+    'admin cache stats': 0,
+    'admin job stats': 3,
+}
+
+# query รูปแบบเดียวกันรันซ้ำได้ไม่เกินนี้ต่อ request (ซ้ำมากกว่านี้มักเป็น N+1)
+MAX_DUPLICATES = 2
+
+
+class QueryBudgetTests(TransactionTestCase):
+    """endpoint หลักของทุกบทบาทต้องใช้ query ไม่เกิน QUERY_BUDGETS เมื่อ cache อุ่นแล้ว
+
+    ไม่ครอบด้วยทรานแซกชันของ TestCase: จำนวน query (SAVEPOINT, on_commit) จึงเหมือนการใช้งานจริง
+    """
+
+    def setUp(self):
+        # budget นับตามการ deploy ที่ cache แชร์ระหว่าง worker (cache ต่อ process ต้องถามฐานข้อมูลเพิ่ม)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        settings_override = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir.name,
+        }})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_every_endpoint_has_a_budget(self):
+        names = {
+            f'{role} {name}'
+            for role in ROLES
+            for name, _, _ in endpoints(role, {'request_ids': [], 'assigned_ids': []})
+        }
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_endpoints_within_budget(self):
+        generate_dataset(2000, users=50, technicians=10, equipment=200, histories=False)
+        users = sample_users(per_role=1)
+        for role in ROLES:
+            data = users[role][0]
+            headers = {'Authorization': f"Bearer {data['token']}", 'Accept': 'application/json'}
+            for name, _, build in endpoints(role, data):
+                key = f'{role} {name}'
+                rng = random.Random(0)
+
+                def call():
+                    method, path, body = build(rng)
+                    if method == 'GET':
+                        return self.client.get(path, headers=headers)
+                    return self.client.post(path, body, content_type='application/json',
+                                            headers=headers)
+
+                with self.subTest(key):
+                    # ครั้งแรกเติม cache ข้อมูลอ้างอิงและแดชบอร์ด
+                    call()
+                    with query_budget(QUERY_BUDGETS[key], key, max_duplicates=MAX_DUPLICATES):
+                        response = call()
+                    self.assertLess(response.status_code, 400)
+
+
+class BenchmarkSuiteTests(SimpleTestCase):
+    """ส่วนของ benchmark_api ที่ไม่ต้องสร้างข้อมูลจำลอง: สถิติ การเทียบผล และ load client"""
+
+    def _results(self, p95=10.0, queries=3, status=200, throughput=100.0):
+        endpoint = {'status': status, 'queries': queries, 'p50_ms': 5.0, 'p95_ms': p95}
+        return {
+            'meta': {'git_commit': 'abc123', 'dataset': {'requests': 100}},
+            'micro': {'user dashboard': endpoint},
+            'load': {
+                'overall': {'throughput': throughput},
+                'endpoints': {'user dashboard': {'p50_ms': 5.0, 'p95_ms': p95}},
+            },
+        }
+
+    def test_percentile_and_summary(self):
+        samples = [value / 1000 for value in range(10, 0, -1)]
+        self.assertEqual(percentile(samples, 50), 0.005)
+        self.assertEqual(percentile(samples, 95), 0.01)
+        self.assertEqual(percentile([], 95), 0.0)
+        self.assertEqual(summarize(samples, 2), {
+            'requests': 10, 'throughput': 5.0, 'p50_ms': 5.0, 'p95_ms': 10.0, 'p99_ms': 10.0,
+        })
+
+    def test_compare_results_flags_only_real_regressions(self):
+        baseline = self._results()
+        self.assertEqual(compare_results(baseline, self._results(p95=11.5), 0.2, 1.0), [])
+        # ช้าลงเกินสัดส่วนแต่ต่างกันไม่ถึง min_ms ไม่นับ
+        self.assertEqual(compare_results(self._results(p95=1.0), self._results(p95=1.9), 0.2, 1.0), [])
+        self.assertEqual(compare_results(baseline, self._results(queries=4), 0.2, 1.0), [
+            ('user dashboard', 'queries', 3, 4),
+        ])
+        self.assertEqual(
+            compare_results(baseline, self._results(p95=20.0, status=500, throughput=50.0), 0.2, 1.0),
+            [
+                ('user dashboard', 'status', 200, 500),
+                ('user dashboard', 'p95_ms', 10.0, 20.0),
+                ('load overall', 'throughput', 100.0, 50.0),
+                ('load user dashboard', 'p95_ms', 10.0, 20.0),
+            ],
+        )
+        # endpoint ที่ไม่มีใน baseline (เพิ่มใหม่) ไม่ถูกเทียบ
+        current = self._results(queries=10)
+        current['micro']['user new endpoint'] = current['micro'].pop('user dashboard')
+        self.assertEqual(compare_results(baseline, current, 0.2, 1.0), [])
+
+    def test_compare_command_exit_status(self):
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for name, results in (('base', self._results()), ('same', self._results(p95=10.5)),
+                                  ('slow', self._results(p95=30.0))):
+                paths[name] = f'{directory}/{name}.json'
+                with open(paths[name], 'w') as fileobj:
+                    json.dump(results, fileobj)
+
+            out = io.StringIO()
+            call_command('benchmark_api', results=paths['same'], compare=paths['base'], stdout=out)
+            self.assertIn('ไม่พบ regression', out.getvalue())
+            with self.assertRaisesMessage(CommandError, 'regression 2'):
+                call_command('benchmark_api', results=paths['slow'], compare=paths['base'],
+                             stdout=io.StringIO())
+
+    def test_role_mix(self):
+        command = BenchmarkCommand()
+        self.assertEqual(command._role_mix('user=70,technician=25,admin=5'),
+                         {'user': 70, 'technician': 25, 'admin': 5})
+        self.assertEqual(command._role_mix('admin=1'), {'admin': 1})
+        for value in ('user70', 'user=many', 'guest=10', 'user=0,admin=0'):
+            with self.subTest(value=value), self.assertRaises(CommandError):
+                command._role_mix(value)
+
+    def test_load_client_reads_keep_alive_and_chunked_responses(self):
+        bodies = {
+            '/fixed': b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok',
+            '/chunked': (b'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n'
+                         b'2\r\nok\r\n0\r\n\r\n'),
+            '/close': b'HTTP/1.1 503 Busy\r\nContent-Length: 0\r\nConnection: close\r\n\r\n',
+        }
+        connections = []
+
+        async def handle(reader, writer):
+            connections.append(writer)
+            try:
+                while True:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                    path = head.split()[1].decode()
+                    writer.write(bodies[path])
+                    await writer.drain()
+                    if path == '/close':
+                        break
+            except asyncio.IncompleteReadError:
+                pass
+            writer.close()
+
+        async def run():
+            server = await asyncio.start_server(handle, '127.0.0.1', 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                client = Client(port, 'token', list(bodies), seed=0)
+                return await run_load([client], duration=0.3, warmup=0.05)
+
+        latencies, by_endpoint = asyncio.run(run())
+
+        self.assertEqual(set(by_endpoint), set(bodies))
+        self.assertEqual(len(latencies), sum(
+            len(endpoint['latencies']) for endpoint in by_endpoint.values()
+        ))
+        self.assertEqual(set(by_endpoint['/fixed']['statuses']), {200})
+        self.assertEqual(set(by_endpoint['/chunked']['statuses']), {200})
+        self.assertEqual(set(by_endpoint['/close']['statuses']), {503})
+        # เปิด connection ใหม่เฉพาะหลัง server ปิด (ราว 1 ใน 3) ไม่ใช่ทุก request
+        self.assertLess(len(connections), len(latencies) * 0.6)
+
+
+class GenerateDatasetCommandTests(TestCase):
+    """คำสั่ง generate_dataset ต้องไม่รันบนฐานข้อมูลที่อาจเป็น production โดยไม่ตั้งใจ"""
+
+    options = {'requests': 5, 'users': 2, 'technicians': 1, 'admins': 1, 'equipment': 2,
+               'categories': 1, 'skip_analytics': True, 'stdout': io.StringIO()}
+
+    def test_refuses_without_debug_or_force(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', **self.options)
+        self.assertFalse(RepairRequest.objects.exists())
+
+    def test_runs_with_force(self):
+        call_command('generate_dataset', force=True, **self.options)
+        self.assertEqual(RepairRequest.objects.count(), 5)
+
+class BulkActionTests(TestCase):
+    """bulk endpoint ต้องให้ผลเดียวกับการมอบหมาย/ปิดงานทีละคำร้อง"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', role='admin')
+        cls.technician = make_user('technician', role='technician')
+        requester = make_user('requester')
+        RepairRequest.objects.bulk_create(make_requests(requester, make_equipment(), 10))
+
+    def _call(self, action, data, pk=None):
+        request = APIRequestFactory().post('/', data, format='json')
+        force_authenticate(request, self.admin)
+        view = RepairRequestViewSet.as_view({'post': action})
+        response = view(request, pk=pk) if pk else view(request)
+        self.assertEqual(response.status_code, 200, getattr(response, 'data', None))
+
+    def test_bulk_matches_per_ticket(self):
+        ids = list(RepairRequest.objects.order_by('id').values_list('id', flat=True))
+        single_ids, bulk_ids = ids[:5], ids[5:]
+        for pk in single_ids:
+            self._call('assign', {'technician_id': self.technician.pk}, pk=pk)
+            self._call('update_status', {'status': 'completed'}, pk=pk)
+        self._call('bulk', {'ids': bulk_ids, 'action': 'assign',
+                            'technician_id': self.technician.pk})
+        self._call('bulk', {'ids': bulk_ids, 'action': 'set_status', 'status': 'completed'})
+
+        for group in (single_ids, bulk_ids):
+            self.assertEqual(
+                RepairRequest.objects.filter(id__in=group, status='completed').count(), 5
+            )
+            self.assertEqual(
+                RepairHistory.objects.filter(repair_request_id__in=group).count(), 10
+            )
+        self.assertEqual(current_rollup(), count_requests_by_key())
+
+    def test_query_count_does_not_grow_with_ids(self):
+        ids = list(RepairRequest.objects.order_by('id').values_list('id', flat=True))
+        counts = []
+        # กลุ่มแรกเติม cache (ผู้ใช้/version ของตาราง) ไม่นับ
+        for group in (ids[:1], ids[1:3], ids[3:]):
+            with CaptureQueriesContext(connection) as queries:
+                self._call('bulk', {'ids': group, 'action': 'assign',
+                                    'technician_id': self.technician.pk})
+                self._call('bulk', {'ids': group, 'action': 'set_status',
+                                    'status': 'completed'})
+            counts.append(len(queries))
+        self.assertEqual(counts[1], counts[2])
+
+
+class DashboardStatsTests(TestCase):
+    """สถิติแดชบอร์ดจากตัวนับต้องเท่ากับการนับจากตารางคำร้องโดยตรง ในจำนวน query คงที่"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.requester = make_user('requester')
+        other = make_user('other')
+        cls.technician = make_user('technician', role='technician')
+        cls.admin = make_user('admin', role='admin')
+        equipment = make_equipment()
+        make_equipment('EQ-002', is_active=False)
+        RepairRequest.objects.bulk_create(
+            make_requests(cls.requester, equipment, 3)
+            + make_requests(cls.requester, equipment, 2, status='assigned',
+                            assigned_to=cls.technician)
+            + make_requests(other, equipment, 2, status='in_progress',
+                            assigned_to=cls.technician)
+            + make_requests(other, equipment, 1, status='completed',
+                            assigned_to=cls.technician)
+            + make_requests(other, equipment, 2)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _expected(self, user, role):
+        requests = RepairRequest.objects.all()
+        if role == 'user':
+            mine = visible = requests.filter(requester=user)
+            pending = mine.filter(status='pending')
+            in_progress = mine.filter(status__in=['assigned', 'in_progress'])
+        elif role == 'technician':
+            mine = requests.filter(assigned_to=user)
+            visible = requests.filter(Q(assigned_to=user) | Q(status='pending'))
+            pending = requests.filter(status='pending')
+            in_progress = mine.filter(status='in_progress')
+        else:
+            mine = visible = requests
+            pending = requests.filter(status='pending')
+            in_progress = requests.filter(status__in=['assigned', 'in_progress'])
+        return {
+            'total_requests': mine.count(),
+            'pending_requests': pending.count(),
+            'in_progress_requests': in_progress.count(),
+            'completed_requests': mine.filter(status='completed').count(),
+            'total_equipment': 2,
+            'active_equipment': 1,
+            'recent_requests': set(
+                visible.order_by('-created_at').values_list('request_number', flat=True)[:5]
+            ),
+        }
+
+    def test_counts_match_direct_queries(self):
+        for user, role in ((self.requester, 'user'), (self.technician, 'technician'),
+                           (self.admin, 'admin')):
+            with self.subTest(role=role):
+                with self.assertNumQueries(3):
+                    data = dict(get_dashboard_stats(user, role))
+                data['recent_requests'] = {
+                    request['request_number'] for request in data['recent_requests']
+                }
+                self.assertEqual(data, self._expected(user, role))
+                # ครั้งถัดไปอ่านจาก cache
+                with self.assertNumQueries(0):
+                    get_dashboard_stats(user, role)
+
+    def test_admins_share_one_cache_entry(self):
+        other_admin = make_user('admin2', role='admin')
+        get_dashboard_stats(self.admin, 'admin')
+        with self.assertNumQueries(0):
+            get_dashboard_stats(other_admin, 'admin')
+
+
+CATEGORY_FIELDS = (
+    'created_count', 'assigned_count', 'assign_seconds', 'completed_count',
+    'complete_seconds', 'estimated_cost', 'actual_cost',
+)
+TECHNICIAN_FIELDS = ('assigned_count', 'completed_count', 'complete_seconds', 'actual_cost')
+
+
+def _rows(objs, key, fields):
+    return {
+        (obj.date, getattr(obj, key)): tuple(
+            round(value, 3) if isinstance(value, float) else value
+            for value in (getattr(obj, field) for field in fields)
+        )
+        for obj in objs
+    }
+
+
+class AnalyticsIncrementalTests(TestCase):
+    """สรุปรายวันที่คำนวณเฉพาะวันที่ถูกแก้ไข ต้องเท่ากับการคำนวณใหม่ทั้งหมด"""
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(500, users=20, technicians=3, equipment=30, categories=3)
+
+    def test_incremental_refresh_matches_rebuild(self):
+        rebuild_all()
+        rng = random.Random(1)
+        admin = User.objects.filter(username__startswith='bench_admin_').first()
+        technician = User.objects.filter(username__startswith='bench_tech_').first()
+        ids = list(RepairRequest.objects.values_list('id', flat=True))
+        now = timezone.now()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for pk in rng.sample(ids, 20):
+                repair_request = RepairRequest.objects.get(pk=pk)
+                repair_request.status = 'completed'
+                repair_request.assigned_to = technician
+                repair_request.completed_date = now - timedelta(days=rng.randint(0, 30))
+                repair_request.actual_cost = rng.randint(100, 1000)
+                repair_request.save()
+            bulk_update_requests(
+                RepairRequest.objects.all(), rng.sample(ids, 20), admin, 'assign',
+                assigned_to=technician
+            )
+            RepairRequest.objects.get(pk=rng.choice(ids)).delete()
+            equipment = Equipment.objects.filter(category__isnull=False).first()
+            equipment.category = EquipmentCategory.objects.exclude(
+                pk=equipment.category_id
+            ).first()
+            equipment.save()
+        refresh_dirty_days()
+
+        expected_categories, expected_technicians = aggregate_days()
+        self.assertEqual(
+            _rows(DailyCategoryStats.objects.all(), 'category_id', CATEGORY_FIELDS),
+            _rows(expected_categories, 'category_id', CATEGORY_FIELDS),
+        )
+        self.assertEqual(
+            _rows(DailyTechnicianStats.objects.all(), 'technician_id', TECHNICIAN_FIELDS),
+            _rows(expected_technicians, 'technician_id', TECHNICIAN_FIELDS),
+        )
+
+    def test_reports_match_direct_queries(self):
+        rebuild_all()
+        start, end = date(2000, 1, 1), date(2100, 1, 1)
+        requests = RepairRequest.objects.order_by()
+        completed = requests.filter(COMPLETED, completed_date__isnull=False)
+
+        expected = {}
+        for category in [None, *EquipmentCategory.objects.values_list('pk', flat=True)]:
+            rows = requests.filter(equipment__category=category)
+            done = completed.filter(equipment__category=category)
+            if rows.exists():
+                expected[category] = (
+                    rows.count(), done.count(),
+                    str(Decimal(done.aggregate(total=Sum('actual_cost'))['total'] or 0)
+                        .quantize(Decimal('0.01'))),
+                )
+        report = category_report(start, end, 'total')
+        self.assertEqual(
+            {row['category']: (row['created'], row['completed'], row['actual_cost'])
+             for row in report},
+            expected
+        )
+        # ผลรวมรายเดือนเท่ากับผลรวมทั้งหมด
+        monthly = Counter()
+        for row in category_report(start, end, 'month'):
+            monthly[row['category']] += row['created']
+        self.assertEqual(dict(monthly), {row['category']: row['created'] for row in report})
+
+        technicians = technician_report(start, end, 'total')
+        self.assertTrue(technicians)
+        for row in technicians:
+            with self.subTest(technician=row['username']):
+                self.assertEqual(row['assigned'], requests.filter(
+                    assigned_to=row['technician'], assigned_date__isnull=False
+                ).count())
+                self.assertEqual(
+                    row['completed'], completed.filter(assigned_to=row['technician']).count()
+                )
+
+    def test_dirty_days_recorded_after_commit_with_one_queued_job(self):
+        requester = make_user('dirty_requester')
+        equipment = Equipment.objects.first()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                for repair_request in make_requests(requester, equipment, 3):
+                    repair_request.save()
+            # ไม่มีการเขียน AnalyticsDirtyDay หรือ Job ในทรานแซกชันของการบันทึกคำร้อง
+            self.assertFalse([
+                query for query in queries
+                if 'repair_api_analyticsdirtyday' in query['sql']
+                or 'repair_api_job' in query['sql']
+            ])
+        for callback in callbacks:
+            callback()
+        self.assertTrue(AnalyticsDirtyDay.objects.filter(date=timezone.localdate()).exists())
+        self.assertEqual(Job.objects.filter(name='analytics.refresh', status='queued').count(), 1)
+
+
+class HistoryArchiveTests(TestCase):
+    """การย้ายประวัติไป archive ไม่เปลี่ยนผลที่อ่านได้ และไม่ส่ง signal ที่ล้าง cache/ETag"""
+
+    def test_archive_moves_rows_without_signals(self):
+        requester = make_user('requester')
+        repair_request, other = RepairRequest.objects.bulk_create(
+            make_requests(requester, make_equipment(), 2)
+        )
+        RepairHistory.objects.bulk_create([
+            RepairHistory(repair_request=request, updated_by=requester, status='completed')
+            for request in (repair_request, repair_request, other)
+        ])
+        RepairRequest.objects.filter(pk=repair_request.pk).update(
+            status='completed', updated_at=timezone.now() - timedelta(days=365)
+        )
+        expected = [entry.id for entry in repair_request.history_entries()]
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            moved = archive_histories(older_than_days=30, batch_size=1)
+        self.assertEqual(moved, 2)
+        self.assertEqual(callbacks, [])
+        self.assertFalse(RepairHistory.objects.filter(repair_request=repair_request).exists())
+        self.assertTrue(RepairHistory.objects.filter(repair_request=other).exists())
+        repair_request = RepairRequest.objects.get(pk=repair_request.pk)
+        self.assertEqual([entry.id for entry in repair_request.history_entries()], expected)
+
+
+class CategoryEquipmentCountTests(TestCase):
+    """จำนวนอุปกรณ์ต่อหมวดหมู่: annotate ใน query เดียว และตัวนับ active_equipment_count"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('viewer')
+
+    def _list(self):
+        request = APIRequestFactory().get('/api/categories/')
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = EquipmentCategoryViewSet.as_view({'get': 'list'})(request)
+        self.assertEqual(response.status_code, 200)
+        cache.clear()
+        results = response.data['results'] if 'results' in response.data else response.data
+        return {row['name']: row['equipment_count'] for row in results}, len(queries)
+
+    def _category_with(self, name, active, inactive=0):
+        category = EquipmentCategory.objects.create(name=name)
+        for i in range(active + inactive):
+            make_equipment(f'{name}-{i}', category=category, is_active=i < active)
+        return category
+
+    def test_list_counts_active_equipment_in_constant_queries(self):
+        for denormalized in (False, True):
+            with self.subTest(denormalized=denormalized), \
+                    override_settings(EQUIPMENT_COUNT_DENORMALIZED=denormalized):
+                Equipment.objects.all().delete()
+                EquipmentCategory.objects.all().delete()
+                self._category_with('A', active=2, inactive=1)
+                self._list()  # อุ่น cache ของ process ก่อนนับ query
+                counts, queries = self._list()
+                self.assertEqual(counts, {'A': 2})
+
+                self._category_with('B', active=0, inactive=2)
+                self._category_with('C', active=3)
+                counts, more_queries = self._list()
+                self.assertEqual(counts, {'A': 2, 'B': 0, 'C': 3})
+                self.assertEqual(more_queries, queries)
+
+    def test_counter_follows_equipment_changes(self):
+        first = self._category_with('A', active=2)
+        second = self._category_with('B', active=0)
+        equipment = Equipment.objects.filter(category=first).first()
+
+        def counts():
+            return dict(EquipmentCategory.objects.values_list('name', 'active_equipment_count'))
+
+        self.assertEqual(counts(), {'A': 2, 'B': 0})
+        equipment.category = second
+        equipment.save()
+        self.assertEqual(counts(), {'A': 1, 'B': 1})
+        equipment.is_active = False
+        equipment.save()
+        self.assertEqual(counts(), {'A': 1, 'B': 0})
+        equipment.is_active = True
+        equipment.save()
+        self.assertEqual(counts(), {'A': 1, 'B': 1})
+        equipment.delete()
+        self.assertEqual(counts(), {'A': 1, 'B': 0})
+
+        # bulk update ข้าม signal: refresh_category_counts คำนวณใหม่ให้ตรง
+        Equipment.objects.filter(category=first).update(category=second)
+        self.assertEqual(counts(), {'A': 1, 'B': 0})
+        refresh_category_counts()
+        self.assertEqual(counts(), {'A': 0, 'B': 1})
+
+
+class KeysetPaginationTests(TestCase):
+    """cursor pagination ต้องไม่ข้ามหรือซ้ำแถว แม้วันที่ของหลายแถวจะเท่ากัน"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', role='admin')
+        requester = make_user('requester')
+        equipment = make_equipment()
+        tied = timezone.now() - timedelta(days=1)
+        RepairRequest.objects.bulk_create(
+            make_requests(requester, equipment, 17, request_date=tied)
+            + make_requests(requester, equipment, 4)
+        )
+        cls.expected = list(
+            RepairRequest.objects.order_by('-request_date', '-id').values_list('id', flat=True)
+        )
+
+    def _get(self, url='/api/repair-requests/', **params):
+        request = APIRequestFactory().get(url, params)
+        force_authenticate(request, self.admin)
+        return RepairRequestViewSet.as_view({'get': 'list'})(request)
+
+    def _page(self, link):
+        # ลิงก์เป็น absolute URL ที่มี cursor และ page_size อยู่ใน query string แล้ว
+        response = self._get(link)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_walks_forward_and_back_over_tied_dates(self):
+        data = self._get(page_size=5).data
+        pages = [[row['id'] for row in data['results']]]
+        self.assertIsNone(data['previous'])
+        self.assertNotIn('count', data)
+        while data['next']:
+            data = self._page(data['next'])
+            pages.append([row['id'] for row in data['results']])
+
+        self.assertEqual([pk for page in pages for pk in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 1])
+
+        # ย้อนกลับด้วย previous ได้หน้าเดิมทุกหน้า
+        for page in reversed(pages[:-1]):
+            data = self._page(data['previous'])
+            self.assertEqual([row['id'] for row in data['results']], page)
+
+    def test_rows_added_between_pages_do_not_shift_the_cursor(self):
+        data = self._get(page_size=10).data
+        RepairRequest.objects.bulk_create(make_requests(
+            User.objects.get(username='requester'), Equipment.objects.get(), 3
+        ))
+        data = self._page(data['next'])
+        self.assertEqual([row['id'] for row in data['results']], self.expected[10:20])
+
+    def test_tampered_cursor_is_rejected(self):
+        data = self._get(page_size=5).data
+        link = data['next'].replace('cursor=', 'cursor=x')
+        self.assertEqual(self._get(link).status_code, 404)
+
+    def test_page_number_still_available(self):
+        data = self._get(page=2).data
+        self.assertEqual(data['count'], len(self.expected))
+        self.assertEqual([row['id'] for row in data['results']], self.expected[10:20])
+
+
+class EquipmentImportTests(TestCase):
+    """นำเข้าอุปกรณ์: batch ละไม่กี่ query, อัพเดทรหัสเดิม และรายงานแถวที่ผิด"""
+
+    HEADER = ['equipment_code', 'name', 'location', 'category', 'condition', 'is_active']
+
+    def _csv(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self.HEADER)
+        writer.writerows(rows)
+        return io.BytesIO(buffer.getvalue().encode('utf-8-sig'))
+
+    def _rows(self, count, start=0, category='คอมพิวเตอร์'):
+        return [
+            [f'IMP-{i:04d}', f'เครื่อง {i}', 'อาคาร 2', category, 'ดี', 'ใช่']
+            for i in range(start, start + count)
+        ]
+
+    def _import(self, rows, **kwargs):
+        """นำเข้าและคืน SQL ที่รัน (importer เรียก reset_queries() ระหว่าง batch
+        จึงใช้ CaptureQueriesContext ไม่ได้)"""
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            summary = import_equipment(self._csv(rows), 'items.csv', **kwargs)
+        return summary, statements
+
+    def test_queries_grow_per_batch_not_per_row(self):
+        EquipmentCategory.objects.create(name='คอมพิวเตอร์')
+        _, small = self._import(self._rows(5), batch_size=5)
+        summary, large = self._import(self._rows(20, start=100), batch_size=5)
+
+        self.assertEqual(summary['imported'], 20)
+        inserts = [sql for sql in large if sql.startswith('INSERT INTO "repair_api_equipment"')]
+        self.assertEqual(len(inserts), 4)
+        # โหลดหมวดหมู่และนับใหม่อย่างละครั้ง ที่เหลือเท่ากันทุก batch ไม่ขึ้นกับจำนวนแถว
+        per_batch = len(small) - 2
+        self.assertEqual(len(large), 4 * per_batch + 2)
+
+    def test_progress_is_reported_after_each_full_batch(self):
+        reported = []
+        import_equipment(
+            self._csv(self._rows(7)), 'items.csv', batch_size=3,
+            progress=lambda summary: reported.append(summary['rows'])
+        )
+        self.assertEqual(reported, [3, 6])
+
+    def test_existing_codes_are_updated_in_place(self):
+        old_category = EquipmentCategory.objects.create(name='เดิม')
+        existing = make_equipment('IMP-0000', category=old_category)
+        self.assertEqual(
+            EquipmentCategory.objects.get(pk=old_category.pk).active_equipment_count, 1
+        )
+
+        rows = self._rows(3) + [['IMP-0002', 'ชื่อใหม่', 'อาคาร 3', 'คอมพิวเตอร์', 'fair', '0']]
+        summary = import_equipment(self._csv(rows), 'items.csv', batch_size=10)
+
+        self.assertEqual(summary['imported'], 3)
+        self.assertEqual(Equipment.objects.count(), 3)
+        updated = Equipment.objects.get(equipment_code='IMP-0000')
+        self.assertEqual(updated.pk, existing.pk)
+        self.assertEqual(updated.name, 'เครื่อง 0')
+        self.assertEqual(updated.category.name, 'คอมพิวเตอร์')
+        # รหัสซ้ำใน batch เดียวกัน ใช้แถวหลังสุด
+        duplicate = Equipment.objects.get(equipment_code='IMP-0002')
+        self.assertEqual((duplicate.name, duplicate.condition, duplicate.is_active),
+                         ('ชื่อใหม่', 'fair', False))
+        # ตัวนับของทั้งหมวดหมู่เดิมและใหม่ถูกคำนวณใหม่
+        self.assertEqual(
+            dict(EquipmentCategory.objects.values_list('name', 'active_equipment_count')),
+            {'เดิม': 0, 'คอมพิวเตอร์': 2},
+        )
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        rows = self._rows(2) + [
+            ['IMP-0100', '', 'อาคาร 2', '', '', ''],
+            ['IMP-0101', 'เครื่อง', 'อาคาร 2', '', 'พัง', ''],
+        ]
+        summary = import_equipment(self._csv(rows), 'items.csv', batch_size=10)
+        self.assertEqual((summary['rows'], summary['imported'], summary['error_count']), (4, 2, 2))
+        self.assertEqual([error['line'] for error in summary['errors']], [4, 5])
+        self.assertFalse(Equipment.objects.filter(equipment_code__startswith='IMP-01').exists())
+
+    def test_rejects_missing_columns_and_unknown_types(self):
+        with self.assertRaisesMessage(ValueError, 'location'):
+            import_equipment(io.BytesIO(b'equipment_code,name\nA,B\n'), 'items.csv')
+        with self.assertRaises(ValueError):
+            import_equipment(io.BytesIO(b''), 'items.txt')
+
+    def test_reads_xlsx(self):
+        import openpyxl
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(self.HEADER + ['purchase_date'])
+        sheet.append(['IMP-X1', 'เครื่อง', 'อาคาร 1', '', 'good', 1, date(2024, 1, 31)])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+
+        summary = EquipmentImporter(batch_size=10).run(buffer, 'items.xlsx')
+        self.assertEqual(summary['imported'], 1)
+        equipment = Equipment.objects.get(equipment_code='IMP-X1')
+        self.assertEqual(equipment.purchase_date, date(2024, 1, 31))
+        self.assertTrue(equipment.is_active)
+
+
+class ReferenceCacheTests(TransactionTestCase):
+    """cache ข้อมูลอ้างอิง: คำนวณครั้งเดียวเมื่อ miss พร้อมกัน และหมดอายุทันทีเมื่อมีการเขียน"""
+
+    MODELS = (EquipmentCategory,)
+
+    def setUp(self):
+        cache.clear()
+        cache_stats.reset()
+
+    def tearDown(self):
+        cache.clear()
+
+    def _outcomes(self, name):
+        counts = cache_stats.snapshot().get(name, {})
+        return {outcome: counts.get(outcome, 0) for outcome in ('hit', 'miss', 'stale', 'wait')}
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.3)
+            return ['ค่าใหม่']
+
+        results = []
+
+        def lookup():
+            try:
+                results.append(cached_reference('stampede', self.MODELS, compute))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [['ค่าใหม่']] * 4)
+        self.assertEqual(self._outcomes('stampede'), {'hit': 0, 'miss': 1, 'stale': 0, 'wait': 3})
+
+    def test_stale_value_is_served_while_another_worker_recomputes(self):
+        cached_reference('categories', self.MODELS, lambda: ['เก่า'])
+        EquipmentCategory.objects.create(name='ใหม่')
+
+        # จำลอง worker อื่นที่ถือ lock ของ version ใหม่อยู่
+        _, _, lock_key = _key('categories', table_versions(self.MODELS), '')
+        cache.add(lock_key, 1)
+        self.assertEqual(cached_reference('categories', self.MODELS, lambda: ['ใหม่']), ['เก่า'])
+
+        cache.delete(lock_key)
+        self.assertEqual(cached_reference('categories', self.MODELS, lambda: ['ใหม่']), ['ใหม่'])
+        self.assertEqual(self._outcomes('categories'), {'hit': 0, 'miss': 2, 'stale': 1, 'wait': 0})
+
+    def test_writes_invalidate_technician_list(self):
+        viewer = make_user('viewer')
+        make_user('tech1', role='technician')
+
+        def usernames():
+            request = APIRequestFactory().get('/api/technicians/')
+            force_authenticate(request, viewer)
+            return sorted(row['username'] for row in technician_list(request).data)
+
+        self.assertEqual(usernames(), ['tech1'])
+        # ไม่มีการเขียน: อ่านจาก cache โดยไม่ query รายชื่อช่างอีก
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(usernames(), ['tech1'])
+        self.assertFalse([q for q in queries if 'repair_api_userprofile' in q['sql']])
+
+        make_user('tech2', role='technician')
+        self.assertEqual(usernames(), ['tech1', 'tech2'])
+        profile = UserProfile.objects.get(user__username='tech1')
+        profile.role = 'user'
+        profile.save()
+        self.assertEqual(usernames(), ['tech2'])
+        self.assertEqual(self._outcomes('technicians'), {'hit': 1, 'miss': 3, 'stale': 0, 'wait': 0})
+
+
+class RepairRequestSerializerTests(TestCase):
+    """รายการไม่มีประวัติ หน้ารายละเอียดมีประวัติทั้งสองตาราง และจำนวน query ไม่ขึ้นกับจำนวนแถว"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', role='admin')
+        cls.technician = make_user('technician', role='technician')
+        cls.requester = make_user('requester')
+        cls.equipment = make_equipment()
+
+    def _get(self, action, user=None, pk=None, **params):
+        request = APIRequestFactory().get('/', params)
+        force_authenticate(request, user or self.admin)
+        view = RepairRequestViewSet.as_view({'get': action})
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request, pk=pk) if pk else view(request)
+            response.render()
+        self.assertEqual(response.status_code, 200)
+        return response.data, len(queries)
+
+    def _add_requests(self, count):
+        created = RepairRequest.objects.bulk_create(make_requests(
+            self.requester, self.equipment, count, status='assigned', assigned_to=self.technician
+        ))
+        RepairHistory.objects.bulk_create([
+            RepairHistory(repair_request=request, updated_by=self.technician, status='assigned')
+            for request in created
+        ])
+        return created
+
+    def test_list_actions_omit_histories_with_constant_queries(self):
+        for action, user in (('list', self.admin), ('my_requests', self.requester),
+                             ('assigned_to_me', self.technician)):
+            with self.subTest(action=action):
+                # เรียกครั้งแรกเพื่ออุ่น cache อ้างอิง ไม่นับ
+                self._add_requests(1)
+                self._get(action, user)
+                counts = []
+                for count in (2, 15):
+                    self._add_requests(count)
+                    data, queries = self._get(action, user, page_size=50)
+                    counts.append(queries)
+                    # ทุก action ผ่าน paginator
+                    self.assertIn('results', data)
+                    self.assertTrue(data['results'])
+                    self.assertNotIn('histories', data['results'][0])
+                    self.assertEqual(data['results'][0]['equipment_code'], 'EQ-001')
+                self.assertEqual(counts[0], counts[1])
+
+    def test_detail_includes_archived_histories_in_one_prefetch(self):
+        repair_request, = self._add_requests(1)
+        base = RepairHistory.objects.get(repair_request=repair_request)
+        RepairHistoryArchive.objects.create(
+            id=base.id + 1000, repair_request=repair_request, updated_by=self.requester,
+            status='pending', created_at=base.created_at - timedelta(days=1)
+        )
+        self._get('retrieve', pk=repair_request.pk)
+        data, queries = self._get('retrieve', pk=repair_request.pk)
+        self.assertEqual([entry['status'] for entry in data['histories']],
+                         ['assigned', 'pending'])
+
+        RepairHistory.objects.bulk_create([
+            RepairHistory(repair_request=repair_request, updated_by=self.admin, status='assigned')
+            for _ in range(10)
+        ])
+        data, more_queries = self._get('retrieve', pk=repair_request.pk)
+        self.assertEqual(len(data['histories']), 12)
+        self.assertEqual(more_queries, queries)
+
+
+class ExportTests(TestCase):
+    """ส่งออก CSV/NDJSON ต้องมีประวัติทั้งสองตาราง เคารพสิทธิ์/ตัวกรอง และ stream ได้ทั้ง WSGI และ ASGI"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.requester = make_user('requester')
+        cls.technician = make_user('technician', role='technician')
+        other = make_user('other')
+        equipment = make_equipment()
+        cls.repaired, cls.pending = RepairRequest.objects.bulk_create(
+            make_requests(cls.requester, equipment, 1, status='completed',
+                          assigned_to=cls.technician)
+            + make_requests(cls.requester, equipment, 1)
+        )
+        RepairRequest.objects.bulk_create(make_requests(other, equipment, 1))
+        history = RepairHistory.objects.create(
+            repair_request=cls.repaired, updated_by=cls.technician, status='completed',
+            comment='เปลี่ยน "ฟิวส์", สายไฟ'
+        )
+        # ประวัติเก่าที่ถูกย้ายไป archive แล้วต้องมาก่อนประวัติในตารางหลัก
+        RepairHistoryArchive.objects.create(
+            id=history.id + 1000, repair_request=cls.repaired, updated_by=cls.technician,
+            status='in_progress', created_at=history.created_at - timedelta(days=1)
+        )
+
+    def _get(self, user=None, **params):
+        request = APIRequestFactory().get('/api/repair-requests/export/', params)
+        force_authenticate(request, user or self.requester)
+        response = RepairRequestViewSet.as_view({'get': 'export'})(request)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_csv_has_one_row_per_history(self):
+        response = self._get()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(
+            response['Content-Disposition'], 'attachment; filename="repair_requests.csv"'
+        )
+        text = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(text.startswith('\ufeff'))
+        rows = list(csv.DictReader(io.StringIO(text.lstrip('\ufeff'))))
+        self.assertEqual(
+            [(row['request_number'], row['history_status']) for row in rows],
+            [(self.repaired.request_number, 'in_progress'),
+             (self.repaired.request_number, 'completed'),
+             (self.pending.request_number, '')]
+        )
+        self.assertEqual(rows[1]['history_comment'], 'เปลี่ยน "ฟิวส์", สายไฟ')
+        self.assertEqual(rows[1]['assigned_to'], 'technician')
+
+    def test_ndjson_nests_histories(self):
+        response = self._get(output='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(
+            [record['request_number'] for record in records],
+            [self.repaired.request_number, self.pending.request_number]
+        )
+        self.assertEqual(
+            [history['history_status'] for history in records[0]['histories']],
+            ['in_progress', 'completed']
+        )
+        self.assertEqual(records[1]['histories'], [])
+
+    def test_filters_and_visibility(self):
+        records = [
+            json.loads(line) for line in b''.join(
+                self._get(output='ndjson', status='pending').streaming_content
+            ).splitlines()
+        ]
+        self.assertEqual([record['request_number'] for record in records],
+                         [self.pending.request_number])
+        # ช่างเห็นงานของตนและงานที่รอรับ แต่ไม่เห็นงานที่ปิดของคนอื่น
+        lines = b''.join(self._get(self.technician, output='ndjson').streaming_content)
+        self.assertEqual(len(lines.splitlines()), RepairRequest.objects.visible_to(
+            self.technician).count())
+
+    def test_gzip_matches_plain_output(self):
+        plain = b''.join(self._get().streaming_content)
+        response = self._get(gzip='1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_async_iterator_under_asgi(self):
+        expected = b''.join(self._get(output='ndjson').streaming_content)
+        request = AsyncRequestFactory().get('/api/repair-requests/export/', {'output': 'ndjson'})
+        force_authenticate(request, self.requester)
+        response = RepairRequestViewSet.as_view({'get': 'export'})(request)
+        self.assertTrue(response.is_async)
+
+        async def read():
+            return [chunk async for chunk in response.streaming_content]
+
+        self.assertEqual(b''.join(async_to_sync(read)()), expected)
+
+
+class TokenRevocationTests(TestCase):
+    """access token ต้องใช้ไม่ได้ทันทีเมื่อบัญชีถูกระงับหรือบทบาทเปลี่ยน ไม่ว่า cache จะแชร์หรือไม่"""
+
+    url = '/api/repair-requests/'
+
+    def setUp(self):
+        self.user = make_user('requester')
+        self.refresh = RoleTokenObtainPairSerializer.get_token(self.user)
+        self.access = self.refresh.access_token
+
+    def _get(self):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def _assert_rejected(self, code):
+        response = self._get()
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], code)
+
+    def _deactivate(self):
+        self.assertEqual(self._get().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self._assert_rejected('user_inactive')
+
+    def _change_role(self):
+        self.assertEqual(self._get().status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = UserProfile.objects.get(user=self.user)
+            profile.role = 'technician'
+            profile.save()
+        self._assert_rejected('token_outdated')
+        # token ใหม่จาก refresh มีบทบาทล่าสุด
+        response = self.client.post(
+            '/api/auth/refresh/', {'refresh': str(self.refresh)}, content_type='application/json'
+        )
+        self.access = response.json()['access']
+        self.assertEqual(AccessToken(self.access)['role'], 'technician')
+        self.assertEqual(self._get().status_code, 200)
+
+    def test_deactivated_user_with_local_cache(self):
+        # cache ของ process: marker ที่ worker อื่นเขียนมองไม่เห็น จึงต้องตรวจกับฐานข้อมูล
+        with self.captureOnCommitCallbacks(execute=False):
+            self.user.is_active = False
+            self.user.save()
+        self._assert_rejected('user_inactive')
+
+    def test_role_change_with_local_cache(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            UserProfile.objects.filter(user=self.user).update(role='admin')
+        self._assert_rejected('token_outdated')
+
+    def test_deleted_user_with_local_cache(self):
+        self.user.delete()
+        self.assertEqual(self._get().status_code, 401)
+
+    def _authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        return RoleJWTAuthentication().authenticate(request)
+
+    def test_auth_query_budget_with_local_cache(self):
+        # query เดียวต่อ token ต่อ AUTH_TOKEN_CHECK_TTL แทนทุก request
+        with query_budget(1, 'first request'):
+            self._authenticate()
+        for _ in range(3):
+            with query_budget(0, 'verified token'):
+                self._authenticate()
+        with mock.patch('repair_api.authentication.time.monotonic',
+                        return_value=time.monotonic() + 60):
+            with query_budget(1, 'after ttl'):
+                self._authenticate()
+
+    @override_settings(AUTH_TOKEN_CHECK_TTL=0)
+    def test_auth_query_budget_with_local_cache_and_no_ttl(self):
+        for _ in range(2):
+            with query_budget(1, 'every request'):
+                self._authenticate()
+
+    def test_auth_query_budget_with_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            for _ in range(2):
+                with query_budget(0, 'marker in shared cache'):
+                    self._authenticate()
+
+    def test_local_cache_revokes_verified_token(self):
+        self._authenticate()
+        # บันทึกใน process นี้: ล้าง token ที่จำไว้ทันที
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+        self._assert_rejected('user_inactive')
+
+    def test_local_cache_sees_other_worker_changes_after_ttl(self):
+        self._authenticate()
+        # worker อื่นเปลี่ยนบทบาท (signal ไม่ได้รันใน process นี้)
+        with self.captureOnCommitCallbacks(execute=False):
+            UserProfile.objects.filter(user=self.user).update(role='admin')
+        self.assertEqual(self._get().status_code, 200)
+        with mock.patch('repair_api.authentication.time.monotonic',
+                        return_value=time.monotonic() + 60):
+            self._assert_rejected('token_outdated')
+
+    def test_token_without_role_claim_loads_role(self):
+        # token ที่ออกก่อนมี claim role ยังใช้ได้ (โหลดผู้ใช้และบทบาทจากฐานข้อมูล)
+        self.access = RefreshToken.for_user(self.user).access_token
+        response = self.client.get('/api/dashboard/stats/',
+                                   HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivated_user_with_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            self._deactivate()
+
+    def test_role_change_with_shared_cache(self):
+        with tempfile.TemporaryDirectory() as location, self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            self._change_role()
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified: 304 เมื่อข้อมูลไม่เปลี่ยน และต้องเปลี่ยนหลังการเขียน (จาก worker ใดก็ได้)"""
+
+    urls = ('/api/repair-requests/', '/api/dashboard/stats/')
+
+    def setUp(self):
+        self.user = make_user('requester')
+        self.equipment = make_equipment()
+        access = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+
+    def _etags(self):
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url, **self.auth)
+            self.assertEqual(response.status_code, 200)
+            etags[url] = response['ETag']
+        return etags
+
+    def _assert_not_modified(self, etags):
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response['ETag'], etag)
+
+    def _assert_modified(self, etags):
+        for url, etag in etags.items():
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified(self):
+        self._assert_not_modified(self._etags())
+
+    def test_modified_after_write(self):
+        etags = self._etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            RepairRequest.objects.bulk_create(make_requests(self.user, self.equipment, 1))
+        self._assert_modified(etags)
+
+    def test_modified_after_write_in_another_worker(self):
+        # cache ของ process ไม่เห็นการเขียนของ worker อื่น มีเพียงแถวใน TableVersion ที่เปลี่ยน
+        etags = self._etags()
+        TableVersion.objects.filter(label=RepairRequest._meta.label_lower).update(
+            version=F('version') + 1
+        )
+        self._assert_modified(etags)
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    """view แบบ async (ASGI) ต้องตอบเหมือน view sync ทั้งเนื้อหา ETag และการยืนยันตัวตน
+
+    TransactionTestCase: acompute_dashboard_stats query ผ่าน connection ของ thread อื่น
+    (in_own_connection) ซึ่งไม่เห็นข้อมูลในทรานแซกชันของ TestCase
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('requester')
+        self.equipment = make_equipment()
+        RepairRequest.objects.bulk_create(make_requests(self.user, self.equipment, 3))
+        access = RoleTokenObtainPairSerializer.get_token(self.user).access_token
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {access}'}
+        self.factory = RequestFactory()
+
+    def _cases(self):
+        pk = RepairRequest.objects.values_list('pk', flat=True).first()
+        return [
+            ('/api/dashboard/stats/', async_views.dashboard_stats, {}),
+            ('/api/technicians/', async_views.technician_list, {}),
+            ('/api/equipment/', async_views.equipment_list, {}),
+            (f'/api/equipment/{self.equipment.pk}/', async_views.equipment_detail,
+             {'pk': self.equipment.pk}),
+            ('/api/repair-requests/', async_views.repair_request_list, {}),
+            (f'/api/repair-requests/{pk}/', async_views.repair_request_detail, {'pk': pk}),
+        ]
+
+    def test_same_response_as_sync_views(self):
+        for url, view, kwargs in self._cases():
+            with self.subTest(url=url):
+                expected = self.client.get(url, **self.auth)
+                # ไม่ให้ view แบบ async ตอบจาก cache ที่ view sync เพิ่งเติมไว้
+                cache.clear()
+                response = async_to_sync(view)(self.factory.get(url, **self.auth), **kwargs)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(json.loads(response.content), expected.json())
+                self.assertEqual(response.get('ETag'), expected.get('ETag'))
+
+    def test_async_dashboard_matches_sync_for_each_role(self):
+        technician = make_user('technician', role='technician')
+        admin = make_user('admin', role='admin')
+        RepairRequest.objects.bulk_create(make_requests(
+            self.user, self.equipment, 2, status='in_progress', assigned_to=technician
+        ))
+        for user, role in ((self.user, 'user'), (technician, 'technician'), (admin, 'admin')):
+            with self.subTest(role=role):
+                cache.clear()
+                with mock.patch(
+                    'repair_api.stats.acompute_dashboard_stats',
+                    wraps=stats.acompute_dashboard_stats
+                ) as compute:
+                    data = async_to_sync(stats.aget_dashboard_stats)(user, role)
+                compute.assert_called_once_with(user, role)
+                cache.clear()
+                expected = stats.get_dashboard_stats(user, role)
+                self.assertEqual(
+                    json.loads(JSONRenderer().render(data)),
+                    json.loads(JSONRenderer().render(expected))
+                )
+
+    def test_requires_authentication(self):
+        for url, view, kwargs in self._cases():
+            with self.subTest(url=url):
+                expected = self.client.get(url)
+                response = async_to_sync(view)(self.factory.get(url), **kwargs)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.get('WWW-Authenticate'), expected.get('WWW-Authenticate'))
+
+class ImageVariantTests(TestCase):
+    """รูปย่อสร้างนอก request และรูปที่สร้างไม่ได้ต้องไม่ถูกส่งเข้าคิวซ้ำ"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _equipment(self, content):
+        equipment = make_equipment()
+        equipment.image.save('photo.jpg', ContentFile(content))
+        return equipment
+
+    def _jobs(self):
+        return Job.objects.filter(name='equipment.process_image').count()
+
+    def _process(self, equipment):
+        process_equipment_image(equipment.pk, equipment.image.name)
+        equipment.refresh_from_db()
+
+    def test_generates_variants(self):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(buffer, 'JPEG')
+        equipment = self._equipment(buffer.getvalue())
+        self.assertEqual(self._jobs(), 1)
+        self._process(equipment)
+        self.assertEqual(set(current_variants(equipment)), {'source', *IMAGE_VARIANTS})
+
+        equipment.name = 'แก้ชื่อ'
+        equipment.save()
+        self.assertEqual(self._jobs(), 1)
+
+    def test_failed_image_is_not_requeued(self):
+        equipment = self._equipment(b'not an image')
+        self.assertEqual(self._jobs(), 1)
+        with self.assertLogs('repair_api.images', 'WARNING'):
+            self._process(equipment)
+        self.assertEqual(equipment.image_variants['source'], equipment.image.name)
+        self.assertIn('error', equipment.image_variants)
+        self.assertIsNone(current_variants(equipment))
+
+        equipment.name = 'แก้ชื่อ'
+        equipment.save()
+        self.assertEqual(self._jobs(), 1)
+
+        # รูปใหม่ถูกส่งประมวลผลอีกครั้ง
+        equipment.image.save('photo2.jpg', ContentFile(b'still not an image'))
+        self.assertEqual(self._jobs(), 2)
+
+
+class JobQueueTests(TransactionTestCase):
+    """คิวงาน: จองงานไม่ซ้ำกัน ลองใหม่แบบ backoff และคืนงานตาม heartbeat ไม่ใช่เวลาเริ่ม"""
+
+    def _enqueue(self, count, name='tests.noop'):
+        return [enqueue(name, {'index': index}) for index in range(count)]
+
+    def test_concurrent_workers_claim_each_job_once(self):
+        self._enqueue(30)
+        claimed, errors = [], []
+
+        def worker(index):
+            try:
+                while jobs := claim_jobs(f'worker-{index}', limit=3):
+                    claimed.extend(job.pk for job in jobs)
+            except Exception as exc:
+                errors.append(repr(exc))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), sorted(Job.objects.values_list('pk', flat=True)))
+
+    def test_skip_locked_claim_is_disjoint(self):
+        # SQLite ไม่มี FOR UPDATE ตรวจเฉพาะเส้นทางโค้ด: worker ถัดไปได้งานที่เหลือตามลำดับ run_at
+        jobs = self._enqueue(3)
+        with mock.patch.object(
+            type(connection.features), 'has_select_for_update_skip_locked', True
+        ):
+            first = claim_jobs('worker-1', limit=2)
+            second = claim_jobs('worker-2', limit=2)
+        self.assertEqual([job.pk for job in first], [job.pk for job in jobs[:2]])
+        self.assertEqual([job.pk for job in second], [jobs[2].pk])
+        self.assertEqual(
+            {job.locked_by for job in Job.objects.all()}, {'worker-1', 'worker-2'}
+        )
+
+    @override_settings(JOB_RETRY_BACKOFF=10, JOB_RETRY_BACKOFF_MAX=60)
+    def test_retry_backoff_then_failed(self):
+        for attempts, low, high in ((1, 5, 10), (3, 20, 40), (10, 30, 60)):
+            with self.subTest(attempts=attempts):
+                delays = [retry_delay(attempts) for _ in range(20)]
+                self.assertTrue(all(low <= delay <= high for delay in delays), delays)
+
+        job = enqueue('tests.fail', max_attempts=2)
+        outcomes = []
+        for _ in range(2):
+            Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+            before = timezone.now()
+            job, = claim_jobs('worker-1')
+            with self.assertLogs('repair_api.jobs', 'WARNING'):
+                outcomes.append(run_job(job))
+            job.refresh_from_db()
+            if job.status == 'queued':
+                self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertEqual(outcomes, ['retried', 'failed'])
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('failed', 2, ''))
+        self.assertIn('RuntimeError', job.last_error)
+
+    def test_requeue_uses_heartbeat_not_start_time(self):
+        alive, dead, exhausted = self._enqueue(3)
+        Job.objects.filter(pk=exhausted.pk).update(max_attempts=1)
+        claim_jobs('worker-1', limit=3)
+        long_ago = timezone.now() - timedelta(hours=1)
+        Job.objects.update(started_at=long_ago)
+        # งานที่เริ่มนานแล้วแต่ worker ยังส่ง heartbeat อยู่ต้องไม่ถูกคืนไปทำซ้ำ
+        Job.objects.filter(pk__in=[dead.pk, exhausted.pk]).update(heartbeat_at=long_ago)
+
+        self.assertEqual(requeue_stale_jobs(timeout=60), (1, 1))
+        statuses = dict(Job.objects.values_list('pk', 'status'))
+        self.assertEqual(
+            [statuses[job.pk] for job in (alive, dead, exhausted)],
+            ['running', 'queued', 'failed']
+        )
+
+    @override_settings(JOB_HEARTBEAT_INTERVAL=0.02)
+    def test_worker_sends_heartbeats_while_job_runs(self):
+        job, = self._enqueue(1, name='tests.slow')
+        summary = Worker(worker_id='worker-1').run(burst=True)
+        job.refresh_from_db()
+        self.assertEqual(summary['tests.slow']['succeeded'], 1)
+        self.assertEqual(job.status, 'succeeded')
+        self.assertGreater(job.heartbeat_at, job.started_at)
+
+
+@register('tests.noop')
+def _noop_job(index=None):
+    pass
+
+
+@register('tests.fail')
+def _failing_job():
+    raise RuntimeError('ล้มเหลว')
+
+
+@register('tests.slow')
+def _slow_job(index=None):
+    time.sleep(0.2)
+
+
+@override_settings(
+    EVENT_STREAM_HEARTBEAT=0.05, EVENT_STREAM_RECHECK_SECONDS=0.05, EVENT_STREAM_MAX_SECONDS=0.3,
+    EVENT_POLL_SECONDS=0.02,
+)
+class EventStreamTests(TransactionTestCase):
+    """SSE: preflight, ตั๋วใช้ครั้งเดียวแทน token ใน URL ปิด stream เมื่อสิทธิ์ถูกเพิกถอน
+    และรับ event ที่ process อื่นเขียนลงฐานข้อมูล
+
+    TransactionTestCase: การตรวจ token และการอ่าน event ใช้ connection ของ thread อื่น
+    """
+
+    def setUp(self):
+        self.user = make_user('requester')
+        self.access = str(RoleTokenObtainPairSerializer.get_token(self.user).access_token)
+
+    def _stream(self, method='GET', headers=(), query='', on_start=None):
+        """รัน event_stream จนจบ คืน (status, headers, body, เวลาที่ใช้)"""
+        messages = []
+        requests = [{'type': 'http.request', 'body': b''}]
+
+        async def receive():
+            if requests:
+                return requests.pop()
+            # client ไม่ปิด connection เอง
+            await asyncio.Event().wait()
+
+        async def send(message):
+            messages.append(message)
+            if on_start and message['type'] == 'http.response.body' and len(messages) == 2:
+                await sync_to_async(on_start)()
+
+        scope = {
+            'type': 'http', 'method': method, 'path': EVENTS_PATH,
+            'headers': list(headers), 'query_string': query.encode(),
+        }
+        started = time.monotonic()
+        async_to_sync(event_stream)(scope, receive, send)
+        elapsed = time.monotonic() - started
+        start = messages[0]
+        body = b''.join(message.get('body', b'') for message in messages[1:])
+        return start['status'], dict(start['headers']), body, elapsed
+
+    def _bearer(self):
+        return [(b'authorization', f'Bearer {self.access}'.encode())]
+
+    def test_options_preflight(self):
+        status, headers, _, _ = self._stream('OPTIONS', [(b'origin', b'http://localhost:3000')])
+        self.assertEqual(status, 204)
+        self.assertEqual(headers[b'allow'], b'GET, OPTIONS')
+
+    def test_other_methods_not_allowed(self):
+        status, headers, _, _ = self._stream('POST', self._bearer())
+        self.assertEqual(status, 405)
+        self.assertEqual(headers[b'allow'], b'GET, OPTIONS')
+
+    def test_header_token(self):
+        status, headers, body, _ = self._stream(headers=self._bearer())
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'content-type'], b'text/event-stream; charset=utf-8')
+        self.assertIn(b': ping', body)
+
+    def test_ticket_is_single_use(self):
+        response = self.client.post(
+            '/api/events/ticket/', HTTP_AUTHORIZATION=f'Bearer {self.access}'
+        )
+        self.assertEqual(response.status_code, 200)
+        query = f"ticket={response.json()['ticket']}"
+        self.assertEqual(self._stream(query=query)[0], 200)
+        self.assertEqual(self._stream(query=query)[0], 401)
+
+    def test_token_in_query_string_rejected(self):
+        self.assertEqual(self._stream(query=f'token={self.access}')[0], 401)
+
+    @override_settings(EVENT_STREAM_MAX_SECONDS=30)
+    def test_stream_closes_when_user_deactivated(self):
+        def deactivate():
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        status, _, _, elapsed = self._stream(headers=self._bearer(), on_start=deactivate)
+        self.assertEqual(status, 200)
+        self.assertLess(elapsed, 5)
+
+    def _publish(self, request_number, requester=None):
+        # broker แยกอีกตัว แทน process ของ API ที่เขียนข้อมูล
+        return DatabaseBroker().publish(repair_request_event(
+            'created', 1, request_number, None, (requester or self.user.pk, None, 'pending')
+        ))
+
+    def test_receives_events_published_by_another_process(self):
+        other = make_user('other')
+
+        def publish():
+            self._publish('REQ-VISIBLE')
+            self._publish('REQ-HIDDEN', requester=other.pk)
+
+        _, _, body, _ = self._stream(headers=self._bearer(), on_start=publish)
+        self.assertIn('REQ-VISIBLE'.encode(), body)
+        self.assertNotIn(b'REQ-HIDDEN', body)
+
+    def test_event_visibility_matches_queryset(self):
+        technician = make_user('technician', role='technician')
+        other_technician = make_user('other_technician', role='technician')
+        admin = make_user('admin', role='admin')
+        other = make_user('other')
+        equipment = make_equipment()
+        RepairRequest.objects.bulk_create(
+            make_requests(self.user, equipment, 1)
+            + make_requests(other, equipment, 1)
+            + make_requests(other, equipment, 1, status='assigned', assigned_to=technician)
+            + make_requests(self.user, equipment, 1, status='completed',
+                            assigned_to=other_technician)
+        )
+        for user, role in ((self.user, 'user'), (technician, 'technician'), (admin, 'admin')):
+            user.role = role
+            visible = set(RepairRequest.objects.visible_to(user).values_list('pk', flat=True))
+            for repair_request in RepairRequest.objects.all():
+                with self.subTest(role=role, request=repair_request.pk):
+                    key = repair_request.rollup_key()
+                    event = repair_request_event('updated', repair_request.pk, '', None, key)
+                    self.assertEqual(
+                        visible_to(event, user.pk, role), repair_request.pk in visible
+                    )
+        # ช่างได้รับ event เมื่องาน pending ที่เคยเห็นถูกช่างคนอื่นรับไป
+        event = repair_request_event(
+            'updated', 1, '', (other.pk, None, 'pending'),
+            (other.pk, other_technician.pk, 'assigned')
+        )
+        self.assertTrue(visible_to(event, technician.pk, 'technician'))
+        self.assertFalse(visible_to(event, self.user.pk, 'user'))
+
+    def test_last_event_id_replays_missed_events(self):
+        first = self._publish('REQ-SEEN')
+        self._publish('REQ-MISSED')
+        _, _, body, _ = self._stream(
+            headers=[*self._bearer(), (b'last-event-id', first['event_id'].encode())]
+        )
+        self.assertIn(b'REQ-MISSED', body)
+        self.assertNotIn(b'REQ-SEEN', body)
+
+
+class MetricsTests(TestCase):
+    """/metrics ต้องไม่เปิดให้อ่านโดยไม่มี token บน production และนับ query ของ request ครั้งเดียว"""
+
+    url = '/metrics'
+
+    @override_settings(DEBUG=False, METRICS_TOKEN='')
+    def test_requires_token_unless_debug(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_one_query_collection_per_request(self):
+        user = make_user('requester')
+        access = RoleTokenObtainPairSerializer.get_token(user).access_token
+        with mock.patch.object(querystats, 'collect', wraps=querystats.collect) as collect:
+            response = self.client.get(
+                '/api/repair-requests/', HTTP_AUTHORIZATION=f'Bearer {access}'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(collect.call_count, 1)
+
+
+@override_settings(HEALTH_CHECK_TIMEOUT=0.2, HEALTH_CHECK_CACHE_SECONDS=0)
+class HealthProbeTests(TransactionTestCase):
+    """liveness ไม่มี I/O, readiness ตอบ 503 เมื่อการตรวจล้มเหลวหรือเกินเวลา"""
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def _ready(self, checks):
+        with mock.patch('repair_api.health.readiness_probe', ReadinessProbe(checks)):
+            return self.client.get('/health/ready/')
+
+    def test_liveness_does_not_touch_the_database(self):
+        with self.assertNumQueries(0):
+            response = self.client.get('/health/live/')
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+    def test_ready_when_every_check_passes(self):
+        response = self._ready(CHECKS)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertEqual(set(data['checks']), {'database', 'migrations', 'cache', 'storage'})
+        self.assertTrue(all(check['ok'] for check in data['checks'].values()))
+
+    def test_database_failure_returns_503_without_details(self):
+        def broken_database():
+            raise OperationalError('could not connect to server at db.internal:5432')
+
+        with self.assertLogs('repair_api.health', 'WARNING'), \
+                self.assertLogs('django.request', 'ERROR'):
+            response = self._ready({**CHECKS, 'database': broken_database})
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['status'], 'unavailable')
+        self.assertEqual(data['checks']['database'], {'ok': False, 'error': 'OperationalError'})
+        self.assertTrue(data['checks']['cache']['ok'])
+        self.assertNotIn(b'db.internal', response.content)
+
+    def test_hung_check_times_out_and_is_not_resubmitted(self):
+        release = threading.Event()
+        calls = []
+
+        def hung_database():
+            calls.append(1)
+            release.wait(5)
+
+        probe = ReadinessProbe({'database': hung_database})
+        # 503 ถูก log โดย django.request
+        with mock.patch('repair_api.health.readiness_probe', probe), \
+                self.assertLogs('django.request', 'ERROR'):
+            started = time.monotonic()
+            response = self.client.get('/health/ready/')
+            self.assertLess(time.monotonic() - started, 2)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['checks']['database'], {'ok': False, 'error': 'timeout'})
+
+            response = self.client.get('/health/ready/')
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['checks']['database']['error'],
+                             'previous check still running')
+            self.assertEqual(len(calls), 1)
+
+            release.set()
+            probe._running['database'].result(timeout=5)
+            self.assertEqual(self.client.get('/health/ready/').status_code, 200)
+        self.assertEqual(len(calls), 2)
+
+    @override_settings(HEALTH_CHECK_CACHE_SECONDS=60)
+    def test_results_are_reused_within_cache_window(self):
+        calls = []
+        probe = ReadinessProbe({'database': lambda: calls.append(1)})
+        with mock.patch('repair_api.health.readiness_probe', probe):
+            for _ in range(3):
+                self.assertEqual(self.client.get('/health/ready/').status_code, 200)
+        self.assertEqual(len(calls), 1)
@@ -1,6 +1,7 @@
 """
 URL configuration for repair_api app
 """
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
@@ -11,13 +12,30 @@ from rest_framework_simplejwt.views import (
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-# สร้าง router สำหรับ ViewSets (ถ้ามี)
-router = DefaultRouter()
+from . import async_views
+from .views import (
+    RegisterView,
+    UserProfileViewSet,
+    EquipmentCategoryViewSet,
+    EquipmentViewSet,
+    RepairRequestViewSet,
+    dashboard_stats,
+    technician_list,
+    event_ticket,
+    cache_stats,
+    job_stats,
+    query_stats,
+    analytics_categories,
+    analytics_technicians,
+)
 
-# ถ้ามี ViewSets ให้ register ที่นี่
-# ตัวอย่าง:
-# from .views import RepairViewSet
-# router.register(r'repairs', RepairViewSet, basename='repair')
+# สร้าง router สำหรับ ViewSets
+router = DefaultRouter()
+router.register(r'auth', RegisterView, basename='auth')
+router.register(r'profiles', UserProfileViewSet, basename='profile')
+router.register(r'categories', EquipmentCategoryViewSet, basename='category')
+router.register(r'equipment', EquipmentViewSet, basename='equipment')
+router.register(r'repair-requests', RepairRequestViewSet, basename='repair-request')
 
 # API Info view
 @csrf_exempt
@@ -35,6 +53,23 @@ def api_root(request):
         }
     })
 
+# ภายใต้ ASGI ให้ endpoint อ่านข้อมูลที่ถูกเรียกบ่อยใช้ view แบบ async (repair_api.async_views)
+# path เดียวกับ router จึงต้องอยู่ก่อน router (<int:pk> ไม่ทับ action เช่น my_requests/)
+if settings.ASYNC_READ_VIEWS:
+    read_urlpatterns = [
+        path('dashboard/stats/', async_views.dashboard_stats, name='dashboard-stats'),
+        path('technicians/', async_views.technician_list, name='technician-list'),
+        path('equipment/', async_views.equipment_list),
+        path('equipment/<int:pk>/', async_views.equipment_detail),
+        path('repair-requests/', async_views.repair_request_list),
+        path('repair-requests/<int:pk>/', async_views.repair_request_detail),
+    ]
+else:
+    read_urlpatterns = [
+        path('dashboard/stats/', dashboard_stats, name='dashboard-stats'),
+        path('technicians/', technician_list, name='technician-list'),
+    ]
+
 urlpatterns = [
     # API Root
     path('', api_root, name='api-root'),
@@ -44,6 +79,14 @@ urlpatterns = [
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/verify/', TokenVerifyView.as_view(), name='token_verify'),
     
+    *read_urlpatterns,
+    path('events/ticket/', event_ticket, name='event-ticket'),
+    path('cache/stats/', cache_stats, name='cache-stats'),
+    path('jobs/stats/', job_stats, name='job-stats'),
+    path('queries/stats/', query_stats, name='query-stats'),
+    path('analytics/categories/', analytics_categories, name='analytics-categories'),
+    path('analytics/technicians/', analytics_technicians, name='analytics-technicians'),
+    
     # Router URLs (ViewSets)
     path('', include(router.urls)),
     
@@ -2,19 +2,31 @@
 
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, Count
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Q, Count, Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import datetime, timedelta
+import os
 
 from .models import (
+    DailyCategoryStats,
+    DailyTechnicianStats,
     EquipmentCategory,
     Equipment,
     RepairRequest,
     RepairHistory,
-    UserProfile
+    RepairHistoryArchive,
+    UserProfile,
+    get_user_role
 )
 from .serializers import (
     UserSerializer,
@@ -22,12 +34,66 @@ from .serializers import (
     RegisterSerializer,
     EquipmentCategorySerializer,
     EquipmentSerializer,
+    RepairRequestListSerializer,
     RepairRequestSerializer,
     RepairRequestCreateSerializer,
     RepairRequestUpdateSerializer,
     RepairHistorySerializer,
+    RepairRequestBulkSerializer,
     DashboardStatsSerializer
 )
+from .analytics import PERIODS, category_report, technician_report
+from .bulk import bulk_update_requests
+from .cache import cached_reference, stats as reference_cache_stats
+from .conditional import ConditionalGetMixin, conditional_get
+from .export import EXPORT_FORMATS, async_chunks, export_filename, stream_export
+from .importer import import_equipment
+from .jobs import queue_stats
+from .pagination import (
+    EquipmentKeysetPagination,
+    KeysetPaginationMixin,
+    RepairRequestKeysetPagination,
+)
+from .querystats import view_stats as view_query_stats
+from .search import search_queryset
+from .sse import issue_ticket
+from .stats import get_dashboard_stats
+
+
+# ตารางที่ response ขึ้นอยู่ (ETag) และ cache ข้อมูลอ้างอิง (ชื่อ, ตาราง)
+# ใช้ร่วมกับ view แบบ async (repair_api.async_views) ทั้งสองทางจึงได้ผลเดียวกันเสมอ
+DASHBOARD_ETAG_MODELS = (RepairRequest, RepairHistory, Equipment)
+TECHNICIANS_CACHE = ('technicians', (UserProfile, User))
+EQUIPMENT_CACHE = ('equipment', (Equipment, EquipmentCategory))
+
+
+def technicians_queryset():
+    return UserProfile.objects.filter(role__in=['technician', 'admin']).select_related('user')
+
+
+def technician_data(profile):
+    """ข้อมูลช่างหนึ่งคนใน response ของ technician_list"""
+    return {
+        'id': profile.user.id,
+        'username': profile.user.username,
+        'full_name': profile.user.get_full_name() or profile.user.username,
+        'department': profile.department,
+        'role': profile.role
+    }
+
+
+def histories_prefetch():
+    """prefetch ประวัติพร้อมผู้อัพเดท จากตารางหลักและตาราง archive (สำหรับหน้ารายละเอียดคำร้อง)
+
+    ใช้คู่กับ RepairRequest.history_entries ซึ่งรวมผลทั้งสองตาราง
+    """
+    return (
+        Prefetch('histories', queryset=RepairHistory.objects.select_related('updated_by')),
+        Prefetch(
+            'archived_histories',
+            queryset=RepairHistoryArchive.objects.select_related('updated_by')
+        ),
+    )
 
 
 class RegisterView(viewsets.GenericViewSet):
@@ -63,7 +129,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def me(self, request):
         """ดูโปรไฟล์ของตัวเอง"""
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = UserProfile.objects.get(user_id=request.user.id)
             serializer = self.get_serializer(profile)
             return Response(serializer.data)
         except UserProfile.DoesNotExist:
@@ -76,7 +142,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def update_profile(self, request):
         """แก้ไขโปรไฟล์ของตัวเอง"""
         try:
-            profile = UserProfile.objects.get(user=request.user)
+            profile = UserProfile.objects.get(user_id=request.user.id)
             serializer = self.get_serializer(profile, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
@@ -89,25 +155,46 @@ class UserProfileViewSet(viewsets.ModelViewSet):
             )
 
 
-class EquipmentCategoryViewSet(viewsets.ModelViewSet):
+class EquipmentCategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """API สำหรับจัดการหมวดหมู่อุปกรณ์"""
     queryset = EquipmentCategory.objects.all()
     serializer_class = EquipmentCategorySerializer
     permission_classes = [IsAuthenticated]
+    etag_models = (EquipmentCategory, Equipment)
 
     def get_queryset(self):
         queryset = super().get_queryset()
         search = self.request.query_params.get('search', None)
         if search:
             queryset = queryset.filter(name__icontains=search)
+        
+        # นับอุปกรณ์ที่ใช้งานอยู่ใน query เดียวกัน แทนการนับทีละหมวดหมู่
+        if not settings.EQUIPMENT_COUNT_DENORMALIZED:
+            # (Meta.ordering ไม่ถูกใช้กับ query ที่มี GROUP BY จึงต้องระบุเอง)
+            queryset = queryset.annotate(
+                annotated_equipment_count=Count(
+                    'equipments', filter=Q(equipments__is_active=True)
+                )
+            ).order_by(*EquipmentCategory._meta.ordering)
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        # ข้อมูลไม่ขึ้นกับผู้ใช้ cache ตาม URL จนกว่าหมวดหมู่/อุปกรณ์จะถูกแก้ไข
+        data = cached_reference(
+            'categories', (EquipmentCategory, Equipment),
+            lambda: super(EquipmentCategoryViewSet, self).list(request, *args, **kwargs).data,
+            variant=request.build_absolute_uri()
+        )
+        return Response(data)
 
-class EquipmentViewSet(viewsets.ModelViewSet):
+
+class EquipmentViewSet(ConditionalGetMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     """API สำหรับจัดการอุปกรณ์"""
     queryset = Equipment.objects.all()
     serializer_class = EquipmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = EquipmentKeysetPagination
+    etag_models = (Equipment, EquipmentCategory)
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -122,53 +209,87 @@ class EquipmentViewSet(viewsets.ModelViewSet):
         if is_active is not None:
             queryset = queryset.filter(is_active=is_active.lower() == 'true')
         
-        # Search
+        # Search (ใช้ full-text index และเรียงตามความเกี่ยวข้อง)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(equipment_code__icontains=search) |
-                Q(name__icontains=search) |
-                Q(location__icontains=search)
-            )
+            queryset = search_queryset(queryset, search)
         
-        return queryset
+        return queryset.select_related('category')
+
+    def retrieve(self, request, *args, **kwargs):
+        data = cached_reference(
+            *EQUIPMENT_CACHE,
+            lambda: super(EquipmentViewSet, self).retrieve(request, *args, **kwargs).data,
+            variant=str(kwargs[self.lookup_field])
+        )
+        return Response(data)
 
     @action(detail=False, methods=['get'])
     def available(self, request):
         """ดูอุปกรณ์ที่พร้อมใช้งาน"""
-        equipments = self.queryset.filter(is_active=True)
-        serializer = self.get_serializer(equipments, many=True)
-        return Response(serializer.data)
+        def compute():
+            equipments = self.queryset.filter(is_active=True).select_related('category')
+            page = self.paginate_queryset(equipments)
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data).data
+
+        data = cached_reference(
+            'available_equipment', (Equipment, EquipmentCategory), compute,
+            variant=request.build_absolute_uri()
+        )
+        return Response(data)
 
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        """นำเข้าอุปกรณ์จากไฟล์ CSV/XLSX (เฉพาะผู้ดูแลระบบ)"""
+        if get_user_role(request.user) != 'admin':
+            return Response(
+                {'error': 'เฉพาะผู้ดูแลระบบเท่านั้น'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'กรุณาแนบไฟล์'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # ไฟล์ขนาดใหญ่ถูกเก็บเป็นไฟล์ชั่วคราวบนดิสก์ และอ่านทีละแถว
+        try:
+            summary = import_equipment(upload.file, upload.name)
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(summary)
 
-class RepairRequestViewSet(viewsets.ModelViewSet):
+
+class RepairRequestViewSet(ConditionalGetMixin, KeysetPaginationMixin, viewsets.ModelViewSet):
     """API สำหรับจัดการคำร้องขอซ่อม"""
     queryset = RepairRequest.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = RepairRequestKeysetPagination
+    # response มีชื่ออุปกรณ์ ชื่อผู้แจ้ง/ช่าง และประวัติ จึงขึ้นกับตารางเหล่านี้ด้วย
+    etag_models = (RepairRequest, RepairHistory, Equipment, User)
+    list_actions = ['list', 'my_requests', 'assigned_to_me']
 
     def get_serializer_class(self):
         if self.action == 'create':
             return RepairRequestCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return RepairRequestUpdateSerializer
+        elif self.action in self.list_actions:
+            return RepairRequestListSerializer
         return RepairRequestSerializer
 
+    def _list_response(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     def get_queryset(self):
-        queryset = super().get_queryset()
-        user = self.request.user
-        
-        # ถ้าเป็นผู้ใช้ทั่วไป ให้เห็นเฉพาะคำร้องของตัวเอง
-        try:
-            profile = UserProfile.objects.get(user=user)
-            if profile.role == 'user':
-                queryset = queryset.filter(requester=user)
-            elif profile.role == 'technician':
-                # ช่างเห็นงานที่ได้รับมอบหมายและงานที่รอรับ
-                queryset = queryset.filter(
-                    Q(assigned_to=user) | Q(status='pending')
-                )
-        except UserProfile.DoesNotExist:
-            queryset = queryset.filter(requester=user)
+        # กรองตามบทบาท (ผู้ใช้เห็นคำร้องของตัวเอง ช่างเห็นงานของตนและงานที่รอรับ)
+        queryset = super().get_queryset().visible_to(self.request.user)
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -185,30 +306,31 @@ class RepairRequestViewSet(viewsets.ModelViewSet):
         if equipment:
             queryset = queryset.filter(equipment_id=equipment)
         
-        # Search
+        # Search (ใช้ full-text index และเรียงตามความเกี่ยวข้อง)
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(request_number__icontains=search) |
-                Q(title__icontains=search) |
-                Q(description__icontains=search)
-            )
+            queryset = search_queryset(queryset, search)
         
-        return queryset.select_related('equipment', 'requester', 'assigned_to')
+        queryset = queryset.select_related('equipment', 'requester', 'assigned_to')
+        if self.action in ('retrieve', 'history'):
+            queryset = queryset.prefetch_related(*histories_prefetch())
+        return queryset
 
     @action(detail=False, methods=['get'])
     def my_requests(self, request):
         """ดูคำร้องของตัวเอง"""
-        requests = self.queryset.filter(requester=request.user)
-        serializer = self.get_serializer(requests, many=True)
-        return Response(serializer.data)
+        requests = self.queryset.filter(requester_id=request.user.id).select_related(
+            'equipment', 'requester', 'assigned_to'
+        )
+        return self._list_response(requests)
 
     @action(detail=False, methods=['get'])
     def assigned_to_me(self, request):
         """ดูงานที่ได้รับมอบหมาย"""
-        requests = self.queryset.filter(assigned_to=request.user)
-        serializer = self.get_serializer(requests, many=True)
-        return Response(serializer.data)
+        requests = self.queryset.filter(assigned_to_id=request.user.id).select_related(
+            'equipment', 'requester', 'assigned_to'
+        )
+        return self._list_response(requests)
 
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
@@ -230,16 +352,18 @@ class RepairRequestViewSet(viewsets.ModelViewSet):
             repair_request.status = 'assigned'
             from django.utils import timezone
             repair_request.assigned_date = timezone.now()
-            repair_request.save()
             
-            # บันทึกประวัติ
-            RepairHistory.objects.create(
-                repair_request=repair_request,
-                updated_by=request.user,
-                status='assigned',
-                comment=f'มอบหมายงานให้ {technician.get_full_name()}'
-            )
+            # บันทึกคำร้อง ตัวนับสถานะ และประวัติใน transaction เดียวกัน
+            with transaction.atomic():
+                repair_request.save()
+                RepairHistory.objects.create(
+                    repair_request=repair_request,
+                    updated_by_id=request.user.id,
+                    status='assigned',
+                    comment=f'มอบหมายงานให้ {technician.get_full_name()}'
+                )
             
+            prefetch_related_objects([repair_request], *histories_prefetch())
             serializer = self.get_serializer(repair_request)
             return Response(serializer.data)
             
@@ -273,25 +397,74 @@ class RepairRequestViewSet(viewsets.ModelViewSet):
         if new_status == 'completed':
             repair_request.completed_date = timezone.now()
         
-        repair_request.save()
-        
-        # บันทึกประวัติ
-        RepairHistory.objects.create(
-            repair_request=repair_request,
-            updated_by=request.user,
-            status=new_status,
-            comment=comment
-        )
+        # บันทึกคำร้อง ตัวนับสถานะ และประวัติใน transaction เดียวกัน
+        with transaction.atomic():
+            repair_request.save()
+            RepairHistory.objects.create(
+                repair_request=repair_request,
+                updated_by_id=request.user.id,
+                status=new_status,
+                comment=comment
+            )
         
+        prefetch_related_objects([repair_request], *histories_prefetch())
         serializer = self.get_serializer(repair_request)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """ส่งออกคำร้องพร้อมประวัติ (?output=csv|ndjson&gzip=1) ตามสิทธิ์และตัวกรองเดียวกับรายการ"""
+        export_format = request.query_params.get('output', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {'error': 'รูปแบบไม่ถูกต้อง (csv หรือ ndjson)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        gzip = request.query_params.get('gzip') in ('1', 'true')
+        
+        chunks = stream_export(self.get_queryset(), export_format, gzip=gzip)
+        if isinstance(request._request, ASGIRequest):
+            # ให้ ASGI ส่งทีละก้อนแทนการรวมทั้งไฟล์ไว้ในหน่วยความจำ
+            chunks = async_chunks(chunks)
+        response = StreamingHttpResponse(
+            chunks,
+            content_type='application/gzip' if gzip else EXPORT_FORMATS[export_format][0]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{export_filename(export_format, gzip)}"'
+        )
+        return response
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """มอบหมายงาน เปลี่ยนสถานะ หรือยกเลิกคำร้องหลายรายการพร้อมกัน"""
+        serializer = RepairRequestBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        # แถวที่แก้ไขไม่ได้จะถูกรายงานใน errors ส่วนแถวที่เหลือบันทึกใน transaction เดียว
+        updated, errors = bulk_update_requests(
+            self.get_queryset(),
+            data['ids'],
+            request.user,
+            data['action'],
+            status=data.get('status'),
+            assigned_to=data.get('technician'),
+            comment=data['comment']
+        )
+        return Response({
+            'updated': updated,
+            'updated_count': len(updated),
+            'errors': errors
+        })
+
     @action(detail=True, methods=['get'])
     def history(self, request, pk=None):
         """ดูประวัติการอัพเดท"""
         repair_request = self.get_object()
-        histories = RepairHistory.objects.filter(repair_request=repair_request)
-        serializer = RepairHistorySerializer(histories, many=True)
+        # รวมประวัติที่ถูกย้ายไปตาราง archive (repair_api.archive)
+        serializer = RepairHistorySerializer(repair_request.history_entries(), many=True)
         return Response(serializer.data)
 
 
@@ -299,88 +472,161 @@ class RepairRequestViewSet(viewsets.ModelViewSet):
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
     """API สำหรับแสดงสถิติในแดชบอร์ด"""
-    user = request.user
-    
-    try:
-        profile = UserProfile.objects.get(user=user)
-        
-        if profile.role == 'user':
-            # สถิติของผู้ใช้ทั่วไป
-            total_requests = RepairRequest.objects.filter(requester=user).count()
-            pending = RepairRequest.objects.filter(requester=user, status='pending').count()
-            in_progress = RepairRequest.objects.filter(
-                requester=user, 
-                status__in=['assigned', 'in_progress']
-            ).count()
-            completed = RepairRequest.objects.filter(requester=user, status='completed').count()
-            recent = RepairRequest.objects.filter(requester=user).order_by('-created_at')[:5]
-            
-        elif profile.role == 'technician':
-            # สถิติของช่างซ่อม
-            total_requests = RepairRequest.objects.filter(assigned_to=user).count()
-            pending = RepairRequest.objects.filter(status='pending').count()
-            in_progress = RepairRequest.objects.filter(
-                assigned_to=user, 
-                status='in_progress'
-            ).count()
-            completed = RepairRequest.objects.filter(
-                assigned_to=user, 
-                status='completed'
-            ).count()
-            recent = RepairRequest.objects.filter(
-                Q(assigned_to=user) | Q(status='pending')
-            ).order_by('-created_at')[:5]
-            
-        else:  # admin
-            # สถิติทั้งหมด
-            total_requests = RepairRequest.objects.count()
-            pending = RepairRequest.objects.filter(status='pending').count()
-            in_progress = RepairRequest.objects.filter(
-                status__in=['assigned', 'in_progress']
-            ).count()
-            completed = RepairRequest.objects.filter(status='completed').count()
-            recent = RepairRequest.objects.order_by('-created_at')[:5]
-        
-        # สถิติอุปกรณ์
-        total_equipment = Equipment.objects.count()
-        active_equipment = Equipment.objects.filter(is_active=True).count()
-        
-        data = {
-            'total_requests': total_requests,
-            'pending_requests': pending,
-            'in_progress_requests': in_progress,
-            'completed_requests': completed,
-            'total_equipment': total_equipment,
-            'active_equipment': active_equipment,
-            'recent_requests': RepairRequestSerializer(recent, many=True).data
-        }
-        
-        return Response(data)
-        
-    except UserProfile.DoesNotExist:
+    # บทบาทมาจาก claim ใน access token (ไม่ต้อง query UserProfile)
+    role = get_user_role(request.user)
+    if role is None:
         return Response(
             {'error': 'ไม่พบโปรไฟล์ผู้ใช้'},
             status=status.HTTP_404_NOT_FOUND
         )
 
+    # ข้อมูลไม่เปลี่ยนตั้งแต่ครั้งก่อน ตอบ 304 โดยไม่ต้องคำนวณ/serialize
+    not_modified, patch_headers = conditional_get(request, DASHBOARD_ETAG_MODELS)
+    if not_modified is not None:
+        return not_modified
+
+    # ตัวนับของแต่ละบทบาทคำนวณด้วย query เดียวและ cache ไว้ช่วงสั้น ๆ
+    return patch_headers(Response(get_dashboard_stats(request.user, role)))
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def technician_list(request):
     """API สำหรับดูรายชื่อช่างซ่อม"""
-    technicians = UserProfile.objects.filter(
-        role__in=['technician', 'admin']
-    ).select_related('user')
+    def compute():
+        return [technician_data(profile) for profile in technicians_queryset()]
+
+    # cache ไว้จนกว่าผู้ใช้/โปรไฟล์จะถูกแก้ไข (signal เปลี่ยน version ของตาราง)
+    data = cached_reference(*TECHNICIANS_CACHE, compute)
+    
+    return Response(data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def event_ticket(request):
+    """ตั๋วใช้ครั้งเดียวสำหรับเปิด /api/events/?ticket= ด้วย EventSource ของ browser
+
+    (EventSource ตั้ง header Authorization เองไม่ได้ และไม่ควรใส่ access token ใน URL)
+    """
+    return Response({
+        'ticket': issue_ticket(str(request.auth)),
+        'expires_in': settings.EVENT_TICKET_SECONDS,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def cache_stats(request):
+    """API สำหรับดูสถิติ hit/miss ของ cache ข้อมูลอ้างอิง (เฉพาะผู้ดูแลระบบ)"""
+    if get_user_role(request.user) != 'admin':
+        return Response(
+            {'error': 'เฉพาะผู้ดูแลระบบเท่านั้น'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    
+    # ตัวนับเก็บแยกต่อ process (worker) ที่ตอบ request นี้
+    return Response({
+        'pid': os.getpid(),
+        'backend': settings.CACHES['default']['BACKEND'],
+        'caches': reference_cache_stats.snapshot(),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def job_stats(request):
+    """API สำหรับดูสถานะคิวงานเบื้องหลัง (เฉพาะผู้ดูแลระบบ)"""
+    if get_user_role(request.user) != 'admin':
+        return Response(
+            {'error': 'เฉพาะผู้ดูแลระบบเท่านั้น'},
+            status=status.HTTP_403_FORBIDDEN
+        )
     
-    data = [
-        {
-            'id': profile.user.id,
-            'username': profile.user.username,
-            'full_name': profile.user.get_full_name() or profile.user.username,
-            'department': profile.department,
-            'role': profile.role
-        }
-        for profile in technicians
-    ]
+    return Response(queue_stats())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def query_stats(request):
+    """API สำหรับดูจำนวน query และเวลาในฐานข้อมูลสะสมต่อ view (เฉพาะผู้ดูแลระบบ)"""
+    if get_user_role(request.user) != 'admin':
+        return Response(
+            {'error': 'เฉพาะผู้ดูแลระบบเท่านั้น'},
+            status=status.HTTP_403_FORBIDDEN
+        )
     
-    return Response(data)
\ No newline at end of file
+    # สถิติเก็บแยกต่อ process (worker) ที่ตอบ request นี้
+    return Response({
+        'pid': os.getpid(),
+        'enabled': settings.QUERY_INSTRUMENTATION,
+        'views': view_query_stats.snapshot(),
+    })
+
+
+def _analytics_params(request):
+    """(start, end, period) จาก query string ค่าเริ่มต้นคือ 12 เดือนล่าสุด รายเดือน"""
+    end = request.query_params.get('end')
+    start = request.query_params.get('start')
+    period = request.query_params.get('period', 'month')
+    try:
+        end = parse_date(end) if end else timezone.localdate()
+        start = parse_date(start) if start else end - timedelta(days=365)
+    except ValueError:
+        end = start = None
+    if start is None or end is None:
+        raise ValueError('รูปแบบวันที่ต้องเป็น YYYY-MM-DD')
+    if start > end:
+        raise ValueError('start ต้องไม่อยู่หลัง end')
+    if period not in PERIODS:
+        raise ValueError(f'period ต้องเป็น {", ".join(PERIODS)}')
+    return start, end, period
+
+
+def _analytics_response(request, name, report, models):
+    if get_user_role(request.user) != 'admin':
+        return Response(
+            {'error': 'เฉพาะผู้ดูแลระบบเท่านั้น'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    try:
+        start, end, period = _analytics_params(request)
+    except ValueError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # อ่านจากตารางสรุปรายวันเท่านั้น cache จนกว่างาน analytics.refresh จะเขียนใหม่
+    results = cached_reference(
+        name, models, lambda: report(start, end, period),
+        variant=f'{start}:{end}:{period}'
+    )
+    return Response({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'period': period,
+        'results': results,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics_categories(request):
+    """API รายงานต่อหมวดหมู่อุปกรณ์: เวลาเฉลี่ยจนมอบหมาย/เสร็จสิ้น และค่าใช้จ่ายประมาณ/จริง
+
+    query: start, end (YYYY-MM-DD), period (day/month/year/total) - เฉพาะผู้ดูแลระบบ
+    """
+    return _analytics_response(
+        request, 'analytics_categories', category_report,
+        (DailyCategoryStats, EquipmentCategory)
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def analytics_technicians(request):
+    """API รายงานผลงานช่าง: จำนวนงานที่ได้รับมอบหมาย/ทำเสร็จ และเวลาเฉลี่ยจนเสร็จสิ้น
+
+    query: start, end (YYYY-MM-DD), period (day/month/year/total) - เฉพาะผู้ดูแลระบบ
+    """
+    return _analytics_response(
+        request, 'analytics_technicians', technician_report, (DailyTechnicianStats, User)
+    )
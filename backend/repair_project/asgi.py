@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'repair_project.settings')
+# endpoint อ่านข้อมูลที่ถูกเรียกบ่อยใช้ view แบบ async เฉพาะเมื่อรันผ่าน ASGI (ตั้ง False เพื่อปิด)
+os.environ.setdefault('ASYNC_READ_VIEWS', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# import หลัง setup ของ Django
+from repair_api.sse import EventStreamApp  # noqa: E402
+
+# /api/events/ (Server-Sent Events) ตอบโดย repair_api.sse ที่เหลือส่งให้ Django
+application = EventStreamApp(django_application)
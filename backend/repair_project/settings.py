@@ -44,7 +44,11 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # รองรับ async (ไม่บังคับให้ view แบบ async ทำงานใน thread ภายใต้ ASGI)
+    'repair_api.middleware.AsyncWhiteNoiseMiddleware',
+    # metrics สำหรับ /metrics และนับ query ต่อ request (ต่อจาก WhiteNoise เพื่อไม่นับไฟล์ static)
+    'repair_api.middleware.MetricsMiddleware',
+    'repair_api.middleware.QueryInstrumentationMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,7 +84,9 @@ if config('DATABASE_URL', default=None):
     DATABASES = {
         'default': dj_database_url.config(
             default=config('DATABASE_URL'),
-            conn_max_age=600,
+            # connection ถาวรสำหรับ WSGI (gunicorn) ถ้ารันผ่าน ASGI ที่ query จากหลาย thread
+            # จนจำนวน connection เกินที่ฐานข้อมูลรับได้ ให้ตั้ง DB_CONN_MAX_AGE=0
+            conn_max_age=config('DB_CONN_MAX_AGE', default=600, cast=int),
             conn_health_checks=True,
         )
     }
@@ -89,6 +95,8 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # ฐานข้อมูลทดสอบเป็นไฟล์ (ไม่ใช่ in-memory) เพื่อให้ test ที่เขียนพร้อมกันหลาย thread รันได้
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
@@ -145,7 +153,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # อ่าน role จาก claim ใน token (ไม่ query User/UserProfile ทุก request)
+        'repair_api.authentication.RoleJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -172,8 +181,121 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_USER_CLASS': 'repair_api.authentication.RoleTokenUser',
+    'TOKEN_OBTAIN_SERIALIZER': 'repair_api.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'repair_api.serializers.RoleTokenRefreshSerializer',
 }
 
+# Cache - ค่าเริ่มต้นเก็บในหน่วยความจำของแต่ละ process (เหมาะกับการพัฒนา/worker เดียว)
+# production ที่รันหลาย worker ควรใช้ backend ที่แชร์กันได้ (Redis แนะนำ) เช่น
+#   CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/var/tmp/repair_cache
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='repair-system'),
+        'TIMEOUT': config('CACHE_TIMEOUT', default=300, cast=int),
+    }
+}
+if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')):
+    # ค่าเริ่มต้นของ Django (300 key) น้อยเกินไปสำหรับ key แบบมี version
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=10000, cast=int),
+    }
+
+# cache ของ process: token ที่ตรวจกับฐานข้อมูลแล้วไม่ต้องตรวจซ้ำภายในกี่วินาที (0 = ตรวจทุก request)
+# การระงับบัญชี/เปลี่ยนบทบาทมีผลกับ worker อื่นภายในเวลานี้ (cache ที่แชร์มีผลทันทีทุก worker)
+AUTH_TOKEN_CHECK_TTL = config('AUTH_TOKEN_CHECK_TTL', default=5, cast=int)
+
+# อายุ cache ของข้อมูลอ้างอิง (รายชื่อช่าง หมวดหมู่ อุปกรณ์) - ถูกล้างทันทีเมื่อมีการแก้ไข
+REFERENCE_CACHE_TTL = config('REFERENCE_CACHE_TTL', default=300, cast=int)
+
+# Dashboard stats cache (วินาที) - ถูกล้างทันทีเมื่อมีการแก้ไขคำร้อง/อุปกรณ์
+DASHBOARD_STATS_CACHE_TTL = config('DASHBOARD_STATS_CACHE_TTL', default=30, cast=int)
+
+# อ่านจำนวนอุปกรณ์ต่อหมวดหมู่จากคอลัมน์ตัวนับแทนการ COUNT
+EQUIPMENT_COUNT_DENORMALIZED = config('EQUIPMENT_COUNT_DENORMALIZED', default=False, cast=bool)
+
+# จำนวนเลขที่คำร้องที่แต่ละ process จองไว้ล่วงหน้า (1 = จองทุกครั้ง เลขไม่ขาดช่วง)
+REQUEST_NUMBER_BLOCK_SIZE = config('REQUEST_NUMBER_BLOCK_SIZE', default=1, cast=int)
+
+# จำนวนคำร้องสูงสุดต่อการเรียก bulk ครั้งเดียว
+REPAIR_REQUEST_BULK_MAX_ITEMS = config('REPAIR_REQUEST_BULK_MAX_ITEMS', default=500, cast=int)
+
+# จำนวนแถวต่อ batch เมื่อนำเข้าอุปกรณ์จากไฟล์ CSV/XLSX
+EQUIPMENT_IMPORT_BATCH_SIZE = config('EQUIPMENT_IMPORT_BATCH_SIZE', default=1000, cast=int)
+
+# จำนวนคำร้องที่อ่านจากฐานข้อมูลต่อครั้งเมื่อส่งออกแบบ streaming
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# คิวงานเบื้องหลัง (repair_api.jobs) - รัน worker ด้วย python manage.py run_jobs
+# JOBS_EAGER=True ทำงานทันทีหลัง commit ใน process เดิม (ไม่ต้องรัน worker)
+JOBS_EAGER = config('JOBS_EAGER', default=False, cast=bool)
+JOB_WORKER_CONCURRENCY = config('JOB_WORKER_CONCURRENCY', default=2, cast=int)
+JOB_MAX_ATTEMPTS = config('JOB_MAX_ATTEMPTS', default=5, cast=int)
+# หน่วงก่อนลองใหม่ (วินาที) เพิ่มเป็นสองเท่าทุกครั้งจนถึงค่าสูงสุด
+JOB_RETRY_BACKOFF = config('JOB_RETRY_BACKOFF', default=10, cast=int)
+JOB_RETRY_BACKOFF_MAX = config('JOB_RETRY_BACKOFF_MAX', default=3600, cast=int)
+# worker ส่ง heartbeat ของงานที่ถืออยู่ทุก JOB_HEARTBEAT_INTERVAL วินาทีระหว่างทำงาน
+# งานที่ไม่มี heartbeat นานกว่า JOB_LOCK_TIMEOUT ถือว่า worker ตาย และถูกคืนเข้าคิว (วินาที)
+JOB_HEARTBEAT_INTERVAL = config('JOB_HEARTBEAT_INTERVAL', default=30, cast=float)
+JOB_LOCK_TIMEOUT = config('JOB_LOCK_TIMEOUT', default=180, cast=int)
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=7, cast=int)
+
+# ย้ายประวัติของคำร้องที่ปิดแล้วนานกว่านี้ (วัน) ไปตาราง archive (คำสั่ง archive_history)
+HISTORY_ARCHIVE_AFTER_DAYS = config('HISTORY_ARCHIVE_AFTER_DAYS', default=180, cast=int)
+HISTORY_ARCHIVE_BATCH_SIZE = config('HISTORY_ARCHIVE_BATCH_SIZE', default=1000, cast=int)
+
+# สรุปรายวันสำหรับรายงาน (repair_api.analytics) - รวมการแก้ไขในช่วงนี้ (วินาที) เป็นงานคำนวณเดียว
+ANALYTICS_REFRESH_DELAY = config('ANALYTICS_REFRESH_DELAY', default=60, cast=int)
+
+# Server-Sent Events (/api/events/ ต้องรันผ่าน ASGI: process events ใน Procfile)
+# DatabaseBroker ส่ง event จาก API (gunicorn) ไปยัง process ของ SSE ผ่านตาราง StreamEvent
+# InProcessBroker ใช้ได้เมื่อ process เดียวทั้งเขียนข้อมูลและเปิด stream
+EVENT_BROKER = config('EVENT_BROKER', default='repair_api.events.DatabaseBroker')
+# process ของ SSE อ่าน event ใหม่จากฐานข้อมูลทุกกี่วินาที (DatabaseBroker)
+EVENT_POLL_SECONDS = config('EVENT_POLL_SECONDS', default=1.0, cast=float)
+EVENT_HISTORY_SIZE = config('EVENT_HISTORY_SIZE', default=1000, cast=int)
+EVENT_QUEUE_SIZE = config('EVENT_QUEUE_SIZE', default=100, cast=int)
+EVENT_STREAM_HEARTBEAT = config('EVENT_STREAM_HEARTBEAT', default=15, cast=int)
+EVENT_STREAM_RETRY_MS = config('EVENT_STREAM_RETRY_MS', default=3000, cast=int)
+EVENT_STREAM_MAX_SECONDS = config('EVENT_STREAM_MAX_SECONDS', default=3600, cast=int)
+# ตรวจ token ของ stream ที่เปิดอยู่ซ้ำทุกกี่วินาที (บัญชีถูกระงับ/บทบาทเปลี่ยน)
+EVENT_STREAM_RECHECK_SECONDS = config('EVENT_STREAM_RECHECK_SECONDS', default=60, cast=float)
+# อายุของตั๋ว ?ticket= สำหรับ EventSource (วินาที)
+EVENT_TICKET_SECONDS = config('EVENT_TICKET_SECONDS', default=30, cast=int)
+
+# ใช้ view แบบ async (async ORM) สำหรับ endpoint อ่านข้อมูลที่ถูกเรียกบ่อย
+# เปิดเองเมื่อรันผ่าน ASGI (repair_project/asgi.py) ผ่าน WSGI (gunicorn/runserver) ปิดไว้
+# เพราะต้องแปลง view แบบ async กลับเป็น sync ทุก request
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=False, cast=bool)
+
+# นับ query ต่อ request (repair_api.middleware.QueryInstrumentationMiddleware)
+# header Server-Timing เปิดเผยเวลาภายในระบบ จึงเปิดเป็นค่าเริ่มต้นเฉพาะ DEBUG
+QUERY_INSTRUMENTATION = config('QUERY_INSTRUMENTATION', default=True, cast=bool)
+QUERY_INSTRUMENTATION_HEADER = config('QUERY_INSTRUMENTATION_HEADER', default=DEBUG, cast=bool)
+# log request ที่เกินเกณฑ์เหล่านี้ (จำนวน query, เวลารวมในฐานข้อมูล ms, query รูปแบบเดียวกันซ้ำ)
+QUERY_COUNT_WARNING = config('QUERY_COUNT_WARNING', default=20, cast=int)
+QUERY_TIME_WARNING_MS = config('QUERY_TIME_WARNING_MS', default=200, cast=int)
+QUERY_DUPLICATE_WARNING = config('QUERY_DUPLICATE_WARNING', default=5, cast=int)
+
+# metrics รูปแบบ Prometheus ที่ /metrics (repair_api.metrics)
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# ต้องส่ง header Authorization: Bearer <token> จึงอ่าน /metrics ได้ (ไม่กำหนด = อ่านได้เฉพาะเมื่อ DEBUG=True)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+# รันหลาย worker process: โฟลเดอร์ที่ทุก worker เขียนค่า metrics ร่วมกัน (ต้องล้างก่อนเริ่ม server)
+# ตั้งใน environment ก่อน import prometheus_client เพราะ library อ่านค่านี้จาก os.environ
+PROMETHEUS_MULTIPROC_DIR = config('PROMETHEUS_MULTIPROC_DIR', default='')
+if PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', PROMETHEUS_MULTIPROC_DIR)
+# สถานะคิวงานใน /metrics cache ไว้ (วินาที) กัน scrape ถี่ ๆ query ตาราง Job ทุกครั้ง
+METRICS_QUEUE_CACHE_SECONDS = config('METRICS_QUEUE_CACHE_SECONDS', default=15, cast=int)
+
+# readiness probe (/health/ready/): เวลารอสูงสุดของการตรวจ (วินาที) และระยะที่ใช้ผลเดิมซ้ำ
+HEALTH_CHECK_TIMEOUT = config('HEALTH_CHECK_TIMEOUT', default=2.0, cast=float)
+HEALTH_CHECK_CACHE_SECONDS = config('HEALTH_CHECK_CACHE_SECONDS', default=5.0, cast=float)
+
 # Swagger settings
 SWAGGER_SETTINGS = {
     'USE_SESSION_AUTH': False,
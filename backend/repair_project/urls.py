@@ -8,6 +8,8 @@ from django.views.decorators.csrf import csrf_exempt
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from repair_api.health import liveness, readiness
+from repair_api.metrics import metrics_view
 
 # Schema view สำหรับ API documentation
 schema_view = get_schema_view(
@@ -26,7 +28,7 @@ schema_view = get_schema_view(
 # Health check view
 @csrf_exempt
 def health_check(request):
-    """Simple health check endpoint"""
+    """Simple health check endpoint (ไม่ตรวจ dependency - load balancer ควรใช้ /health/ready/)"""
     return JsonResponse({
         'status': 'ok',
         'message': 'Repair System API is running',
@@ -45,7 +47,10 @@ def home_view(request):
             'api': '/api/',
             'docs': '/swagger/',
             'redoc': '/redoc/',
-            'health': '/health/'
+            'health': '/health/',
+            'liveness': '/health/live/',
+            'readiness': '/health/ready/',
+            'metrics': '/metrics'
         },
         'status': 'active'
     })
@@ -59,6 +64,11 @@ urlpatterns = [
     
     # Health check
     path('health/', health_check, name='health'),
+    path('health/live/', liveness, name='health-live'),
+    path('health/ready/', readiness, name='health-ready'),
+    
+    # Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
     
     # API endpoints
     path('api/', include('repair_api.urls')),